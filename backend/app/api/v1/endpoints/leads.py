@@ -87,7 +87,8 @@ async def get_lead_report(report_id: str, db: Session = Depends(get_db)) -> Lead
         market_opportunities=db_report.market_opportunities,
         recommended_approach=db_report.recommended_approach,
         export_formats=db_report.export_formats,
-        generated_at=db_report.generated_at
+        generated_at=db_report.generated_at,
+        llm_usage=db_report.llm_usage
     )
 
 
@@ -117,7 +118,8 @@ async def list_lead_reports(db: Session = Depends(get_db)) -> List[LeadReport]:
             market_opportunities=r.market_opportunities,
             recommended_approach=r.recommended_approach,
             export_formats=r.export_formats,
-            generated_at=r.generated_at
+            generated_at=r.generated_at,
+            llm_usage=r.llm_usage
         )
         for r in db_reports
     ]
@@ -77,7 +77,9 @@ async def get_pattern_report(report_id: str, db: Session = Depends(get_db)) -> P
         high_confidence_patterns=db_report.high_confidence_patterns,
         key_insights=db_report.key_insights,
         recommendations=db_report.recommendations,
-        generated_at=db_report.generated_at
+        company_validations=db_report.company_validations or [],
+        generated_at=db_report.generated_at,
+        llm_usage=db_report.llm_usage
     )
 
 
@@ -102,7 +104,9 @@ async def list_pattern_reports(db: Session = Depends(get_db)) -> List[PatternRep
             high_confidence_patterns=r.high_confidence_patterns,
             key_insights=r.key_insights,
             recommendations=r.recommendations,
-            generated_at=r.generated_at
+            company_validations=r.company_validations or [],
+            generated_at=r.generated_at,
+            llm_usage=r.llm_usage
         )
         for r in db_reports
     ]
@@ -1,23 +1,31 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any, List
+import asyncio
 import uuid
 from datetime import datetime
 from sqlalchemy.orm import Session
 
 from app.models.session import SessionState, SessionStatus
 from app.models.db.session import SessionDB
+from app.models.db.pattern import PatternReportDB
+from app.models.db.lead import LeadReportDB
 from app.models.base import get_db
+from app.core.progress import progress_reporter
+from app.core.speculation import speculator
+from app.tasks.autopilot_tasks import run_autopilot_task
 from app.tasks.intent_tasks import extract_intent_task
-from app.tasks.pattern_tasks import discover_patterns_task
-from app.tasks.lead_tasks import generate_leads_task
+from app.tasks.pattern_tasks import complete_pattern_discovery, discover_patterns_task
+from app.tasks.lead_tasks import complete_lead_generation, generate_leads_task
 
 router = APIRouter()
 
 
 @router.post("/", response_model=SessionState)
-async def create_session(user_input: str, db: Session = Depends(get_db)) -> SessionState:
+async def create_session(user_input: str, autopilot: bool = False, db: Session = Depends(get_db)) -> SessionState:
     """
     Create a new analysis session and start intent extraction asynchronously.
+    With `autopilot`, intent extraction, pattern discovery and lead generation
+    run back to back without waiting for confirmations.
     """
     session_id = str(uuid.uuid4())
     
@@ -38,9 +46,12 @@ async def create_session(user_input: str, db: Session = Depends(get_db)) -> Sess
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create session: {str(e)}")
     
-    # Trigger intent extraction task asynchronously
+    # Trigger intent extraction task (or the whole pipeline) asynchronously
     try:
-        extract_intent_task.delay(session_id, user_input)
+        if autopilot:
+            run_autopilot_task.delay(session_id, user_input)
+        else:
+            extract_intent_task.delay(session_id, user_input)
     except Exception as e:
         # Update session status to failed if task submission fails
         db_session.status = SessionStatus.FAILED.value
@@ -77,12 +88,15 @@ async def get_session(session_id: str, db: Session = Depends(get_db)) -> Session
     if not db_session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    # Progress between status transitions is only kept in Redis; read it off the event loop
+    hot_progress = await asyncio.to_thread(progress_reporter.current, [db_session])
+    
     return SessionState(
         id=db_session.id,
         user_input=db_session.user_input,
         status=SessionStatus(db_session.status),
         current_step=db_session.current_step,
-        progress_percentage=db_session.progress_percentage,
+        progress_percentage=hot_progress.get(db_session.id, db_session.progress_percentage),
         extracted_intent=db_session.extracted_intent,
         pattern_report_id=db_session.pattern_report_id,
         patterns_confirmed=db_session.patterns_confirmed,
@@ -176,6 +190,8 @@ async def list_sessions(db: Session = Depends(get_db)) -> List[SessionState]:
     List all active sessions.
     """
     db_sessions = db.query(SessionDB).all()
+    processing = [s for s in db_sessions if s.status == SessionStatus.PROCESSING.value]
+    hot_progress = await asyncio.to_thread(progress_reporter.current, processing)
     
     return [
         SessionState(
@@ -183,7 +199,7 @@ async def list_sessions(db: Session = Depends(get_db)) -> List[SessionState]:
             user_input=s.user_input,
             status=SessionStatus(s.status),
             current_step=s.current_step,
-            progress_percentage=s.progress_percentage,
+            progress_percentage=hot_progress.get(s.id, s.progress_percentage),
             extracted_intent=s.extracted_intent,
             pattern_report_id=s.pattern_report_id,
             patterns_confirmed=s.patterns_confirmed,
@@ -220,45 +236,46 @@ async def confirm_step(session_id: str, step: str, confirmed: bool, db: Session
                 if not db_session.extracted_intent:
                     raise HTTPException(status_code=400, detail="Intent extraction not completed")
                 
-                db_session.status = SessionStatus.PATTERNS_DISCOVERING.value
-                db_session.current_step = "pattern_discovery"
                 db_session.patterns_confirmed = False
-                db.commit()
                 
-                # Trigger pattern discovery task
-                discover_patterns_task.delay(session_id, db_session.extracted_intent)
+                # Patterns may already have been discovered speculatively. The speculation
+                # scripts and the completion path use the sync Redis client, so they run off the loop.
+                state, report_id = await asyncio.to_thread(speculator.promote, session_id, "pattern_discovery")
+                provisional = None
+                if state == "done" and report_id:
+                    provisional = db.query(PatternReportDB).filter(PatternReportDB.id == report_id).first()
+                if provisional:
+                    await asyncio.to_thread(complete_pattern_discovery, db, db_session, provisional)
+                else:
+                    db_session.status = SessionStatus.PATTERNS_DISCOVERING.value
+                    db_session.current_step = "pattern_discovery"
+                    db.commit()
+                    
+                    # Trigger pattern discovery task, unless the speculative run now completes the step
+                    if state != "running":
+                        discover_patterns_task.delay(session_id)
                 
             elif step == "pattern_discovery":
                 # Start lead generation task
                 if not db_session.pattern_report_id:
                     raise HTTPException(status_code=400, detail="Pattern discovery not completed")
                 
-                db_session.status = SessionStatus.LEADS_GENERATING.value
-                db_session.current_step = "lead_generation"
-                db_session.leads_generated = False
-                db.commit()
-                
-                # Get pattern report data for task
-                from app.models.db.pattern import PatternReportDB
-                pattern_report = db.query(PatternReportDB).filter(PatternReportDB.id == db_session.pattern_report_id).first()
-                if pattern_report:
-                    # Convert to dict for task
-                    pattern_data = {
-                        "id": pattern_report.id,
-                        "session_id": pattern_report.session_id,
-                        "industry": pattern_report.industry,
-                        "country": pattern_report.country,
-                        "companies_analyzed": pattern_report.companies_analyzed,
-                        "analysis_duration": pattern_report.analysis_duration,
-                        "patterns": pattern_report.patterns,
-                        "total_patterns": pattern_report.total_patterns,
-                        "average_confidence": pattern_report.average_confidence,
-                        "high_confidence_patterns": pattern_report.high_confidence_patterns,
-                        "key_insights": pattern_report.key_insights,
-                        "recommendations": pattern_report.recommendations,
-                        "generated_at": pattern_report.generated_at.isoformat()
-                    }
-                    generate_leads_task.delay(session_id, pattern_data)
+                # Leads may already have been generated speculatively
+                state, report_id = await asyncio.to_thread(speculator.promote, session_id, "lead_generation")
+                provisional = None
+                if state == "done" and report_id:
+                    provisional = db.query(LeadReportDB).filter(LeadReportDB.id == report_id).first()
+                if provisional:
+                    await asyncio.to_thread(complete_lead_generation, db, db_session, provisional, replay_leads=True)
+                else:
+                    db_session.status = SessionStatus.LEADS_GENERATING.value
+                    db_session.current_step = "lead_generation"
+                    db_session.leads_generated = False
+                    db.commit()
+                    
+                    # Trigger lead generation task; it loads the report by ID
+                    if state != "running":
+                        generate_leads_task.delay(session_id, db_session.pattern_report_id)
                 
             elif step == "lead_generation":
                 # Complete the session
@@ -269,6 +286,11 @@ async def confirm_step(session_id: str, step: str, confirmed: bool, db: Session
         else:
             db_session.status = SessionStatus.FAILED.value
             db_session.add_error(f"User rejected step: {step}")
+            
+            # Discard work started ahead of the rejected step
+            for stage, report_id in await asyncio.to_thread(speculator.cancel, session_id):
+                report_model = PatternReportDB if stage == "pattern_discovery" else LeadReportDB
+                db.query(report_model).filter(report_model.id == report_id).delete()
         
         db_session.updated_at = datetime.utcnow()
         db.commit()
@@ -1,6 +1,11 @@
+import logging
+
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 # Create Celery instance
 celery_app = Celery(
     "gtm_pattern_engine",
@@ -9,7 +14,8 @@ celery_app = Celery(
     include=[
         "app.tasks.intent_tasks",
         "app.tasks.pattern_tasks", 
-        "app.tasks.lead_tasks"
+        "app.tasks.lead_tasks",
+        "app.tasks.autopilot_tasks"
     ]
 )
 
@@ -34,6 +40,12 @@ celery_app.conf.update(
     worker_disable_rate_limits=False,
 )
 
+# Configure results: stage output lives in the database, tasks pass and return only IDs
+celery_app.conf.update(
+    task_ignore_result=settings.CELERY_IGNORE_RESULTS,
+    result_expires=settings.CELERY_RESULT_EXPIRES,
+)
+
 # Configure beat scheduler for periodic tasks (if needed later)
 celery_app.conf.beat_schedule = {
     # Example: cleanup old sessions every hour
@@ -43,5 +55,36 @@ celery_app.conf.beat_schedule = {
     # },
 }
 
+
+
+@worker_process_init.connect
+def warm_up_worker_process(**kwargs):
+    """
+    Build the LLM service in each worker process as it starts (after the fork,
+    so pooled connections are never shared) instead of on its first task.
+    """
+    if not settings.USE_REAL_LLM:
+        return
+    try:
+        from app.services.llm_service import warm_up_llm_service
+        warm_up_llm_service()
+    except Exception as e:
+        logger.warning("LLM warmup failed, the first task will build the service: %s", e)
+
+
+@worker_process_init.connect
+def start_worker_metrics_log(**kwargs):
+    """Log this worker process's metrics periodically; they are not visible from the API process."""
+    from app.services.metrics_report import start_metrics_logging
+    start_metrics_logging()
+
+
+@worker_process_shutdown.connect
+def flush_worker_notifications(**kwargs):
+    """Publish queued WebSocket events before the worker process exits."""
+    from app.core.notifier import notifier
+    notifier.flush()
+
+
 # Import tasks to ensure they're registered
-from app.tasks import intent_tasks, pattern_tasks, lead_tasks
+from app.tasks import intent_tasks, pattern_tasks, lead_tasks, autopilot_tasks
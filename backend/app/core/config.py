@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -38,20 +38,143 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_SOCKET_TIMEOUT: float = 0.5
     
     # Google AI
     GOOGLE_API_KEY: str = ""
-    GEN_ADVANCED_MODEL: str = "gemini-2.0-flash-exp"
-    GEN_FAST_MODEL: str = "gemini-2.0-flash-exp"
+    
+    # LLM models (OpenRouter ids). Stages route to "fast"/"advanced" via LLM_STAGE_ROUTES
+    GEN_ADVANCED_MODEL: str = "qwen/qwen3-235b-a22b-2507"
+    GEN_FAST_MODEL: str = "meta-llama/llama-3.1-8b-instruct"
+    LLM_PROVIDERS: List[str] = ["Cerebras"]  # balanced by app.services.provider_pool
+    # stage -> ordered model chain; the first entry is the primary, the rest are fallbacks
+    LLM_STAGE_ROUTES: Dict[str, List[str]] = {
+        "intent": ["fast", "advanced"],
+        "patterns": ["advanced", "fast"],
+        "leads": ["advanced", "fast"],
+    }
     
     # External APIs
     CRUNCHBASE_API_KEY: Optional[str] = None
     LINKEDIN_API_KEY: Optional[str] = None
     OPENROUTER_API_KEY: Optional[str] = None
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"  # point at benchmarks.openrouter_standin for offline runs
     USE_REAL_LLM: bool = False
     
+    # LLM HTTP client (one pooled keep-alive client per process). Unless set, both pool limits are
+    # LLM_POOL_SESSIONS * LLM_LEAD_MAX_SHARDS: every concurrent lead shard can keep its connection
+    LLM_POOL_SESSIONS: int = 64  # concurrent sessions one process is sized for
+    LLM_POOL_MAX_CONNECTIONS: Optional[int] = None
+    LLM_POOL_MAX_KEEPALIVE: Optional[int] = None
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_HTTP2: bool = True
+    LLM_CONNECT_TIMEOUT: float = 10.0
+    LLM_REQUEST_TIMEOUT: float = 60.0
+    LLM_WARMUP_CONNECTIONS: int = 2  # connections each Celery worker process opens at startup
+    LLM_STREAM_LEADS: bool = True  # stream lead generation and emit leads as they complete
+    LLM_LEAD_SHARD_SIZE: int = 5  # leads requested per concurrent lead-generation call
+    LLM_LEAD_MAX_SHARDS: int = 10
+    LLM_CONTINUATION_MAX_ROUNDS: int = 2  # follow-up calls for leads cut off by max_tokens
+    
+    # LLM response cache (in-process LRU in front of Redis)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_L1_MAX_ENTRIES: int = 512
+    LLM_CACHE_L1_MAX_BYTES: int = 32 * 1024 * 1024
+    LLM_CACHE_MAX_TEMPERATURE: float = 0.5  # calls sampled hotter than this are never cached
+    LLM_CACHE_TTL_INTENT: int = 60 * 60
+    LLM_CACHE_TTL_PATTERNS: int = 6 * 60 * 60
+    LLM_CACHE_TTL_LEADS: int = 60 * 60
+    
+    # Single-flight coalescing of identical in-flight LLM requests
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True
+    LLM_SINGLE_FLIGHT_LEASE_SECONDS: float = 90.0
+    LLM_SINGLE_FLIGHT_MAX_WAIT: float = 45.0
+    LLM_SINGLE_FLIGHT_POLL_INTERVAL: float = 0.1
+    
+    # Shared adaptive rate limiter for OpenRouter (token bucket + AIMD concurrency)
+    LLM_RATE_LIMIT_ENABLED: bool = True
+    LLM_RATE_LIMIT_RPS: float = 10.0
+    LLM_RATE_LIMIT_BURST_SECONDS: float = 2.0
+    LLM_RATE_LIMIT_STAGE_SHARES: Dict[str, float] = {"intent": 0.3, "patterns": 0.3, "leads": 0.4}
+    LLM_RATE_LIMIT_MAX_WAIT: float = 120.0
+    LLM_RATE_LIMIT_POLL_INTERVAL: float = 0.05
+    LLM_RATE_LIMIT_LEASE_SECONDS: float = 120.0  # slots of crashed workers expire after this
+    LLM_RATE_LIMIT_DEFAULT_BACKOFF: float = 5.0  # pause on 429 without Retry-After
+    LLM_CONCURRENCY_INITIAL: float = 16.0
+    LLM_CONCURRENCY_MIN: float = 2.0
+    LLM_CONCURRENCY_MAX: float = 128.0
+    LLM_CONCURRENCY_INCREASE: float = 1.0
+    LLM_CONCURRENCY_DECREASE_FACTOR: float = 0.5
+    LLM_CONCURRENCY_SLOW_FACTOR: float = 0.9
+    LLM_STAGE_LATENCY_TARGETS: Dict[str, float] = {"intent": 5.0, "patterns": 20.0, "leads": 60.0}
+    
+    # Token budgeting: max_tokens = items * observed tokens/item * headroom + overhead, capped per stage
+    LLM_STAGE_MAX_TOKENS: Dict[str, int] = {"intent": 1000, "patterns": 2000, "leads": 6000}
+    LLM_STAGE_TOKENS_PER_ITEM: Dict[str, float] = {"intent": 120.0, "patterns": 300.0, "leads": 550.0}
+    LLM_TOKEN_HEADROOM: float = 1.25
+    LLM_TOKEN_OVERHEAD: int = 300
+    LLM_MIN_MAX_TOKENS: int = 256
+    LLM_CONTEXT_WINDOW: int = 32768
+    LLM_PROMPT_MAX_PATTERNS: int = 8
+    LLM_PROMPT_MAX_PATTERN_CHARS: int = 80
+    
+    # Hedged requests: send one duplicate when a call outlives the route's recent latency percentile
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # no hedging until the route has this much latency history
+    LLM_HEDGE_MIN_DELAY: float = 0.5
+    LLM_HEDGE_MAX_RATIO: float = 0.05  # at most this many hedges per request, on average
+    LLM_HEDGE_BURST: float = 5.0
+    
+    # Micro-batching: concurrent single-item calls to a stage share one multi-item prompt
+    LLM_BATCH_ENABLED: bool = False
+    LLM_BATCH_STAGES: List[str] = ["intent"]
+    LLM_BATCH_MAX_WAIT: float = 0.01  # seconds the first caller waits for the batch to fill, only if other callers are active
+    LLM_BATCH_MAX_ITEMS: int = 8  # also capped by the stage's max_tokens budget
+    
+    # Provider pool: weighted, latency-aware choice among LLM_PROVIDERS for every call
+    LLM_PROVIDER_WEIGHTS: Dict[str, float] = {}  # base weight per provider, default 1.0
+    LLM_PROVIDER_MAX_CONCURRENCY: Dict[str, int] = {}  # in-flight cap per provider across workers
+    LLM_PROVIDER_DEFAULT_CONCURRENCY: int = 64
+    LLM_PROVIDER_WINDOW: int = 100  # recent calls per provider behind its p95 and error rate
+    LLM_PROVIDER_MIN_SAMPLES: int = 10
+    LLM_PROVIDER_ERROR_THRESHOLD: float = 0.5
+    LLM_PROVIDER_FAILURE_STREAK: int = 3
+    LLM_PROVIDER_COOLDOWN: float = 30.0  # seconds a failing provider is skipped
+    LLM_PROVIDER_MAX_ATTEMPTS: int = 2  # providers tried per call before the error is raised
+    
+    # Cross-worker circuit breaker (open -> fall back to mock generators)
+    LLM_BREAKER_ENABLED: bool = True
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_FAILURE_WINDOW: float = 60.0
+    LLM_BREAKER_COOLDOWN: float = 30.0
+    LLM_BREAKER_PROBE_TIMEOUT: float = 90.0
+    
+    # Per-call telemetry, aggregated per session and stage in Redis
+    LLM_USAGE_TTL: int = 7 * 24 * 60 * 60
+    METRICS_LOG_INTERVAL: float = 300.0  # seconds between metrics log lines per worker process; 0 disables
+    
+    # Session progress: latest value kept in Redis, published at most every PROGRESS_MIN_INTERVAL seconds
+    PROGRESS_MIN_INTERVAL: float = 0.5
+    PROGRESS_TTL: int = 24 * 60 * 60
+    
+    # Speculative execution: start the next stage on a low-priority queue before the user confirms the current one
+    SPECULATIVE_PATTERNS: bool = False
+    SPECULATIVE_LEADS: bool = False
+    SPECULATIVE_QUEUE: str = "speculative"
+    SPECULATION_TTL: int = 24 * 60 * 60
+    
     # Agent Settings
     MAX_COMPANIES_TO_ANALYZE: int = 15
+    COMPANY_ANALYSIS_CONCURRENCY: int = 8  # companies fetched and analyzed at once
+    COMPANY_ANALYSIS_TIMEOUT: float = 10.0  # per company
+    # Enrich companies from their homepage. Keep this off: candidates still come from
+    # mock_company_discovery, whose websites are placeholders under the reserved .example
+    # TLD, so every fetch would fail. Turn it on once discovery returns real domains.
+    COMPANY_ANALYSIS_FETCH_WEBSITES: bool = False
+    COMPANY_ANALYSIS_FLUSH_EVERY: int = 5  # results per report write while analysis runs
+    LEAD_FLUSH_EVERY: int = 5  # streamed leads per report write while generation runs
+    COMPANY_VALIDATION_THRESHOLD: float = 0.6
     MAX_LEADS_TO_GENERATE: int = 50
     PATTERN_CONFIDENCE_THRESHOLD: float = 0.7
     LEAD_QUALITY_THRESHOLD: float = 0.6
@@ -59,6 +182,10 @@ class Settings(BaseSettings):
     # Processing
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
+    # Stage tasks keep their reports in the database and return a small status envelope;
+    # results are not stored unless a task opts in, and stored ones expire after CELERY_RESULT_EXPIRES seconds
+    CELERY_IGNORE_RESULTS: bool = True
+    CELERY_RESULT_EXPIRES: int = 60 * 60
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -67,6 +194,10 @@ class Settings(BaseSettings):
             self.BACKEND_CORS_ORIGINS = [
                 origin.strip() for origin in self.BACKEND_CORS_ORIGINS.split(",")
             ]
+        if self.LLM_POOL_MAX_CONNECTIONS is None:
+            self.LLM_POOL_MAX_CONNECTIONS = self.LLM_POOL_SESSIONS * self.LLM_LEAD_MAX_SHARDS
+        if self.LLM_POOL_MAX_KEEPALIVE is None:
+            self.LLM_POOL_MAX_KEEPALIVE = self.LLM_POOL_MAX_CONNECTIONS
     
     class Config:
         env_file = ".env"
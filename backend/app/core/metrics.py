@@ -0,0 +1,117 @@
+"""
+In-process metrics registry.
+
+Counters, gauges and histograms are keyed by metric name plus a sorted tuple
+of label pairs. Histograms keep the most recent HISTOGRAM_WINDOW samples and
+report count, p50, p95 and p99. Each process (API or Celery worker) keeps its own
+registry; `snapshot()` is what gets logged or exposed.
+"""
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+HISTOGRAM_WINDOW = 1024
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summarize(samples: Deque[float], total: int) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "count": total,
+        "p50": _percentile(ordered, 0.50) if ordered else None,
+        "p95": _percentile(ordered, 0.95) if ordered else None,
+        "p99": _percentile(ordered, 0.99) if ordered else None,
+    }
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and windowed histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self._gauges: Dict[str, Dict[LabelKey, float]] = defaultdict(dict)
+        self._histograms: Dict[str, Dict[LabelKey, Deque[float]]] = defaultdict(
+            lambda: defaultdict(lambda: deque(maxlen=HISTOGRAM_WINDOW))
+        )
+        self._histogram_counts: Dict[str, Dict[LabelKey, int]] = defaultdict(lambda: defaultdict(int))
+
+    def incr(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[name][_label_key(labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[name][_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._histograms[name][key].append(value)
+            self._histogram_counts[name][key] += 1
+
+    def histogram(self, name: str, **labels) -> Optional[Dict[str, Any]]:
+        """count/p50/p95/p99 for one series, or None if nothing was observed."""
+        key = _label_key(labels)
+        with self._lock:
+            samples = self._histograms.get(name, {}).get(key)
+            if not samples:
+                return None
+            return _summarize(samples, self._histogram_counts[name][key])
+
+    def quantile(self, name: str, fraction: float, min_samples: int = 1, **labels) -> Optional[float]:
+        """Quantile of one series' recent samples, or None with fewer than `min_samples`."""
+        key = _label_key(labels)
+        with self._lock:
+            samples = self._histograms.get(name, {}).get(key)
+            if not samples or len(samples) < max(1, min_samples):
+                return None
+            ordered = sorted(samples)
+        return _percentile(ordered, fraction)
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                "histograms": {
+                    name: [
+                        dict(_summarize(samples, self._histogram_counts[name][key]), labels=dict(key))
+                        for key, samples in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._histogram_counts.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,185 @@
+"""
+Non-blocking WebSocket notifications from Celery tasks.
+
+Task code runs in worker processes that hold no WebSocket connections, and it
+is synchronous, so it must neither build an event loop per message nor wait on
+the network. `notifier` (one per process) takes an event, puts it on an
+in-process queue and returns; that costs microseconds. A background thread
+drains the queue and publishes the events to one Redis channel, pipelining
+whatever has queued up since the last flush.
+
+The API process runs `relay_events()` for its lifetime. It subscribes to the
+channel and forwards each event to the session's WebSockets through `manager`.
+Every API process receives every event and only delivers the ones for its own
+connections.
+
+While Redis is unavailable, events for sessions with connections in this same
+process go straight to `manager` on the loop that owns those connections.
+Events for any other session are dropped, as they were before the relay.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis, redis_healthy, report_redis_failure
+from app.core.websocket import (
+    analysis_complete_event,
+    error_event,
+    lead_found_event,
+    manager,
+    pattern_discovered_event,
+    progress_event,
+)
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "ws:events"
+
+MAX_BATCH = 256  # events per Redis pipeline
+
+_STOP = object()
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+class Notifier:
+    """Queues session events and publishes them from a background thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outbox: Optional[queue.SimpleQueue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _queue(self) -> queue.SimpleQueue:
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # Threads do not survive fork; each worker process starts its own publisher
+                    self._outbox = queue.SimpleQueue()
+                    self._thread = threading.Thread(
+                        target=self._run, args=(self._outbox,), name="ws-notifier", daemon=True
+                    )
+                    self._thread.start()
+                    self._pid = pid
+        return self._outbox
+
+    def publish(self, session_id: str, message: Dict[str, Any]):
+        """Queue one event for the session's WebSockets; never blocks."""
+        self._queue().put((session_id, message))
+
+    def progress_update(self, session_id: str, step: str, progress: float, message: str = ""):
+        self.publish(session_id, progress_event(step, progress, message))
+
+    def pattern_discovered(self, session_id: str, pattern_data: Dict[str, Any]):
+        self.publish(session_id, pattern_discovered_event(pattern_data))
+
+    def lead_found(self, session_id: str, lead_data: Dict[str, Any]):
+        self.publish(session_id, lead_found_event(lead_data))
+
+    def analysis_complete(self, session_id: str, analysis_type: str, results: Dict[str, Any]):
+        self.publish(session_id, analysis_complete_event(analysis_type, results))
+
+    def error(self, session_id: str, error_message: str, error_type: str = "general"):
+        self.publish(session_id, error_event(error_message, error_type))
+
+    def flush(self, timeout: float = 2.0):
+        """Publish everything queued so far and stop this process's publisher thread."""
+        with self._lock:
+            thread, outbox = self._thread, self._outbox
+            if thread is None or self._pid != os.getpid():
+                return
+            self._thread = self._outbox = self._pid = None
+        outbox.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self, outbox: queue.SimpleQueue):
+        while True:
+            batch: List[Event] = []
+            item = outbox.get()
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= MAX_BATCH:
+                    break
+                try:
+                    item = outbox.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._send(batch)
+                except Exception:
+                    logger.exception("Failed to publish %d WebSocket events", len(batch))
+            if item is _STOP:
+                return
+
+    def _send(self, batch: List[Event]):
+        if redis_healthy():
+            try:
+                pipe = get_redis().pipeline(transaction=False)
+                for session_id, message in batch:
+                    pipe.publish(CHANNEL, json.dumps({"session_id": session_id, "message": message}, default=str))
+                pipe.execute()
+                metrics.incr("ws_events_published", len(batch))
+                return
+            except Exception as e:
+                report_redis_failure("event publish", e)
+        for session_id, message in batch:
+            self._deliver_locally(session_id, message)
+
+    def _deliver_locally(self, session_id: str, message: Dict[str, Any]):
+        loop = manager.loop
+        if not manager.has_connections(session_id) or loop is None or loop.is_closed():
+            metrics.incr("ws_events_dropped")
+            return
+        asyncio.run_coroutine_threadsafe(manager.send_message_to_session(session_id, message), loop)
+        metrics.incr("ws_events_delivered_locally")
+
+
+notifier = Notifier()
+atexit.register(notifier.flush)
+
+
+async def relay_events():
+    """
+    Forward events published by the workers to this process's WebSockets.
+    Runs until cancelled and reconnects after Redis errors.
+    """
+    backoff = 1.0
+    while True:
+        client = aioredis.Redis.from_url(settings.REDIS_URL)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(CHANNEL)
+            backoff = 1.0
+            async for item in pubsub.listen():
+                try:
+                    event = json.loads(item["data"])
+                    session_id = event["session_id"]
+                except (TypeError, ValueError, KeyError):
+                    continue
+                if manager.has_connections(session_id):
+                    await manager.send_message_to_session(session_id, event["message"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("WebSocket event relay lost Redis, reconnecting in %.0fs: %s", backoff, e)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+        finally:
+            try:
+                await pubsub.aclose()
+                await client.aclose()
+            except Exception:
+                pass
@@ -0,0 +1,151 @@
+"""
+Throttled, coalescing session progress for Celery tasks.
+
+Tasks report progress through `progress_reporter.report()` instead of writing
+`SessionDB.progress_percentage` and committing the whole row for every step.
+The latest value per session is kept in Redis (``session:progress:<id>``), and
+the API overlays it on the row when it serves a session. The database is only
+written on status transitions (start, completion, failure), which the tasks
+already commit.
+
+Updates for a session are published (Redis + WebSocket event) at most once
+every ``PROGRESS_MIN_INTERVAL`` seconds. Updates in between are coalesced: only
+the newest one is kept and published when the interval has passed, so the last
+value is never lost. Reaching 100% always publishes at once.
+
+Progress is monotonic per session and step. A lower value than one already
+reported for the same step is dropped, both in process and in Redis, where a
+Lua script guards the stored value. This covers a retried task that starts its
+step again from 10%.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.notifier import notifier
+from app.core.redis_client import get_redis, redis_healthy, report_redis_failure
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "session:progress:"
+
+# Returns 1 if stored, 0 if a higher value for the same step is already there.
+_STORE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    local stored = cjson.decode(current)
+    if stored.step == ARGV[1] and tonumber(stored.progress) > tonumber(ARGV[2]) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[3], 'EX', tonumber(ARGV[4]))
+return 1
+"""
+
+
+class _SessionProgress:
+    def __init__(self, step: str):
+        self.step = step
+        self.progress = -1.0
+        self.message = ""
+        self.published_at = 0.0
+        self.timer: Optional[threading.Timer] = None
+
+
+class ProgressReporter:
+    """Coalesces progress updates per session and keeps the latest one in Redis."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, _SessionProgress] = {}
+
+    def report(self, session_id: str, step: str, progress: float, message: str = ""):
+        """Record progress for a step; publishes now or once the session's interval has passed."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or state.step != step:
+                if state is not None and state.timer is not None:
+                    state.timer.cancel()
+                state = self._sessions[session_id] = _SessionProgress(step)
+            if progress < state.progress:
+                metrics.incr("progress_updates_dropped")
+                return
+            state.progress = progress
+            state.message = message
+            wait = settings.PROGRESS_MIN_INTERVAL - (now - state.published_at)
+            if progress < 100.0 and wait > 0:
+                metrics.incr("progress_updates_coalesced")
+                if state.timer is None:
+                    state.timer = threading.Timer(wait, self.flush, args=(session_id,))
+                    state.timer.daemon = True
+                    state.timer.start()
+                return
+            if state.timer is not None:
+                state.timer.cancel()
+                state.timer = None
+            state.published_at = now
+            if progress >= 100.0:
+                del self._sessions[session_id]
+            # Published under the lock so a timer flush cannot reorder events
+            self._publish(session_id, step, progress, message)
+
+    def flush(self, session_id: str):
+        """Publish the session's coalesced update, if one is waiting."""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or state.timer is None:
+                return
+            state.timer.cancel()
+            state.timer = None
+            state.published_at = time.monotonic()
+            self._publish(session_id, state.step, state.progress, state.message)
+
+    def _publish(self, session_id: str, step: str, progress: float, message: str):
+        if not self._store(session_id, step, progress, message):
+            metrics.incr("progress_updates_dropped")
+            return
+        metrics.incr("progress_updates_published")
+        notifier.progress_update(session_id, step, progress, message)
+
+    def _store(self, session_id: str, step: str, progress: float, message: str) -> bool:
+        if not redis_healthy():
+            return True
+        value = json.dumps({"step": step, "progress": progress, "message": message, "updated_at": time.time()})
+        try:
+            return bool(get_redis().eval(
+                _STORE_SCRIPT, 1, KEY_PREFIX + session_id, step, progress, value, settings.PROGRESS_TTL
+            ))
+        except Exception as e:
+            report_redis_failure("progress write", e)
+            return True
+
+    def current(self, sessions: Iterable) -> Dict[str, float]:
+        """
+        Hot progress for `SessionDB` rows whose current step is still the one
+        in Redis and ahead of the stored value, keyed by session id.
+        """
+        sessions = list(sessions)
+        if not sessions or not redis_healthy():
+            return {}
+        try:
+            values = get_redis().mget([KEY_PREFIX + session.id for session in sessions])
+        except Exception as e:
+            report_redis_failure("progress read", e)
+            return {}
+        overlay: Dict[str, float] = {}
+        for session, value in zip(sessions, values):
+            if value is None:
+                continue
+            hot = json.loads(value)
+            if hot.get("step") == session.current_step and hot.get("progress", 0) > session.progress_percentage:
+                overlay[session.id] = hot["progress"]
+        return overlay
+
+
+progress_reporter = ProgressReporter()
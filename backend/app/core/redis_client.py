@@ -0,0 +1,49 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+import redis
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[redis.Redis] = None
+_client_lock = threading.Lock()
+_down_until = 0.0
+
+RETRY_AFTER = 30.0  # seconds to stop trying Redis after a failure
+
+
+def get_redis() -> redis.Redis:
+    """
+    Shared Redis client for caches and cross-worker coordination.
+
+    redis-py resets its connection pool after fork, so one lazily created
+    client is safe to share across Celery worker processes.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+    return _client
+
+
+def redis_healthy() -> bool:
+    """False while backing off after a recent Redis failure."""
+    return time.monotonic() >= _down_until
+
+
+def report_redis_failure(action: str, error: Exception):
+    """Record a failed Redis call so callers skip Redis for a while."""
+    global _down_until
+    if redis_healthy():
+        logger.warning("Redis %s failed, skipping Redis for %.0fs: %s", action, RETRY_AFTER, error)
+    _down_until = time.monotonic() + RETRY_AFTER
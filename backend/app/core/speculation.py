@@ -0,0 +1,194 @@
+"""
+Speculative execution of the next pipeline stage.
+
+A session waits for the user between stages: after intent extraction until
+the intent is confirmed, and after pattern discovery until the patterns are.
+With ``SPECULATIVE_PATTERNS`` (and ``SPECULATIVE_LEADS``) on, the next stage
+is started as soon as the previous one finishes, on the low-priority
+``SPECULATIVE_QUEUE``, so it is usually done by the time the user confirms.
+
+A speculative run is provisional. It leaves the session row alone, reports no
+progress and sends no events; it only writes its report row, which the session
+does not point at. What happens to it is decided by `confirm_step`:
+
+- confirmed while the run is still queued: the run is dropped and the stage is
+  dispatched normally, so it does not wait behind the low-priority queue;
+- confirmed while it is running: the run is promoted and completes the stage
+  itself when it finishes;
+- confirmed after it finished: its report is attached to the session at once;
+- rejected: the run is cancelled; a finished report is deleted, a running one
+  deletes its own report when it finishes.
+
+The state of each run lives in a Redis hash per session and stage
+(``speculation:<session>:<stage>``) and every transition is one Lua script, so
+the worker finishing a run and the API confirming it cannot both win. Without
+Redis nothing is started speculatively and confirmations take the normal path.
+"""
+import logging
+import uuid
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis, redis_healthy, report_redis_failure
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "speculation:"
+
+# Stage -> task that runs it
+STAGE_TASKS = {
+    "pattern_discovery": "app.tasks.pattern_tasks.discover_patterns_task",
+    "lead_generation": "app.tasks.lead_tasks.generate_leads_task",
+}
+
+# States: queued -> running -> done, or promoted/failed; "closed" once the step is settled
+# without the run (confirmed before it started, rejected, or its report already attached).
+
+# Returns 1 if the run was recorded, 0 if the step already has one or was settled.
+_START_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'state', 'queued', 'task_id', ARGV[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+return 1
+"""
+
+# Returns 1 if the run may start.
+_CLAIM_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'task_id') ~= ARGV[1] or redis.call('HGET', KEYS[1], 'state') ~= 'queued' then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'state', 'running')
+return 1
+"""
+
+# Returns what the run should do with its result: done (keep it provisional),
+# promoted (complete the stage) or closed (discard it).
+_FINISH_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'task_id') ~= ARGV[1] then
+    return 'closed'
+end
+local state = redis.call('HGET', KEYS[1], 'state')
+if state == 'running' then
+    redis.call('HSET', KEYS[1], 'state', ARGV[2], 'report_id', ARGV[3])
+    return ARGV[2]
+end
+if state == 'promoted' then
+    redis.call('HSET', KEYS[1], 'state', 'closed')
+    return 'promoted'
+end
+return 'closed'
+"""
+
+# Settles the step; returns {state the run was in, its report id}.
+_SETTLE_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'none'
+local report_id = redis.call('HGET', KEYS[1], 'report_id') or ''
+local next_state = 'closed'
+if ARGV[1] == 'promote' and state == 'running' then
+    next_state = 'promoted'
+end
+redis.call('HSET', KEYS[1], 'state', next_state)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+return {state, report_id}
+"""
+
+
+class Speculator:
+    """Starts provisional runs of the next stage and settles them on confirmation."""
+
+    def enabled(self, stage: str) -> bool:
+        if stage == "pattern_discovery":
+            return settings.SPECULATIVE_PATTERNS
+        return settings.SPECULATIVE_LEADS
+
+    def _key(self, session_id: str, stage: str) -> str:
+        return f"{KEY_PREFIX}{session_id}:{stage}"
+
+    def _eval(self, action: str, script: str, session_id: str, stage: str, *args):
+        if not redis_healthy():
+            return None
+        try:
+            result = get_redis().eval(script, 1, self._key(session_id, stage), *args)
+        except Exception as e:
+            report_redis_failure(f"speculation {action}", e)
+            return None
+        if isinstance(result, list):
+            return [value.decode() if isinstance(value, bytes) else value for value in result]
+        return result.decode() if isinstance(result, bytes) else result
+
+    def start(self, session_id: str, stage: str, *args) -> bool:
+        """Queue a provisional run of `stage`, unless speculation is off or the step is already settled."""
+        if not self.enabled(stage):
+            return False
+        task_id = str(uuid.uuid4())
+        if not self._eval("start", _START_SCRIPT, session_id, stage, task_id, settings.SPECULATION_TTL):
+            return False
+        # Imported here: the task modules import this one while app.core.celery loads them
+        from app.core.celery import celery_app
+        try:
+            celery_app.send_task(
+                STAGE_TASKS[stage],
+                args=(session_id, *args),
+                kwargs={"speculative": True},
+                task_id=task_id,
+                queue=settings.SPECULATIVE_QUEUE,
+            )
+        except Exception as e:
+            # The record stays queued, so confirming the step dispatches it normally
+            logger.warning("Could not start speculative %s for session %s: %s", stage, session_id, e)
+            return False
+        metrics.incr("speculations_started", stage=stage)
+        return True
+
+    def claim(self, session_id: str, stage: str, task_id: str) -> bool:
+        """Called by a provisional run as it starts; False if it was dropped while queued."""
+        return bool(self._eval("claim", _CLAIM_SCRIPT, session_id, stage, task_id))
+
+    def finish(self, session_id: str, stage: str, task_id: str, report_id: str) -> str:
+        """
+        Called by a provisional run with its finished report: "done" to keep it
+        provisional, "promoted" to complete the stage, "closed" to discard it.
+        """
+        return self._eval("finish", _FINISH_SCRIPT, session_id, stage, task_id, "done", report_id) or "closed"
+
+    def fail(self, session_id: str, stage: str, task_id: str) -> str:
+        """Called by a provisional run that failed; "promoted" if the user is already waiting on it."""
+        return self._eval("fail", _FINISH_SCRIPT, session_id, stage, task_id, "failed", "") or "closed"
+
+    def promote(self, session_id: str, stage: str) -> Tuple[str, Optional[str]]:
+        """
+        Settle `stage` as confirmed. Returns the state the provisional run was
+        in ("done" with its report id, "running" if it now completes the stage,
+        anything else if the caller must dispatch the stage itself).
+        """
+        if not self.enabled(stage):
+            return "none", None
+        state, report_id = self._settle("promote", session_id, stage)
+        if state != "none":
+            metrics.incr("speculations_promoted", stage=stage, state=state)
+        return state, report_id
+
+    def cancel(self, session_id: str) -> List[Tuple[str, str]]:
+        """Settle every stage as rejected; returns (stage, report id) of finished provisional reports to delete."""
+        finished = []
+        for stage in filter(self.enabled, STAGE_TASKS):
+            state, report_id = self._settle("cancel", session_id, stage)
+            if state != "none":
+                metrics.incr("speculations_cancelled", stage=stage, state=state)
+            if state == "done" and report_id:
+                finished.append((stage, report_id))
+        return finished
+
+    def _settle(self, action: str, session_id: str, stage: str) -> Tuple[str, Optional[str]]:
+        result = self._eval(action, _SETTLE_SCRIPT, session_id, stage, action, settings.SPECULATION_TTL)
+        if not result:
+            return "none", None
+        state, report_id = result
+        return state, report_id or None
+
+
+speculator = Speculator()
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import json
 import asyncio
 from datetime import datetime
@@ -7,16 +7,67 @@ from datetime import datetime
 websocket_router = APIRouter()
 
 
+# Event payloads, shared by ConnectionManager and app.core.notifier
+def progress_event(step: str, progress: float, message: str = "") -> Dict[str, Any]:
+    return {
+        "type": "progress_update",
+        "step": step,
+        "progress": progress,
+        "message": message,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def pattern_discovered_event(pattern_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "pattern_discovered",
+        "pattern": pattern_data,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def lead_found_event(lead_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "lead_found",
+        "lead": lead_data,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def analysis_complete_event(analysis_type: str, results: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "analysis_complete",
+        "analysis_type": analysis_type,
+        "results": results,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def error_event(error_message: str, error_type: str = "general") -> Dict[str, Any]:
+    return {
+        "type": "error",
+        "error_type": error_type,
+        "message": error_message,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
 class ConnectionManager:
     """Manages WebSocket connections for real-time updates"""
     
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
         self.session_connections: Dict[str, List[str]] = {}
+        # Loop that owns the connections; other threads must send through it
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def has_connections(self, session_id: str) -> bool:
+        return bool(self.session_connections.get(session_id))
     
     async def connect(self, websocket: WebSocket, session_id: str):
         """Connect a WebSocket for a specific session"""
         await websocket.accept()
+        self.loop = asyncio.get_running_loop()
         connection_id = f"{session_id}_{datetime.utcnow().timestamp()}"
         self.active_connections[connection_id] = websocket
         
@@ -65,47 +116,23 @@ class ConnectionManager:
     
     async def send_progress_update(self, session_id: str, step: str, progress: float, message: str = ""):
         """Send progress update to session"""
-        await self.send_message_to_session(session_id, {
-            "type": "progress_update",
-            "step": step,
-            "progress": progress,
-            "message": message,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        await self.send_message_to_session(session_id, progress_event(step, progress, message))
     
     async def send_pattern_discovered(self, session_id: str, pattern_data: Dict[str, Any]):
         """Send pattern discovery update"""
-        await self.send_message_to_session(session_id, {
-            "type": "pattern_discovered",
-            "pattern": pattern_data,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        await self.send_message_to_session(session_id, pattern_discovered_event(pattern_data))
     
     async def send_lead_found(self, session_id: str, lead_data: Dict[str, Any]):
         """Send lead generation update"""
-        await self.send_message_to_session(session_id, {
-            "type": "lead_found",
-            "lead": lead_data,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        await self.send_message_to_session(session_id, lead_found_event(lead_data))
     
     async def send_analysis_complete(self, session_id: str, analysis_type: str, results: Dict[str, Any]):
         """Send analysis completion notification"""
-        await self.send_message_to_session(session_id, {
-            "type": "analysis_complete",
-            "analysis_type": analysis_type,
-            "results": results,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        await self.send_message_to_session(session_id, analysis_complete_event(analysis_type, results))
     
     async def send_error(self, session_id: str, error_message: str, error_type: str = "general"):
         """Send error notification"""
-        await self.send_message_to_session(session_id, {
-            "type": "error",
-            "error_type": error_type,
-            "message": error_message,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        await self.send_message_to_session(session_id, error_event(error_message, error_type))
 
 
 manager = ConnectionManager()
@@ -28,6 +28,7 @@ class LeadReportDB(Base):
     recommended_approach = Column(Text, nullable=True)
     export_formats = Column(JSON, nullable=False, default=lambda: [])
     generated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    llm_usage = Column(JSON, nullable=True)  # LLM calls, tokens and latency behind this report
 
     # Relationships
     session = relationship("SessionDB", back_populates="lead_reports")
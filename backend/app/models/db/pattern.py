@@ -22,7 +22,9 @@ class PatternReportDB(Base):
     high_confidence_patterns = Column(Integer, nullable=False, default=0)
     key_insights = Column(JSON, nullable=False, default=lambda: [])
     recommendations = Column(JSON, nullable=False, default=lambda: [])
+    company_validations = Column(JSON, nullable=False, default=lambda: [])
     generated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    llm_usage = Column(JSON, nullable=True)  # LLM calls, tokens and latency behind this report
 
     # Relationships
     session = relationship("SessionDB", back_populates="pattern_reports")
@@ -128,3 +128,4 @@ class LeadReport(BaseModel):
     # Metadata
     generated_at: datetime = Field(default_factory=datetime.utcnow)
     model_version: str = Field(default="1.0", description="AI model version used")
+    llm_usage: Optional[Dict[str, Any]] = Field(None, description="LLM calls, tokens and latency behind this report")
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+from app.models.company import ValidationResult
+
 
 class SuccessPattern(BaseModel):
     """Identified success pattern from company analysis"""
@@ -55,7 +57,9 @@ class PatternReport(BaseModel):
     # Insights
     key_insights: List[str] = Field(default_factory=list, description="Key business insights")
     recommendations: List[str] = Field(default_factory=list, description="Actionable recommendations")
+    company_validations: List[ValidationResult] = Field(default_factory=list, description="Per-company analysis results")
     
     # Metadata
     generated_at: datetime = Field(default_factory=datetime.utcnow)
     model_version: str = Field(default="1.0", description="AI model version used")
+    llm_usage: Optional[Dict[str, Any]] = Field(None, description="LLM calls, tokens and latency behind this report")
@@ -0,0 +1,219 @@
+"""
+Cross-worker circuit breaker for the LLM provider.
+
+State lives in Redis so every Celery worker sees the same breaker:
+
+* closed    - calls go through; failures within ``LLM_BREAKER_FAILURE_WINDOW``
+              are counted and ``LLM_BREAKER_FAILURE_THRESHOLD`` of them open it;
+* open      - calls fail immediately with CircuitOpenError so callers fall
+              back to the mock generators in milliseconds;
+* half_open - after ``LLM_BREAKER_COOLDOWN`` one caller (holding a Redis probe
+              lease) is let through; success closes the breaker, failure
+              reopens it.
+
+Rate limiting (429) is handled by the rate limiter and does not count as a
+failure. Without Redis the breaker keeps the same state machine per process.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis, redis_healthy, report_redis_failure
+from app.services.rate_limiter import RateLimitError
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """The breaker is open; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker with state shared through Redis."""
+
+    def __init__(self, name: str = "openrouter"):
+        self.name = name
+        self.prefix = f"llm:breaker:{name}:"
+        self._lock = threading.Lock()
+        self._local: Dict[str, float] = {"opened_at": 0.0, "failures": 0, "window_start": 0.0}
+        self._local_state = CLOSED
+        self._local_probe = False
+        self._fallback_logged_at: Optional[float] = None  # opening last reported by log_fallback
+
+    # -- state storage -------------------------------------------------
+
+    def _read(self):
+        """Return (state, opened_at)."""
+        if redis_healthy():
+            try:
+                raw = get_redis().hgetall(self.prefix + "state")
+                if not raw:
+                    return CLOSED, 0.0
+                return raw.get(b"state", b"closed").decode(), float(raw.get(b"opened_at", 0))
+            except Exception as e:
+                report_redis_failure("breaker read", e)
+        return self._local_state, self._local["opened_at"]
+
+    def _write(self, state: str, opened_at: float):
+        previous, _ = self._read()
+        self._local_state = state
+        self._local["opened_at"] = opened_at
+        if redis_healthy():
+            try:
+                get_redis().hset(self.prefix + "state", mapping={"state": state, "opened_at": opened_at})
+            except Exception as e:
+                report_redis_failure("breaker write", e)
+        if previous != state:
+            logger.warning("Circuit breaker %s: %s -> %s", self.name, previous, state)
+            metrics.incr("llm_breaker_transitions", breaker=self.name, from_state=previous, to_state=state)
+        metrics.set_gauge("llm_breaker_state", STATE_VALUES[state], breaker=self.name)
+
+    def _take_probe(self) -> bool:
+        if redis_healthy():
+            try:
+                return bool(get_redis().set(
+                    self.prefix + "probe", "1", nx=True, px=int(settings.LLM_BREAKER_PROBE_TIMEOUT * 1000)
+                ))
+            except Exception as e:
+                report_redis_failure("breaker probe", e)
+        with self._lock:
+            if self._local_probe:
+                return False
+            self._local_probe = True
+            return True
+
+    def _release_probe(self):
+        self._local_probe = False
+        if redis_healthy():
+            try:
+                get_redis().delete(self.prefix + "probe")
+            except Exception as e:
+                report_redis_failure("breaker probe release", e)
+
+    def _count_failure(self) -> int:
+        if redis_healthy():
+            try:
+                failures = int(get_redis().incr(self.prefix + "failures"))
+                if failures == 1:
+                    # First failure starts the counting window
+                    get_redis().expire(self.prefix + "failures", int(settings.LLM_BREAKER_FAILURE_WINDOW))
+                return failures
+            except Exception as e:
+                report_redis_failure("breaker failure count", e)
+        with self._lock:
+            now = time.time()
+            if now - self._local["window_start"] > settings.LLM_BREAKER_FAILURE_WINDOW:
+                self._local["window_start"] = now
+                self._local["failures"] = 0
+            self._local["failures"] += 1
+            return int(self._local["failures"])
+
+    def _reset_failures(self):
+        self._local["failures"] = 0
+        if redis_healthy():
+            try:
+                get_redis().delete(self.prefix + "failures")
+            except Exception as e:
+                report_redis_failure("breaker reset", e)
+
+    # -- public API ----------------------------------------------------
+
+    def state(self) -> str:
+        return self._read()[0]
+
+    def is_open(self) -> bool:
+        """True while calls would be short-circuited (no side effects)."""
+        state, opened_at = self._read()
+        if state == CLOSED:
+            return False
+        if state == OPEN and time.time() - opened_at >= settings.LLM_BREAKER_COOLDOWN:
+            return False  # a probe may go through
+        return True
+
+    def log_fallback(self):
+        """Warn that calls are served by the fallback, once per opening of the breaker in this process."""
+        _, opened_at = self._read()
+        with self._lock:
+            if self._fallback_logged_at == opened_at:
+                return
+            self._fallback_logged_at = opened_at
+        logger.warning("Circuit breaker %s is open, serving LLM stages from the mock fallback", self.name)
+
+    def allow_request(self) -> bool:
+        """Decide whether a call may go upstream; may claim the half-open probe."""
+        state, opened_at = self._read()
+        if state == CLOSED:
+            return True
+        if state == OPEN and time.time() - opened_at < settings.LLM_BREAKER_COOLDOWN:
+            return False
+        # Cooldown over (or a previous probe died): exactly one caller probes
+        if self._take_probe():
+            metrics.incr("llm_breaker_probes", breaker=self.name, result="started")
+            if state != HALF_OPEN:
+                self._write(HALF_OPEN, opened_at)
+            return True
+        return False
+
+    def record_success(self):
+        state, _ = self._read()
+        if state != CLOSED:
+            metrics.incr("llm_breaker_probes", breaker=self.name, result="succeeded")
+            self._write(CLOSED, 0.0)
+            self._release_probe()
+        self._reset_failures()
+
+    def record_failure(self):
+        state, _ = self._read()
+        if state == HALF_OPEN:
+            metrics.incr("llm_breaker_probes", breaker=self.name, result="failed")
+            self._write(OPEN, time.time())
+            self._release_probe()
+            return
+        if self._count_failure() >= settings.LLM_BREAKER_FAILURE_THRESHOLD and state == CLOSED:
+            self._write(OPEN, time.time())
+
+    def call(self, stage: str, fn: Callable[[], T]) -> T:
+        """Run `fn` if the breaker allows it, recording the outcome."""
+        if not self.allow_request():
+            metrics.incr("llm_breaker_short_circuits", breaker=self.name, stage=stage)
+            raise CircuitOpenError(f"LLM provider circuit is open; skipping {stage} call")
+        try:
+            result = fn()
+        except RateLimitError:
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, stage: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async counterpart of `call`."""
+        if not await asyncio.to_thread(self.allow_request):
+            metrics.incr("llm_breaker_short_circuits", breaker=self.name, stage=stage)
+            raise CircuitOpenError(f"LLM provider circuit is open; skipping {stage} call")
+        try:
+            result = await fn()
+        except RateLimitError:
+            raise
+        except Exception:
+            await asyncio.to_thread(self.record_failure)
+            raise
+        await asyncio.to_thread(self.record_success)
+        return result
+
+
+circuit_breaker = CircuitBreaker()
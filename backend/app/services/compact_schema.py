@@ -0,0 +1,210 @@
+"""
+Compact wire schema for pattern and lead completions.
+
+The model is asked for short keys and only the content it actually has to
+generate. Identifiers, timestamps, session ids, model versions and every
+count or average that can be derived are filled in here. Matched patterns
+are referenced by their index in the prompt's pattern list. The expanders
+turn the compact objects back into the full `SuccessPattern` /
+`LeadAnalysisResult` dicts. They also accept the long key names, so a model
+that ignores the compact format still parses.
+"""
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+PRIORITIES = {"h": "high", "m": "medium", "l": "low"}
+SIGNAL_STRENGTHS = {"s": "strong", "m": "moderate", "w": "weak"}
+COMPLEXITY = {"l": "low", "m": "medium", "h": "high"}
+
+LEAD_SCHEMA = """{
+    "leads": [
+        {
+            "n": "real company name",
+            "q": 0.85,
+            "p": "h",
+            "mp": [0],
+            "ps": [0.8],
+            "sa": {
+                "m": {"growth_potential": 0.8},
+                "f": {"revenue_stability": 0.6},
+                "t": {"tech_stack": 0.8},
+                "g": {"hiring_rate": 0.9},
+                "o": 0.8,
+                "c": 0.85,
+                "pos": ["signal"],
+                "neg": [],
+                "mis": [],
+                "s": "s"
+            },
+            "or": ["outreach recommendation"],
+            "tp": ["talking point"],
+            "rf": ["risk"],
+            "of": ["opportunity"]
+        }
+    ],
+    "ki": ["key insight"],
+    "mo": ["market opportunity"],
+    "ra": "recommended approach"
+}"""
+
+LEAD_KEYS = (
+    "n=company name, q=quality score 0-1, p=priority (h=high, m=medium, l=low), "
+    "mp=indexes of matched patterns in the pattern list, ps=match score for each mp entry, "
+    "sa=signal analysis (m/f/t/g=market/financial/technology/growth signal scores, o=overall score, "
+    "c=confidence, pos/neg/mis=positive/negative/missing signals, s=strength: s=strong, m=moderate, w=weak), "
+    "or=outreach recommendations, tp=talking points, rf=risk factors, of=opportunity factors; "
+    "ki=key insights, mo=market opportunities, ra=recommended approach"
+)
+
+PATTERN_SCHEMA = """{
+    "ca": 12,
+    "patterns": [
+        {
+            "n": "pattern name",
+            "d": "detailed description",
+            "c": 0.85,
+            "f": 8,
+            "cat": "business_model",
+            "sub": "growth_strategy",
+            "ka": ["attribute1", "attribute2", "attribute3"],
+            "sm": {"metric1": 0.9, "metric2": 85.0},
+            "ic": "m",
+            "sc": ["Company A", "Company B"]
+        }
+    ],
+    "ki": ["insight1", "insight2", "insight3"],
+    "rec": ["recommendation1", "recommendation2", "recommendation3"]
+}"""
+
+PATTERN_KEYS = (
+    "ca=companies analyzed, n=name, d=description, c=confidence 0-1, f=companies with the pattern, "
+    "cat=category, sub=subcategory, ka=key attributes, sm=success metrics, "
+    "ic=implementation complexity (l=low, m=medium, h=high), sc=source companies; "
+    "ki=key insights, rec=recommendations"
+)
+
+
+def _pick(item: Dict[str, Any], short: str, full: str, default: Any = None) -> Any:
+    value = item.get(short)
+    if value is None:
+        value = item.get(full, default)
+    return value if value is not None else default
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _matched_patterns(item: Dict[str, Any], pattern_names: List[str]) -> List[str]:
+    names = []
+    for ref in _as_list(_pick(item, "mp", "matched_patterns")):
+        if isinstance(ref, int) and 0 <= ref < len(pattern_names):
+            names.append(pattern_names[ref])
+        elif isinstance(ref, str) and ref.isdigit() and int(ref) < len(pattern_names):
+            names.append(pattern_names[int(ref)])
+        elif isinstance(ref, str):
+            names.append(ref)
+    return names
+
+
+def expand_lead(item: Dict[str, Any], pattern_names: List[str], session_id: str) -> Dict[str, Any]:
+    """Compact lead -> full LeadAnalysisResult dict."""
+    if "signal_analysis" in item and "lead_id" in item:
+        return item  # already expanded (e.g. re-emitted from a merged report)
+
+    lead_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    quality = float(_pick(item, "q", "quality_score", 0.5))
+    matched = _matched_patterns(item, pattern_names)
+    scores = _as_list(_pick(item, "ps", "pattern_scores"))
+    if isinstance(item.get("pattern_scores"), dict):
+        pattern_scores = item["pattern_scores"]
+    else:
+        pattern_scores = {name: float(score) for name, score in zip(matched, scores)}
+
+    priority = str(_pick(item, "p", "priority", "m"))
+    signals = _pick(item, "sa", "signal_analysis", {}) or {}
+    strength = str(_pick(signals, "s", "signal_strength", "m"))
+    return {
+        "lead_id": lead_id,
+        "company_name": _pick(item, "n", "company_name", ""),
+        "session_id": session_id,
+        "quality_score": quality,
+        "priority": PRIORITIES.get(priority, priority),
+        "matched_patterns": matched,
+        "pattern_scores": pattern_scores,
+        "signal_analysis": {
+            "lead_id": lead_id,
+            "market_signals": _pick(signals, "m", "market_signals", {}),
+            "financial_signals": _pick(signals, "f", "financial_signals", {}),
+            "technology_signals": _pick(signals, "t", "technology_signals", {}),
+            "growth_signals": _pick(signals, "g", "growth_signals", {}),
+            "overall_score": float(_pick(signals, "o", "overall_score", quality)),
+            "confidence": float(_pick(signals, "c", "confidence", 0.8)),
+            "positive_signals": _as_list(_pick(signals, "pos", "positive_signals")),
+            "negative_signals": _as_list(_pick(signals, "neg", "negative_signals")),
+            "missing_signals": _as_list(_pick(signals, "mis", "missing_signals")),
+            "signal_strength": SIGNAL_STRENGTHS.get(strength, strength),
+            "signal_timestamp": now,
+        },
+        "outreach_recommendations": _as_list(_pick(item, "or", "outreach_recommendations")),
+        "talking_points": _as_list(_pick(item, "tp", "talking_points")),
+        "risk_factors": _as_list(_pick(item, "rf", "risk_factors")),
+        "opportunity_factors": _as_list(_pick(item, "of", "opportunity_factors")),
+        "analyzed_at": now,
+        "model_version": "1.0",
+    }
+
+
+def expand_lead_report(data: Dict[str, Any], pattern_names: List[str], session_id: str) -> Dict[str, Any]:
+    """Compact lead report -> leads plus the generated report fields (counts are derived by the caller)."""
+    return {
+        "leads": [expand_lead(item, pattern_names, session_id) for item in _as_list(data.get("leads")) if isinstance(item, dict)],
+        "key_insights": _as_list(_pick(data, "ki", "key_insights")),
+        "market_opportunities": _as_list(_pick(data, "mo", "market_opportunities")),
+        "recommended_approach": _pick(data, "ra", "recommended_approach", ""),
+    }
+
+
+def expand_pattern(item: Dict[str, Any], companies_analyzed: int) -> Dict[str, Any]:
+    """Compact pattern -> full SuccessPattern dict."""
+    complexity: Optional[str] = _pick(item, "ic", "implementation_complexity")
+    return {
+        "id": str(uuid.uuid4()),
+        "name": _pick(item, "n", "name", "Unnamed pattern"),
+        "description": _pick(item, "d", "description", ""),
+        "confidence": float(_pick(item, "c", "confidence", 0.5)),
+        "frequency": int(_pick(item, "f", "frequency", 0)),
+        "total_companies": int(_pick(item, "tc", "total_companies", companies_analyzed)),
+        "category": _pick(item, "cat", "category", "general"),
+        "subcategory": _pick(item, "sub", "subcategory"),
+        "key_attributes": _as_list(_pick(item, "ka", "key_attributes")),
+        "success_metrics": _pick(item, "sm", "success_metrics", {}),
+        "implementation_complexity": COMPLEXITY.get(complexity, complexity) if complexity else None,
+        "source_companies": _as_list(_pick(item, "sc", "source_companies")),
+        "discovered_at": datetime.utcnow().isoformat(),
+        "model_version": "1.0",
+    }
+
+
+def expand_pattern_report(data: Dict[str, Any], industry: str, country: str) -> Dict[str, Any]:
+    """Compact pattern report -> PatternReport fields (ids and session are added by the caller)."""
+    companies = int(_pick(data, "ca", "companies_analyzed", 12))
+    patterns = [expand_pattern(item, companies) for item in _as_list(data.get("patterns")) if isinstance(item, dict)]
+    confidences = [p["confidence"] for p in patterns]
+    return {
+        "industry": data.get("industry", industry),
+        "country": data.get("country", country),
+        "companies_analyzed": companies,
+        "analysis_duration": data.get("analysis_duration", 45.2),
+        "patterns": patterns,
+        "total_patterns": len(patterns),
+        "average_confidence": round(sum(confidences) / len(confidences), 3) if confidences else 0.0,
+        "high_confidence_patterns": len([c for c in confidences if c > 0.8]),
+        "key_insights": _as_list(_pick(data, "ki", "key_insights")),
+        "recommendations": _as_list(_pick(data, "rec", "recommendations")),
+    }
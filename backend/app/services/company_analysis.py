@@ -0,0 +1,198 @@
+"""
+Company-analysis stage of pattern discovery.
+
+Up to ``MAX_COMPANIES_TO_ANALYZE`` candidate companies in the intent's market
+are analyzed concurrently on one event loop, at most
+``COMPANY_ANALYSIS_CONCURRENCY`` at a time. Each company is first enriched:
+with ``COMPANY_ANALYSIS_FETCH_WEBSITES`` on, its homepage is fetched for a
+description and technology hints. It is then scored into a
+``ValidationResult``. Results reach the caller's callback as they finish, not
+in input order, so the task can store them and report progress while the rest
+are still running.
+
+Waiting on the network costs one coroutine per company rather than a thread,
+so hundreds of companies fit in one worker. A company whose homepage cannot be
+fetched within ``COMPANY_ANALYSIS_TIMEOUT`` is validated on the data it already
+has. A company whose validation fails still produces a result, marked invalid,
+so the progress count always reaches the total.
+
+This stage is scaffolding for now. The candidates come from
+`mock_company_discovery`: seeded-random companies whose websites sit under the
+reserved ``.example`` TLD. For that reason ``COMPANY_ANALYSIS_FETCH_WEBSITES``
+stays off. The validations are stored on the pattern report
+(``company_validations``) and drive progress, but the pattern prompt does not
+use them yet. Once discovery returns real companies, the validated attributes
+can feed pattern discovery.
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.company import CompanyData, ValidationResult
+from app.services.mock_services import mock_company_discovery
+
+
+logger = logging.getLogger(__name__)
+
+# Fields without which a company cannot be judged with confidence
+CRITICAL_FIELDS = ("website", "description", "founded_year", "employee_count", "revenue", "funding")
+
+# Homepage markers -> technology
+TECHNOLOGY_MARKERS = {
+    "js.stripe.com": "Stripe",
+    "hs-scripts.com": "HubSpot",
+    "cdn.segment.com": "Segment",
+    "widget.intercom.io": "Intercom",
+    "googletagmanager.com": "Google Tag Manager",
+    "/_next/": "Next.js",
+    "cdn.shopify.com": "Shopify",
+    "wp-content/": "WordPress",
+    "salesforce.com": "Salesforce",
+}
+
+MAX_PAGE_CHARS = 200_000
+
+_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.I | re.S)
+_META_DESCRIPTION = re.compile(r"<meta[^>]+name=[\"']description[\"'][^>]+content=[\"']([^\"']*)", re.I)
+
+
+class CompanyAnalyzer:
+    """Fetches, enriches and validates the companies behind a pattern report."""
+
+    def candidates(self, intent: Dict[str, Any]) -> List[CompanyData]:
+        """Companies to analyze for the intent's market."""
+        companies = mock_company_discovery(intent, settings.MAX_COMPANIES_TO_ANALYZE)
+        return [CompanyData(**company) for company in companies[:settings.MAX_COMPANIES_TO_ANALYZE]]
+
+    async def _enrich(self, client: Optional[httpx.AsyncClient], company: CompanyData) -> CompanyData:
+        if client is None or not company.website:
+            return company
+        response = await client.get(company.website)
+        response.raise_for_status()
+        page = response.text[:MAX_PAGE_CHARS]
+        updates: Dict[str, Any] = {}
+        if not company.description:
+            match = _META_DESCRIPTION.search(page) or _TITLE.search(page)
+            if match:
+                updates["description"] = " ".join(match.group(1).split())[:500]
+        found = [name for marker, name in TECHNOLOGY_MARKERS.items() if marker in page]
+        if found:
+            updates["technologies"] = sorted(set(company.technologies or []) | set(found))
+        return company.model_copy(update=updates) if updates else company
+
+    def validate(self, company: CompanyData, intent: Dict[str, Any]) -> ValidationResult:
+        """Score a company's fit with the intent's market and its success signals."""
+        reasons: List[str] = []
+        indicators: List[str] = []
+        missing = [name for name in CRITICAL_FIELDS if getattr(company, name) in (None, "", [])]
+
+        industry = intent.get("industry")
+        country = intent.get("country")
+        industry_match = not industry or company.industry.lower() == industry.lower()
+        country_match = not country or company.country.lower() == country.lower()
+        reasons.append(f"Operates in {company.industry}" if industry_match else f"Industry {company.industry} is outside {industry}")
+        reasons.append(f"Based in {company.country}" if country_match else f"Based in {company.country}, not {country}")
+
+        if company.funding and company.funding >= 10e6:
+            indicators.append(f"Raised ${company.funding / 1e6:.0f}M")
+        if company.revenue and company.revenue >= 5e6:
+            indicators.append(f"Revenue of ${company.revenue / 1e6:.0f}M")
+        if company.employee_count and company.employee_count >= 50:
+            indicators.append(f"{company.employee_count} employees")
+        if company.founded_year and company.founded_year >= datetime.utcnow().year - 10:
+            indicators.append(f"Founded in {company.founded_year}")
+        if company.technologies:
+            indicators.append(f"Uses {', '.join(company.technologies[:3])}")
+
+        fit = (industry_match + country_match) / 2
+        completeness = 1 - len(missing) / len(CRITICAL_FIELDS)
+        signal = min(1.0, len(indicators) / 4)
+        confidence = round(0.4 * fit + 0.3 * completeness + 0.3 * signal, 3)
+        is_valid = industry_match and country_match and confidence >= settings.COMPANY_VALIDATION_THRESHOLD
+        if missing:
+            reasons.append(f"Missing {', '.join(missing)}")
+        return ValidationResult(
+            company_id=company.id,
+            is_valid=is_valid,
+            confidence_score=confidence,
+            validation_reasons=reasons,
+            success_indicators=indicators,
+            missing_data=missing,
+        )
+
+    async def _analyze_one(
+        self,
+        client: Optional[httpx.AsyncClient],
+        slots: asyncio.Semaphore,
+        company: CompanyData,
+        intent: Dict[str, Any],
+    ):
+        async with slots:
+            started = time.monotonic()
+            try:
+                enriched = await asyncio.wait_for(self._enrich(client, company), settings.COMPANY_ANALYSIS_TIMEOUT)
+            except Exception as e:
+                # Enrichment is optional; judge the company on the data it already has
+                logger.debug("Company enrichment failed for %s: %s", company.name, e)
+                metrics.incr("company_enrichment_failures")
+                enriched = company
+            try:
+                result = self.validate(enriched, intent)
+                outcome = "valid" if result.is_valid else "invalid"
+            except Exception as e:
+                logger.debug("Company analysis failed for %s: %s", company.name, e)
+                result = ValidationResult(
+                    company_id=company.id, is_valid=False, confidence_score=0.0,
+                    validation_reasons=[f"Analysis failed: {type(e).__name__}"],
+                )
+                outcome = "error"
+            metrics.observe("company_analysis_seconds", time.monotonic() - started)
+            metrics.incr("company_analyses", outcome=outcome)
+            return enriched, result
+
+    async def analyze_async(
+        self,
+        companies: List[CompanyData],
+        intent: Dict[str, Any],
+        on_result: Callable[[CompanyData, ValidationResult], None],
+    ) -> List[ValidationResult]:
+        """Analyze `companies` concurrently, calling `on_result` as each one finishes."""
+        slots = asyncio.Semaphore(max(1, settings.COMPANY_ANALYSIS_CONCURRENCY))
+        client = None
+        if settings.COMPANY_ANALYSIS_FETCH_WEBSITES:
+            client = httpx.AsyncClient(
+                timeout=settings.COMPANY_ANALYSIS_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=settings.COMPANY_ANALYSIS_CONCURRENCY),
+                headers={"User-Agent": "GTM-Pattern-Engine"},
+            )
+        results: List[ValidationResult] = []
+        try:
+            pending = [self._analyze_one(client, slots, company, intent) for company in companies]
+            for finished in asyncio.as_completed(pending):
+                company, result = await finished
+                results.append(result)
+                on_result(company, result)
+        finally:
+            if client is not None:
+                await client.aclose()
+        return results
+
+    def run(
+        self,
+        companies: List[CompanyData],
+        intent: Dict[str, Any],
+        on_result: Callable[[CompanyData, ValidationResult], None],
+    ) -> List[ValidationResult]:
+        """Blocking `analyze_async` for Celery tasks; `on_result` runs on the calling thread."""
+        return asyncio.run(self.analyze_async(companies, intent, on_result))
+
+
+company_analyzer = CompanyAnalyzer()
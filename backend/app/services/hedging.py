@@ -0,0 +1,152 @@
+"""
+Hedged LLM requests.
+
+When a call on a route has not returned after ``LLM_HEDGE_PERCENTILE`` of that
+route's recent latency, one duplicate is sent and whichever response arrives
+first wins. Hedges are paid for from a budget that earns
+``LLM_HEDGE_MAX_RATIO`` per request (capped at ``LLM_HEDGE_BURST``), so
+duplicates stay a bounded fraction of traffic even during a slow spell.
+
+In the async path the losing request is cancelled, which aborts its HTTP
+exchange. A blocking httpx call cannot be interrupted from another thread, so
+in the sync path (the Celery workers) a hedgeable call is given an abort event
+and sent as a streamed request; the loser's event is set as soon as the other
+call wins, and it closes its response at the next line the provider sends
+(streams carry keep-alive comments while the model is still thinking),
+releasing its connection and provider slot instead of finishing a completion
+nobody reads.
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.model_router import LATENCY_METRIC
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HedgeCancelled(Exception):
+    """The other copy of a hedged call won; this one was abandoned."""
+
+
+class RequestHedger:
+    """Sends at most one duplicate for slow calls, within a global hedge budget."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._budget = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+
+    def hedge_delay(self, stage: str, model: str) -> Optional[float]:
+        """Seconds to wait before hedging this route, or None to not hedge."""
+        if not settings.LLM_HEDGE_ENABLED:
+            return None
+        delay = metrics.quantile(
+            LATENCY_METRIC, settings.LLM_HEDGE_PERCENTILE,
+            min_samples=settings.LLM_HEDGE_MIN_SAMPLES, stage=stage, model=model,
+        )
+        if delay is None:
+            return None
+        return max(settings.LLM_HEDGE_MIN_DELAY, delay)
+
+    def _earn(self):
+        with self._lock:
+            self._budget = min(settings.LLM_HEDGE_BURST, self._budget + settings.LLM_HEDGE_MAX_RATIO)
+
+    def _spend(self, stage: str) -> bool:
+        with self._lock:
+            if self._budget < 1.0:
+                metrics.incr("llm_hedges_skipped", stage=stage)
+                return False
+            self._budget -= 1.0
+        metrics.incr("llm_hedges_sent", stage=stage)
+        return True
+
+    def _pool(self) -> ThreadPoolExecutor:
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is None or self._executor_pid != pid:
+                # Worker threads do not survive fork; start a fresh pool in the child
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.LLM_POOL_MAX_CONNECTIONS, thread_name_prefix="llm-hedge"
+                )
+                self._executor_pid = pid
+            return self._executor
+
+    def call(self, stage: str, model: str, fn: Callable[[Optional[threading.Event]], T]) -> T:
+        """
+        Run `fn`, hedging it once if it outlives the route's latency percentile.
+
+        `fn` gets None when the call cannot be hedged, and otherwise an event
+        that is set once the other copy has won; it should then stop and raise
+        HedgeCancelled.
+        """
+        self._earn()
+        delay = self.hedge_delay(stage, model)
+        if delay is None:
+            return fn(None)
+
+        pool = self._pool()
+        primary_abort, hedge_abort = threading.Event(), threading.Event()
+        primary = pool.submit(fn, primary_abort)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._spend(stage):
+            return primary.result()
+
+        hedge = pool.submit(fn, hedge_abort)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._record_winner(stage, future is hedge)
+                    (primary_abort if future is hedge else hedge_abort).set()
+                    if pending:
+                        metrics.incr("llm_hedges_aborted", stage=stage)
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    async def call_async(self, stage: str, model: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async counterpart of `call`; the losing request is cancelled."""
+        self._earn()
+        delay = self.hedge_delay(stage, model)
+        if delay is None:
+            return await fn()
+
+        primary = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self._spend(stage):
+            return await primary
+
+        hedge = asyncio.ensure_future(fn())
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record_winner(stage, task is hedge)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _record_winner(self, stage: str, hedge_won: bool):
+        metrics.incr("llm_hedge_wins", stage=stage, winner="hedge" if hedge_won else "primary")
+
+
+request_hedger = RequestHedger()
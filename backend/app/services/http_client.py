@@ -0,0 +1,105 @@
+"""
+Shared HTTP client for outbound LLM calls.
+
+One pooled keep-alive client is kept per process so that repeated calls to the
+chat-completions endpoint reuse TCP/TLS connections instead of paying a new
+handshake each time. Celery forks worker processes, so the client is rebuilt
+lazily whenever the owning PID changes. Async callers get one client per
+event loop, since httpx async connections cannot cross loops.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.Client] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (``pip install httpx[http2]``)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_limits() -> httpx.Limits:
+    """Connection pool limits from settings."""
+    return httpx.Limits(
+        max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def build_timeout() -> httpx.Timeout:
+    """Default request timeout from settings."""
+    return httpx.Timeout(settings.LLM_REQUEST_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide pooled client, creating it on first use."""
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            # A client inherited across fork shares sockets with the parent; drop it
+            # without closing so the parent's connections are left alone.
+            use_http2 = settings.LLM_HTTP2 and http2_available()
+            _client = httpx.Client(
+                limits=build_limits(),
+                timeout=build_timeout(),
+                http2=use_http2,
+            )
+            _client_pid = pid
+            logger.info(
+                "Created pooled LLM HTTP client (pid=%s, max_connections=%s, http2=%s)",
+                pid, settings.LLM_POOL_MAX_CONNECTIONS, use_http2,
+            )
+    return _client
+
+
+def close_http_client() -> None:
+    """Close the process-wide client (used on shutdown and in benchmarks)."""
+    global _client, _client_pid
+
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the pooled async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=build_limits(),
+            timeout=build_timeout(),
+            http2=settings.LLM_HTTP2 and http2_available(),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_http_client() -> None:
+    """Close the running loop's async client (call from app shutdown)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,264 @@
+"""
+JSON extraction and repair for LLM completions.
+
+`parse_llm_json` is shared by every stage. It handles the usual failure modes
+of model output without asking for the completion again:
+
+* the object is wrapped in markdown fences or prose. The text between the
+  first ``{`` and the last ``}`` is tried first; if that fails, a single
+  bracket-balanced scan finds the first top-level object, skipping string
+  contents with compiled regexes (no greedy ``{.*}`` backtracking);
+* if that span does not decode, a one-pass repair rewrites it. The repair
+  drops trailing commas, escapes raw control characters and stray inner
+  quotes in strings, and closes a truncated tail. A truncated tail is cut back
+  to the last complete member of the top-level object or of one of its arrays,
+  so a half-written lead is dropped rather than returned without its fields.
+
+Decoding uses ``orjson`` (in requirements.txt) and falls back to the standard
+library where it is not installed, or for input only ``json`` accepts (NaN).
+"""
+import json
+import re
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # listed in requirements.txt; stdlib json still works without it
+    orjson = None
+
+
+# Structural characters outside strings / terminators inside strings
+_STRUCTURE = re.compile(r'[{}\[\]"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# A quote inside a string only closes it when followed by one of these
+_AFTER_STRING = {",", ":", "}", "]", ""}
+
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+# Truncated output is cut back to a point no deeper than top-level arrays
+_SAFE_DEPTH = 2
+
+# Candidate opening braces tried when prose before the payload contains braces
+_MAX_CANDIDATES = 3
+
+# Outcome of the most recent parse in this thread / task, for call telemetry
+_last_outcome: ContextVar[Optional[str]] = ContextVar("llm_json_parse_outcome", default=None)
+
+
+def loads(text: str) -> Any:
+    """Decode JSON with orjson when available (falls back to json for its extensions, e.g. NaN)."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
+def find_json_object(text: str, offset: int = 0) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    Locate the first top-level JSON object in `text` at or after `offset`.
+
+    Returns (start, end) of the balanced span, (start, None) if the object is
+    never closed (truncated output), or None if there is no object at all.
+    """
+    start = text.find("{", offset)
+    if start == -1:
+        return None
+    depth = 0
+    pos = start
+    while True:
+        match = _STRUCTURE.search(text, pos)
+        if match is None:
+            return start, None
+        char = match.group()
+        if char == '"':
+            pos = match.end()
+            while True:
+                special = _STRING_SPECIAL.search(text, pos)
+                if special is None:
+                    return start, None
+                if special.group() == "\\":
+                    pos = special.end() + 1
+                    continue
+                pos = special.end()
+                break
+            continue
+        depth += 1 if char in "{[" else -1
+        pos = match.end()
+        if depth == 0:
+            return start, pos
+
+
+def _next_significant(text: str, pos: int) -> str:
+    length = len(text)
+    while pos < length and text[pos] in " \t\r\n":
+        pos += 1
+    return text[pos] if pos < length else ""
+
+
+def _strip_dangling(out: List[str]):
+    """Drop trailing whitespace and a dangling comma or colon."""
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] in ",:":
+        out.pop()
+        while out and out[-1].isspace():
+            out.pop()
+
+
+def repair_json(fragment: str) -> Tuple[str, bool]:
+    """
+    Rewrite `fragment` (starting at its opening brace) into decodable JSON in one pass.
+
+    Returns (repaired text, truncated) where `truncated` means the input ended
+    before the top-level object closed.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    safe_len = 0
+    safe_stack: List[str] = []
+
+    def mark_safe():
+        nonlocal safe_len, safe_stack
+        if len(stack) <= _SAFE_DEPTH:
+            safe_len = len(out)
+            safe_stack = list(stack)
+
+    index = 0
+    length = len(fragment)
+    while index < length:
+        char = fragment[index]
+        index += 1
+        if in_string:
+            if escape:
+                out.append(char)
+                escape = False
+            elif char == "\\":
+                out.append(char)
+                escape = True
+            elif char == '"':
+                follower = _next_significant(fragment, index)
+                if follower in _AFTER_STRING:
+                    out.append(char)
+                    in_string = False
+                    if follower != ":":  # a value, not a key
+                        mark_safe()
+                else:
+                    out.append('\\"')
+            elif char in _CONTROL_ESCAPES:
+                out.append(_CONTROL_ESCAPES[char])
+            elif char < " ":
+                out.append("\\u%04x" % ord(char))
+            else:
+                out.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            out.append(char)
+            mark_safe()
+        elif char in "}]":
+            if not stack:
+                break
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(stack.pop())
+            mark_safe()
+            if not stack:
+                break
+        elif char == ",":
+            mark_safe()
+            out.append(char)
+        elif stack:
+            out.append(char)
+
+    truncated = bool(stack) or in_string
+    if truncated:
+        del out[safe_len:]
+        stack = safe_stack
+        _strip_dangling(out)
+        out.extend(reversed(stack))
+    return "".join(out), truncated
+
+
+def _decode_candidate(response: str, start: int, end: Optional[int]) -> Tuple[Dict[str, Any], str]:
+    """Decode one candidate object; returns (data, outcome) or raises ValueError."""
+    if end is not None:
+        try:
+            data = loads(response[start:end])
+        except ValueError:
+            pass
+        else:
+            if isinstance(data, dict):
+                return data, "clean"
+
+    # Repair from the opening brace: stray quotes can make the balanced span end early
+    repaired, truncated = repair_json(response[start:])
+    data = loads(repaired)
+    if not isinstance(data, dict):
+        raise ValueError("top-level value is not an object")
+    if truncated and not data:
+        raise ValueError("truncated before any complete member")
+    return data, "truncated" if truncated else "repaired"
+
+
+def _record_outcome(outcome: str):
+    metrics.incr("llm_json_parse", outcome=outcome)
+    _last_outcome.set(outcome)
+
+
+def last_parse_outcome() -> Optional[str]:
+    """Outcome of the last `parse_llm_json` in the current context: clean, repaired, truncated, ..."""
+    return _last_outcome.get()
+
+
+def parse_llm_json(response: str) -> Dict[str, Any]:
+    """
+    Parse the JSON object in an LLM completion, repairing it if needed.
+    """
+    first = response.find("{")
+    if first == -1:
+        _record_outcome("no_object")
+        raise Exception("Failed to parse LLM response as JSON: no JSON object found")
+
+    # Fast path: well-formed output, possibly inside fences or prose, decodes in C
+    last = response.rfind("}")
+    if last > first:
+        try:
+            data = loads(response[first:last + 1])
+        except ValueError:
+            pass
+        else:
+            if isinstance(data, dict):
+                _record_outcome("clean")
+                return data
+
+    span = find_json_object(response, first)
+    error: Optional[ValueError] = None
+    for _ in range(_MAX_CANDIDATES):
+        start, end = span
+        try:
+            data, outcome = _decode_candidate(response, start, end)
+        except ValueError as e:
+            error = error or e
+            span = find_json_object(response, start + 1)
+            if span is None:
+                break
+            continue
+        _record_outcome(outcome)
+        return data
+
+    _record_outcome("failed")
+    raise Exception(f"Failed to parse LLM response as JSON: {error}")
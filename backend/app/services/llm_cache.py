@@ -0,0 +1,171 @@
+"""
+Content-addressed cache for LLM completions.
+
+Keys are a SHA-256 over everything that determines a completion (model,
+provider routing, messages, temperature), so identical prompts from
+different sessions share one entry. max_tokens is left out: it is sized
+adaptively per call and only decides where a completion would be cut off,
+and cut-off completions are never cached. Lookups go to an in-process LRU
+first (L1) and then Redis (L2); an L2 hit is promoted into L1. Redis being
+unavailable only costs the L2 tier, never the call.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis, redis_healthy, report_redis_failure
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "llm:cache:"
+
+
+def stage_ttl(stage: str) -> int:
+    """TTL in seconds for a pipeline stage."""
+    return {
+        "intent": settings.LLM_CACHE_TTL_INTENT,
+        "patterns": settings.LLM_CACHE_TTL_PATTERNS,
+        "leads": settings.LLM_CACHE_TTL_LEADS,
+    }.get(stage, settings.LLM_CACHE_TTL_INTENT)
+
+
+class LRUCache:
+    """Thread-safe LRU bounded by entry count and total value size."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                metrics.incr("llm_cache_evictions")
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+class LLMResponseCache:
+    """Two-tier (LRU -> Redis) cache of raw completion text."""
+
+    def __init__(self):
+        self.l1 = LRUCache(settings.LLM_CACHE_L1_MAX_ENTRIES, settings.LLM_CACHE_L1_MAX_BYTES)
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        material = {
+            "model": payload.get("model"),
+            "provider": payload.get("provider"),
+            "messages": payload.get("messages"),
+            "temperature": payload.get("temperature"),
+        }
+        encoded = json.dumps(material, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_cacheable(payload: Dict[str, Any]) -> bool:
+        return settings.LLM_CACHE_ENABLED and payload.get("temperature", 0) <= settings.LLM_CACHE_MAX_TEMPERATURE
+
+    def get(self, key: str, stage: str, record: bool = True) -> Optional[str]:
+        """Look up a completion; `record=False` skips hit/miss counters (used when polling)."""
+        value = self.l1.get(key)
+        if value is not None:
+            if record:
+                metrics.incr("llm_cache_hits", stage=stage, tier="l1")
+            return value
+
+        raw = None
+        if redis_healthy():
+            try:
+                raw = get_redis().get(KEY_PREFIX + key)
+            except Exception as e:
+                report_redis_failure("cache read", e)
+
+        if raw is not None:
+            value = raw.decode("utf-8")
+            self.l1.set(key, value, stage_ttl(stage))
+            if record:
+                metrics.incr("llm_cache_hits", stage=stage, tier="l2")
+            return value
+
+        if record:
+            metrics.incr("llm_cache_misses", stage=stage)
+        return None
+
+    def set(self, key: str, value: str, stage: str):
+        ttl = stage_ttl(stage)
+        self.l1.set(key, value, ttl)
+        if redis_healthy():
+            try:
+                get_redis().set(KEY_PREFIX + key, value, ex=ttl)
+            except Exception as e:
+                report_redis_failure("cache write", e)
+
+    def delete(self, key: str):
+        self.l1.delete(key)
+        if redis_healthy():
+            try:
+                get_redis().delete(KEY_PREFIX + key)
+            except Exception as e:
+                report_redis_failure("cache delete", e)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(
+            metrics.counter("llm_cache_hits", stage=stage, tier=tier)
+            for stage in ("intent", "patterns", "leads") for tier in ("l1", "l2")
+        )
+        misses = sum(metrics.counter("llm_cache_misses", stage=stage) for stage in ("intent", "patterns", "leads"))
+        return {
+            "l1_entries": len(self.l1),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+
+llm_cache = LLMResponseCache()
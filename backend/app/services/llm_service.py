@@ -1,7 +1,13 @@
 import os
-import requests
+import asyncio
+import httpx
 import json
-from typing import Dict, Any, List, Optional
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Any, List, Optional, TypeVar
 from datetime import datetime
 import uuid
 
@@ -9,11 +15,82 @@ import uuid
 from app.models.intent import IntentExtractionResult
 from app.models.pattern import PatternReport, SuccessPattern
 from app.models.lead import LeadReport, LeadAnalysisResult, SignalAnalysis
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.http_client import get_async_http_client, get_http_client
+from app.services.circuit_breaker import CircuitOpenError, circuit_breaker
+from app.services.compact_schema import (
+    LEAD_KEYS,
+    LEAD_SCHEMA,
+    PATTERN_KEYS,
+    PATTERN_SCHEMA,
+    expand_lead,
+    expand_lead_report,
+    expand_pattern_report,
+)
+from app.services.hedging import HedgeCancelled, request_hedger
+from app.services.json_repair import last_parse_outcome, parse_llm_json
+from app.services.llm_cache import llm_cache
+from app.services.llm_telemetry import LLMCall, llm_telemetry
+from app.services.micro_batcher import MicroBatcher
+from app.services.model_router import model_router
+from app.services.provider_pool import provider_pool
+from app.services.rate_limiter import RateLimitError, parse_retry_after, rate_limiter
+from app.services.single_flight import single_flight
+from app.services.stream_parser import JSONArrayItemStream
+from app.services.token_budget import TokenBudgetError, estimate_message_tokens, estimate_tokens, token_budget
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Completion(str):
+    """Completion text that also carries the provider's `finish_reason`, token usage and serving provider."""
+    finish_reason: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    provider: Optional[str] = None
+    
+    @classmethod
+    def of(
+        cls, text: str, finish_reason: Optional[str], usage: Optional[Dict[str, Any]] = None, provider: Optional[str] = None
+    ) -> "Completion":
+        completion = cls(text)
+        completion.finish_reason = finish_reason
+        completion.prompt_tokens = (usage or {}).get("prompt_tokens")
+        completion.completion_tokens = (usage or {}).get("completion_tokens")
+        completion.provider = provider
+        return completion
+
+
+def is_truncated(response: str) -> bool:
+    """True if the provider stopped the completion at max_tokens."""
+    return getattr(response, "finish_reason", None) == "length"
+
+# Patterns requested by the pattern-discovery prompt ("Generate 2-3 realistic patterns")
+PATTERNS_PER_REPORT = 3
+
+# Company-size segments used to split lead generation beyond one shard per pattern
+LEAD_SEGMENTS = ["Enterprise", "Mid-Market", "Small Business", "Startup"]
+
+_COMPANY_SUFFIXES = re.compile(r"[,.]?\s+(inc|llc|ltd|limited|corp|corporation|co|gmbh|plc|sa|ag)\.?$")
+
+
+def _company_key(lead: Dict[str, Any]) -> str:
+    """Deduplication key for a lead: normalised company name, else its id."""
+    name = str(lead.get("company_name") or lead.get("name") or "").strip().lower()
+    name = _COMPANY_SUFFIXES.sub("", name)
+    name = " ".join(name.split())
+    return name or str(lead.get("lead_id") or uuid.uuid4())
 
 
 class GTMLLMService:
     """
-    LLM service for GTM Pattern Engine using OpenRouter with Cerebras provider.
+    LLM service for GTM Pattern Engine using OpenRouter.
+    Each stage is routed to a model chain by `model_router`, and each call to
+    a provider by `provider_pool`.
     Replaces mock services with real AI inference.
     """
     
@@ -22,142 +99,699 @@ class GTMLLMService:
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY environment variable is required")
         
-        self.url = "https://openrouter.ai/api/v1/chat/completions"
+        self.url = f"{settings.OPENROUTER_BASE_URL.rstrip('/')}/chat/completions"
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "http://localhost:8000",
             "X-Title": "GTM-Pattern-Engine"
         }
+        self._intent_batcher = MicroBatcher(
+            "intent", self._extract_intent_batch, self._extract_intent_batch_async,
+            max_items=lambda: token_budget.max_items("intent"),
+        )
+    
+    def _parse_json_safely(self, response: str) -> Dict[str, Any]:
+        """
+        Parse the JSON object in a completion, repairing common formatting issues.
+        """
+        return parse_llm_json(response)
+    
+    def _build_payload(
+        self, messages: List[Dict], max_tokens: int, temperature: float, model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Build the chat-completions request body."""
+        return {
+            "model": model or settings.GEN_ADVANCED_MODEL,
+            "provider": {
+                "only": settings.LLM_PROVIDERS
+            },
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+    
+    def _handle_response(self, response: httpx.Response) -> str:
+        """
+        Map HTTP errors to service errors and return the completion text.
+        """
+        self._check_status(response)
+        response_data = response.json()
+        choice = response_data["choices"][0]
+        return Completion.of(
+            choice["message"]["content"], choice.get("finish_reason"), response_data.get("usage"), response_data.get("provider")
+        )
+    
+    def _check_status(self, response: httpx.Response):
+        """
+        Raise a service error for non-success HTTP responses.
+        """
+        # Handle specific HTTP status codes
+        if response.status_code == 429:
+            raise RateLimitError(
+                "Rate limit exceeded. Please wait a few minutes before trying again.",
+                parse_retry_after(response.headers.get("Retry-After")),
+            )
+        elif response.status_code == 401:
+            raise Exception("Invalid API key or authentication failed.")
+        elif response.status_code == 403:
+            raise Exception("Access forbidden. Please check your API key permissions.")
+        elif response.status_code == 408:
+            raise Exception("Request timed out. Please try again.")
+        
+        response.raise_for_status()
+    
+    def _make_request(self, messages: List[Dict], max_tokens: int = 4000, temperature: float = 0.2) -> str:
+        """
+        Make API call to OpenRouter over the shared pooled HTTP client.
+        """
+        return self._send(self._build_payload(messages, max_tokens, temperature))
+    
+    def _send(self, payload: Dict[str, Any]) -> str:
+        """
+        POST a prepared payload to a provider from `provider_pool` and return
+        the completion text.
+        """
+        return provider_pool.call(payload, self._post)
     
-    def _extract_json_from_response(self, response: str) -> str:
+    def _post(self, payload: Dict[str, Any]) -> str:
         """
-        Extract clean JSON from LLM response, handling markdown and formatting issues.
+        POST a payload as-is and return the completion text.
         """
-        # Remove markdown code fences if present
-        if "```json" in response:
-            start = response.find("```json") + 7
-            end = response.find("```", start)
-            if end != -1:
-                return response[start:end].strip()
+        try:
+            response = get_http_client().post(self.url, headers=self.headers, json=payload)
+            return self._handle_response(response)
+
+        except httpx.TimeoutException:
+            raise Exception("Request timed out. The LLM service might be overloaded.")
         
-        if "```" in response:
-            start = response.find("```") + 3
-            end = response.find("```", start)
-            if end != -1:
-                return response[start:end].strip()
+        except httpx.ConnectError:
+            raise Exception("Failed to connect to AI service. Please check your internet connection.")
+        
+        except httpx.HTTPError as e:
+            raise Exception(f"OpenRouter API request failed: {str(e)}")
         
-        # Try to find JSON object boundaries
-        import re
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            return json_match.group().strip()
+        except RateLimitError:
+            raise
         
-        # If no clear boundaries found, return as-is
-        return response.strip()
+        except Exception as e:
+            raise Exception(f"Unexpected error in LLM service: {str(e)}")
     
-    def _parse_json_safely(self, response: str) -> Dict[str, Any]:
+    def _send_stream(
+        self, payload: Dict[str, Any], on_text: Callable[[str], None], abort: Optional[threading.Event] = None
+    ) -> str:
         """
-        Parse JSON with multiple fallback strategies.
+        POST with `stream: true`, pass each content delta to `on_text` and
+        return the full completion text. Fails over to another provider only
+        until the first delta has been passed on. Setting `abort` closes the
+        stream at the next line received (HedgeCancelled).
         """
-        cleaned_response = self._extract_json_from_response(response)
+        emitted = []
+        
+        def forward(delta: str):
+            emitted.append(True)
+            on_text(delta)
         
+        return provider_pool.call(
+            payload, lambda pinned: self._post_stream(pinned, forward, abort), can_retry=lambda: not emitted
+        )
+    
+    def _send_hedgeable(self, payload: Dict[str, Any], abort: Optional[threading.Event]) -> str:
+        """
+        `_send` for `request_hedger`: a call that may be hedged is streamed so
+        that the losing copy can be abandoned mid-response.
+        """
+        if abort is None:
+            return self._send(payload)
+        return self._send_stream(payload, lambda delta: None, abort)
+    
+    def _post_stream(
+        self, payload: Dict[str, Any], on_text: Callable[[str], None], abort: Optional[threading.Event] = None
+    ) -> str:
+        """
+        Streaming counterpart of `_post`.
+        """
+        stream_payload = dict(payload, stream=True)
+        parts: List[str] = []
+        finish_reason = None
+        usage = None
+        provider = None
         try:
-            return json.loads(cleaned_response)
-        except json.JSONDecodeError as e:
-            # Try to fix common JSON issues
+            with get_http_client().stream("POST", self.url, headers=self.headers, json=stream_payload) as response:
+                if response.status_code != 200:
+                    response.read()
+                    self._check_status(response)
+                
+                for line in response.iter_lines():
+                    if abort is not None and abort.is_set():
+                        # Leaving the block closes the response and frees the connection
+                        raise HedgeCancelled("Another copy of this hedged call won")
+                    # Server-sent events; lines starting with ':' are keep-alive comments
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if "error" in chunk:
+                        raise Exception(f"OpenRouter stream error: {chunk['error']}")
+                    usage = chunk.get("usage") or usage
+                    provider = chunk.get("provider") or provider
+                    choices = chunk.get("choices") or [{}]
+                    finish_reason = choices[0].get("finish_reason") or finish_reason
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        parts.append(delta)
+                        on_text(delta)
+            return Completion.of("".join(parts), finish_reason, usage, provider)
+
+        except HedgeCancelled:
+            raise
+        
+        except httpx.TimeoutException:
+            raise Exception("Request timed out. The LLM service might be overloaded.")
+        
+        except httpx.ConnectError:
+            raise Exception("Failed to connect to AI service. Please check your internet connection.")
+        
+        except httpx.HTTPError as e:
+            raise Exception(f"OpenRouter API request failed: {str(e)}")
+        
+        except RateLimitError:
+            raise
+        
+        except Exception as e:
+            raise Exception(f"Unexpected error in LLM service: {str(e)}")
+    
+    def _complete(
+        self,
+        stage: str,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float,
+        parse: Callable[[str], T],
+        on_text: Optional[Callable[[str], None]] = None,
+        session_id: Optional[str] = None,
+        attempt: int = 0,
+    ) -> T:
+        """
+        Run a completion through the response cache and parse it.
+        
+        Only completions that `parse` accepts are cached; a cached entry that
+        no longer parses is dropped and fetched again. With `on_text` the
+        upstream call is streamed and each delta is passed on as it arrives;
+        cache hits and coalesced results are not replayed through it.
+        Every upstream call and cache hit is reported to `llm_telemetry`
+        under `session_id`; `attempt` is the caller's retry number.
+        """
+        token_budget.check(stage, messages, max_tokens)
+        models = model_router.models(stage)
+        payload = self._build_payload(messages, max_tokens, temperature, models[0])
+        cache_key = llm_cache.make_key(payload) if llm_cache.is_cacheable(payload) else None
+        
+        if cache_key:
+            cached = llm_cache.get(cache_key, stage)
+            if cached is not None:
+                try:
+                    result = parse(cached)
+                except Exception:
+                    llm_cache.delete(cache_key)
+                else:
+                    llm_telemetry.cache_hit(stage, session_id)
+                    return result
+        
+        def transport(model_payload: Dict[str, Any], call: LLMCall) -> str:
+            started = time.monotonic()
+            call.sent()
             try:
-                # Remove trailing commas
-                fixed = re.sub(r',(\s*[}\]])', r'\1', cleaned_response)
-                return json.loads(fixed)
-            except:
-                raise Exception(f"Failed to parse LLM response as JSON: {e}")
+                if on_text:
+                    def first_text(delta: str):
+                        call.first_byte()
+                        on_text(delta)
+                    
+                    response = self._send_stream(model_payload, first_text)
+                else:
+                    response = request_hedger.call(stage, model_payload["model"], lambda abort: self._send_hedgeable(model_payload, abort))
+            except RateLimitError:
+                call.received()
+                raise
+            except Exception:
+                call.received()
+                model_router.record(stage, model_payload["model"], time.monotonic() - started, False)
+                raise
+            call.received()
+            model_router.record(stage, model_payload["model"], time.monotonic() - started, True)
+            return response
+        
+        def send(model_payload: Dict[str, Any], call: LLMCall) -> str:
+            if settings.LLM_BREAKER_ENABLED:
+                return circuit_breaker.call(stage, lambda: transport(model_payload, call))
+            return transport(model_payload, call)
+        
+        def fetch() -> T:
+            for index, model in enumerate(models):
+                # Fail fast rather than queueing for a rate-limit slot while the provider is down
+                if settings.LLM_BREAKER_ENABLED and circuit_breaker.is_open():
+                    raise CircuitOpenError(f"LLM provider circuit is open; skipping {stage} call")
+                model_payload = payload if index == 0 else self._build_payload(messages, max_tokens, temperature, model)
+                call = self._start_call(stage, model, messages, session_id, attempt + index)
+                try:
+                    if settings.LLM_RATE_LIMIT_ENABLED:
+                        response = rate_limiter.call(stage, lambda: send(model_payload, call))
+                    else:
+                        response = send(model_payload, call)
+                    result = self._parse_call(call, response, parse)
+                except (RateLimitError, CircuitOpenError):
+                    raise
+                except Exception as e:
+                    if index == len(models) - 1:
+                        raise
+                    model_router.record_fallback(stage, model, e)
+                    continue
+                finally:
+                    llm_telemetry.record(call)
+                # Fallback answers are not cached under the primary model's key, nor are cut-off ones
+                if cache_key and index == 0 and not is_truncated(response):
+                    llm_cache.set(cache_key, response, stage)
+                return result
+        
+        if not (cache_key and settings.LLM_SINGLE_FLIGHT_ENABLED):
+            return fetch()
+        
+        def reuse() -> Optional[T]:
+            cached = llm_cache.get(cache_key, stage, record=False)
+            if cached is None:
+                return None
+            try:
+                result = parse(cached)
+            except Exception:
+                return None
+            llm_telemetry.cache_hit(stage, session_id)
+            return result
+        
+        # Identical prompts in flight elsewhere: wait for that result instead of calling again
+        return single_flight.do(cache_key, stage, fetch, reuse)
     
-    def _make_request(self, messages: List[Dict], max_tokens: int = 4000, temperature: float = 0.2) -> str:
+    async def _make_request_async(
+        self,
+        messages: List[Dict],
+        max_tokens: int = 4000,
+        temperature: float = 0.2,
+        timeout: Optional[float] = None,
+    ) -> str:
         """
-        Make API call to OpenRouter using requests library.
+        Async counterpart of `_make_request` using the loop-local pooled client.
+        
+        `timeout` overrides the configured request timeout for this call only.
+        Cancelling the awaiting task aborts the in-flight HTTP request.
         """
-        payload = {
-            "model": "qwen/qwen3-235b-a22b-2507",
-            "provider": {
-                "only": ["Cerebras"]
-            },
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens
-        }
+        return await self._send_async(self._build_payload(messages, max_tokens, temperature), timeout)
+    
+    async def _send_async(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """
+        Async counterpart of `_send`.
+        """
+        return await provider_pool.call_async(payload, lambda pinned: self._post_async(pinned, timeout))
+    
+    async def _post_async(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """
+        Async counterpart of `_post`.
+        """
+        request_timeout = httpx.Timeout(timeout) if timeout is not None else httpx.USE_CLIENT_DEFAULT
 
         try:
-            response = requests.post(self.url, headers=self.headers, json=payload, timeout=60)
-            
-            # Handle specific HTTP status codes
-            if response.status_code == 429:
-                raise Exception("Rate limit exceeded. Please wait a few minutes before trying again.")
-            elif response.status_code == 401:
-                raise Exception("Invalid API key or authentication failed.")
-            elif response.status_code == 403:
-                raise Exception("Access forbidden. Please check your API key permissions.")
-            elif response.status_code == 408:
-                raise Exception("Request timed out. Please try again.")
-            
-            response.raise_for_status()
-            response_data = response.json()
-            return response_data["choices"][0]["message"]["content"]
-
-        except requests.exceptions.Timeout:
+            client = get_async_http_client()
+            response = await client.post(self.url, headers=self.headers, json=payload, timeout=request_timeout)
+            return self._handle_response(response)
+
+        except httpx.TimeoutException:
             raise Exception("Request timed out. The LLM service might be overloaded.")
         
-        except requests.exceptions.ConnectionError:
+        except httpx.ConnectError:
             raise Exception("Failed to connect to AI service. Please check your internet connection.")
         
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             raise Exception(f"OpenRouter API request failed: {str(e)}")
         
+        except RateLimitError:
+            raise
+        
         except Exception as e:
             raise Exception(f"Unexpected error in LLM service: {str(e)}")
     
+    async def _complete_async(
+        self,
+        stage: str,
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float,
+        parse: Callable[[str], T],
+        timeout: Optional[float] = None,
+        session_id: Optional[str] = None,
+        attempt: int = 0,
+    ) -> T:
+        """
+        Async counterpart of `_complete`; Redis lookups run off the event loop.
+        """
+        token_budget.check(stage, messages, max_tokens)
+        models = model_router.models(stage)
+        payload = self._build_payload(messages, max_tokens, temperature, models[0])
+        cache_key = llm_cache.make_key(payload) if llm_cache.is_cacheable(payload) else None
+        
+        if cache_key:
+            cached = await asyncio.to_thread(llm_cache.get, cache_key, stage)
+            if cached is not None:
+                try:
+                    result = parse(cached)
+                except Exception:
+                    await asyncio.to_thread(llm_cache.delete, cache_key)
+                else:
+                    await asyncio.to_thread(llm_telemetry.cache_hit, stage, session_id)
+                    return result
+        
+        async def transport(model_payload: Dict[str, Any], call: LLMCall) -> str:
+            started = time.monotonic()
+            call.sent()
+            try:
+                response = await request_hedger.call_async(
+                    stage, model_payload["model"], lambda: self._send_async(model_payload, timeout)
+                )
+            except RateLimitError:
+                call.received()
+                raise
+            except Exception:
+                call.received()
+                model_router.record(stage, model_payload["model"], time.monotonic() - started, False)
+                raise
+            call.received()
+            model_router.record(stage, model_payload["model"], time.monotonic() - started, True)
+            return response
+        
+        async def send(model_payload: Dict[str, Any], call: LLMCall) -> str:
+            if settings.LLM_BREAKER_ENABLED:
+                return await circuit_breaker.call_async(stage, lambda: transport(model_payload, call))
+            return await transport(model_payload, call)
+        
+        async def fetch() -> T:
+            for index, model in enumerate(models):
+                if settings.LLM_BREAKER_ENABLED and await asyncio.to_thread(circuit_breaker.is_open):
+                    raise CircuitOpenError(f"LLM provider circuit is open; skipping {stage} call")
+                model_payload = payload if index == 0 else self._build_payload(messages, max_tokens, temperature, model)
+                call = self._start_call(stage, model, messages, session_id, attempt + index)
+                try:
+                    if settings.LLM_RATE_LIMIT_ENABLED:
+                        response = await rate_limiter.call_async(stage, lambda: send(model_payload, call))
+                    else:
+                        response = await send(model_payload, call)
+                    result = self._parse_call(call, response, parse)
+                except (RateLimitError, CircuitOpenError):
+                    raise
+                except Exception as e:
+                    if index == len(models) - 1:
+                        raise
+                    model_router.record_fallback(stage, model, e)
+                    continue
+                finally:
+                    await asyncio.to_thread(llm_telemetry.record, call)
+                if cache_key and index == 0 and not is_truncated(response):
+                    await asyncio.to_thread(llm_cache.set, cache_key, response, stage)
+                return result
+        
+        if not (cache_key and settings.LLM_SINGLE_FLIGHT_ENABLED):
+            return await fetch()
+        
+        async def reuse() -> Optional[T]:
+            cached = await asyncio.to_thread(llm_cache.get, cache_key, stage, False)
+            if cached is None:
+                return None
+            try:
+                result = parse(cached)
+            except Exception:
+                return None
+            await asyncio.to_thread(llm_telemetry.cache_hit, stage, session_id)
+            return result
+        
+        return await single_flight.do_async(cache_key, stage, fetch, reuse)
+    
+    def _start_call(
+        self, stage: str, model: str, messages: List[Dict], session_id: Optional[str], retries: int
+    ) -> LLMCall:
+        call = llm_telemetry.start(stage, model, session_id, retries)
+        call.prompt_tokens = estimate_message_tokens(messages)
+        return call
+    
+    def _parse_call(self, call: LLMCall, response: str, parse: Callable[[str], T]) -> T:
+        """
+        Fill in the call record from the completion and parse it.
+        """
+        if isinstance(response, Completion):
+            call.provider = response.provider
+            call.finish_reason = response.finish_reason
+            call.prompt_tokens = response.prompt_tokens or call.prompt_tokens
+            call.completion_tokens = response.completion_tokens or 0
+        if not call.completion_tokens:
+            call.completion_tokens = estimate_tokens(response)
+        result = parse(response)
+        call.repaired = last_parse_outcome() in ("repaired", "truncated")
+        call.success = True
+        return result
+    
+    def _observe_tokens(self, stage: str, items: int, requested: int, response: str):
+        # Only fresh completions say anything about the token rate; a truncated one ran out of
+        # tokens before finishing the `requested` items, so it can only raise the rate
+        if not isinstance(response, Completion):
+            return
+        if is_truncated(response):
+            token_budget.observe_truncated(stage, requested, response.completion_tokens, response)
+        else:
+            token_budget.observe(stage, items, response.completion_tokens, response)
+    
+    def _intent_messages(self, user_input: str) -> List[Dict]:
+        prompt = self._build_intent_prompt(user_input)
+        return [
+            {"role": "system", "content": "You are a GTM (Go-To-Market) strategy expert. Extract structured intent from user queries about finding companies or market opportunities."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _intent_result(self, response: str, user_input: str, session_id: str) -> Dict[str, Any]:
+        """
+        Parse an intent-extraction completion into the service result.
+        """
+        # Parse JSON with robust extraction
+        intent_data = self._parse_json_safely(response)
+        self._observe_tokens("intent", 1, 1, response)
+        return self._intent_payload(intent_data, user_input, session_id)
+    
+    def _intent_payload(self, intent_data: Dict[str, Any], user_input: str, session_id: str) -> Dict[str, Any]:
+        # Ensure required fields
+        intent_data.update({
+            "confidence": intent_data.get("confidence", 0.85),
+            "raw_input": user_input,
+            "extracted_at": datetime.utcnow().isoformat()
+        })
+        
+        return {
+            "success": True,
+            "session_id": session_id,
+            "intent": intent_data
+        }
+    
+    def _intent_batch_messages(self, user_inputs: List[str]) -> List[Dict]:
+        prompt = self._build_intent_batch_prompt(user_inputs)
+        return [
+            {"role": "system", "content": "You are a GTM (Go-To-Market) strategy expert. Extract structured intent from user queries about finding companies or market opportunities."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _intent_batch_results(self, response: str, user_inputs: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Demultiplex a batched intent completion: one intent per query, None where it is missing.
+        """
+        data = self._parse_json_safely(response)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(user_inputs)
+        for entry in data.get("intents", []):
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.pop("i"))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(results):
+                results[index] = entry
+        answered = sum(1 for result in results if result is not None)
+        if not answered:
+            raise Exception("Batched intent completion answered none of the queries")
+        self._observe_tokens("intent", answered, len(user_inputs), response)
+        return results
+    
+    def _extract_intent_batch(self, user_inputs: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Batch function for the intent micro-batcher; a batch of one takes the regular path.
+        """
+        if len(user_inputs) == 1:
+            return [None]
+        return self._complete(
+            "intent", self._intent_batch_messages(user_inputs),
+            max_tokens=token_budget.max_tokens("intent", len(user_inputs)), temperature=0.1,
+            parse=lambda response: self._intent_batch_results(response, user_inputs),
+        )
+    
+    async def _extract_intent_batch_async(self, user_inputs: List[str]) -> List[Optional[Dict[str, Any]]]:
+        if len(user_inputs) == 1:
+            return [None]
+        return await self._complete_async(
+            "intent", self._intent_batch_messages(user_inputs),
+            max_tokens=token_budget.max_tokens("intent", len(user_inputs)), temperature=0.1,
+            parse=lambda response: self._intent_batch_results(response, user_inputs),
+        )
+    
+    def _batching(self, stage: str) -> bool:
+        return settings.LLM_BATCH_ENABLED and stage in settings.LLM_BATCH_STAGES
+    
+    def _pattern_messages(self, intent_data: Dict[str, Any]) -> List[Dict]:
+        prompt = self._build_pattern_discovery_prompt(intent_data)
+        return [
+            {"role": "system", "content": "You are a GTM strategy expert specializing in identifying success patterns for companies in different industries and markets."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _pattern_result(self, response: str, intent_data: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+        """
+        Parse a compact pattern-discovery completion into the service result.
+        """
+        # Parse JSON with robust extraction, then expand the compact schema
+        compact = self._parse_json_safely(response)
+        pattern_data = expand_pattern_report(
+            compact, intent_data.get("industry", "SaaS"), intent_data.get("country", "United States")
+        )
+        self._observe_tokens("patterns", len(pattern_data["patterns"]), PATTERNS_PER_REPORT, response)
+        
+        # Ensure required fields
+        report_id = str(uuid.uuid4())
+        pattern_data.update({
+            "id": report_id,
+            "session_id": session_id,
+            "generated_at": datetime.utcnow().isoformat(),
+            "model_version": "1.0"
+        })
+        
+        return {
+            "success": True,
+            "session_id": session_id,
+            "pattern_report_id": report_id,
+            "pattern_report": pattern_data
+        }
+    
+    def _lead_messages(self, pattern_report: Dict[str, Any], shard: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        shard = shard or {}
+        prompt = self._build_lead_generation_prompt(
+            pattern_report,
+            lead_count=shard.get("lead_count", 5),
+            pattern=shard.get("pattern"),
+            segment=shard.get("segment"),
+            batch=shard.get("batch"),
+            exclude=shard.get("exclude"),
+        )
+        return [
+            {"role": "system", "content": "You are a B2B lead generation expert specializing in identifying high-quality potential customers based on success patterns and market analysis. Return ONLY valid JSON."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _prompt_pattern_names(self, pattern_report: Dict[str, Any]) -> List[str]:
+        # The indexed pattern list shown in lead prompts; compact leads refer to it by index
+        return token_budget.compact_patterns(pattern_report.get("patterns", []))
+    
+    def _lead_summary(self, pattern_report: Dict[str, Any], leads: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Report fields derived from the leads: priority counts, average quality, pattern coverage.
+        """
+        priorities = [str(lead.get("priority", "")).lower() for lead in leads]
+        scores = [float(lead.get("quality_score") or 0.0) for lead in leads]
+        coverage: Dict[str, int] = {p.get("name"): 0 for p in pattern_report.get("patterns", []) if p.get("name")}
+        for lead in leads:
+            for name in lead.get("matched_patterns", []) or []:
+                coverage[name] = coverage.get(name, 0) + 1
+        return {
+            "leads_generated": len(leads),
+            "high_priority_leads": priorities.count("high"),
+            "medium_priority_leads": priorities.count("medium"),
+            "low_priority_leads": priorities.count("low"),
+            "average_quality_score": round(sum(scores) / len(scores), 3) if scores else 0.0,
+            "pattern_coverage": coverage,
+        }
+    
+    def _lead_result(
+        self, response: str, pattern_report: Dict[str, Any], session_id: str, requested: int
+    ) -> Dict[str, Any]:
+        """
+        Parse a compact lead-generation completion for `requested` leads into the service result.
+        """
+        # Parse JSON with robust extraction, then expand the compact schema
+        compact = self._parse_json_safely(response)
+        lead_data = expand_lead_report(compact, self._prompt_pattern_names(pattern_report), session_id)
+        self._observe_tokens("leads", len(lead_data["leads"]), requested, response)
+        
+        # Ensure required fields
+        report_id = str(uuid.uuid4())
+        lead_data.update(self._lead_summary(pattern_report, lead_data["leads"]))
+        lead_data.update({
+            "id": report_id,
+            "session_id": session_id,
+            "pattern_report_id": pattern_report.get("id", ""),
+            "industry": pattern_report.get("industry", "SaaS"),
+            "country": pattern_report.get("country", "United States"),
+            "analysis_duration": compact.get("analysis_duration", 32.8),
+            "export_formats": ["csv", "json", "xlsx"],
+            "generated_at": datetime.utcnow().isoformat(),
+            "model_version": "1.0"
+        })
+        
+        return {
+            "success": True,
+            "session_id": session_id,
+            "lead_report_id": report_id,
+            "lead_report": lead_data,
+            "truncated": is_truncated(response)
+        }
+    
+    def _remainder_shard(self, shard: Dict[str, Any], leads: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Shard spec asking only for the leads a truncated completion did not reach,
+        excluding the companies it already produced; None if nothing is missing.
+        """
+        missing = shard["lead_count"] - len(leads)
+        if missing <= 0:
+            return None
+        produced = [lead.get("company_name") for lead in leads if lead.get("company_name")]
+        return dict(shard, lead_count=missing, exclude=produced)
+    
     def extract_intent(self, user_input: str, session_id: str) -> Dict[str, Any]:
         """
         Extract intent from user input using LLM.
+        
+        With micro-batching enabled the query may share one call with other
+        sessions' queries; if the batch fails or skips it, it is asked alone.
         """
+        if self._batching("intent"):
+            try:
+                intent_data = self._intent_batcher.submit(user_input)
+            except Exception:
+                intent_data = None
+            if intent_data is not None:
+                return self._intent_payload(intent_data, user_input, session_id)
+        
         max_retries = 2
         for attempt in range(max_retries):
             try:
-                prompt = self._build_intent_prompt(user_input)
-                messages = [
-                    {"role": "system", "content": "You are a GTM (Go-To-Market) strategy expert. Extract structured intent from user queries about finding companies or market opportunities."},
-                    {"role": "user", "content": prompt}
-                ]
-                
-                response = self._make_request(messages, max_tokens=1000, temperature=0.1)
-                
-                # Parse JSON response
-                try:
-                    intent_data = json.loads(response)
-                except json.JSONDecodeError:
-                    # Fallback: extract JSON from response
-                    import re
-                    json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                    if json_match:
-                        intent_data = json.loads(json_match.group())
-                    else:
-                        raise Exception("Failed to parse LLM response as JSON")
-                
-                # Ensure required fields
-                intent_data.update({
-                    "confidence": intent_data.get("confidence", 0.85),
-                    "raw_input": user_input,
-                    "extracted_at": datetime.utcnow().isoformat()
-                })
-                
-                return {
-                    "success": True,
-                    "session_id": session_id,
-                    "intent": intent_data
-                }
+                messages = self._intent_messages(user_input)
+                return self._complete(
+                    "intent", messages, max_tokens=token_budget.max_tokens("intent", 1), temperature=0.1,
+                    parse=lambda response: self._intent_result(response, user_input, session_id),
+                    session_id=session_id, attempt=attempt,
+                )
                 
             except Exception as e:
-                if attempt == max_retries - 1:
+                if attempt == max_retries - 1 or isinstance(e, (CircuitOpenError, TokenBudgetError)):
                     return {
                         "success": False,
                         "session_id": session_id,
@@ -172,46 +806,15 @@ class GTMLLMService:
         max_retries = 2
         for attempt in range(max_retries):
             try:
-                prompt = self._build_pattern_discovery_prompt(intent_data)
-                messages = [
-                    {"role": "system", "content": "You are a GTM strategy expert specializing in identifying success patterns for companies in different industries and markets."},
-                    {"role": "user", "content": prompt}
-                ]
-                
-                response = self._make_request(messages, max_tokens=2000, temperature=0.3)
-                
-                # Parse JSON response
-                try:
-                    pattern_data = json.loads(response)
-                except json.JSONDecodeError:
-                    import re
-                    json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                    if json_match:
-                        pattern_data = json.loads(json_match.group())
-                    else:
-                        raise Exception("Failed to parse LLM response as JSON")
-                
-                # Ensure required fields
-                report_id = str(uuid.uuid4())
-                pattern_data.update({
-                    "id": report_id,
-                    "session_id": session_id,
-                    "companies_analyzed": pattern_data.get("companies_analyzed", 12),
-                    "analysis_duration": pattern_data.get("analysis_duration", 45.2),
-                    "total_patterns": len(pattern_data.get("patterns", [])),
-                    "generated_at": datetime.utcnow().isoformat(),
-                    "model_version": "1.0"
-                })
-                
-                return {
-                    "success": True,
-                    "session_id": session_id,
-                    "pattern_report_id": report_id,
-                    "pattern_report": pattern_data
-                }
+                messages = self._pattern_messages(intent_data)
+                return self._complete(
+                    "patterns", messages, max_tokens=token_budget.max_tokens("patterns", PATTERNS_PER_REPORT), temperature=0.3,
+                    parse=lambda response: self._pattern_result(response, intent_data, session_id),
+                    session_id=session_id, attempt=attempt,
+                )
                 
             except Exception as e:
-                if attempt == max_retries - 1:
+                if attempt == max_retries - 1 or isinstance(e, (CircuitOpenError, TokenBudgetError)):
                     return {
                         "success": False,
                         "session_id": session_id,
@@ -219,55 +822,370 @@ class GTMLLMService:
                     }
                 continue
     
-    def generate_leads(self, pattern_report: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+    def _lead_shards(self, pattern_report: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
-        Generate leads based on discovered patterns using LLM.
+        Split MAX_LEADS_TO_GENERATE into shard specs (lead count, pattern and
+        segment focus) so lead generation can fan out into small calls.
+        Shards cycle through the patterns first, then through company-size
+        segments, which keeps their outputs mostly disjoint.
+        """
+        target = max(1, settings.MAX_LEADS_TO_GENERATE)
+        # Keep every shard within the leads stage's max_tokens cap
+        size = max(1, min(settings.LLM_LEAD_SHARD_SIZE, token_budget.max_items("leads")))
+        shard_count = min(max(1, settings.LLM_LEAD_MAX_SHARDS), -(-target // size))
+        if shard_count == 1:
+            return [{"lead_count": target, "pattern": None, "segment": None, "batch": None}]
+        
+        pattern_names = [p.get("name") for p in pattern_report.get("patterns", []) if p.get("name")] or [None]
+        shards = []
+        for index in range(shard_count):
+            shards.append({
+                "lead_count": min(size, target // shard_count + (1 if index < target % shard_count else 0)),
+                "pattern": pattern_names[index % len(pattern_names)],
+                "segment": LEAD_SEGMENTS[(index // len(pattern_names)) % len(LEAD_SEGMENTS)]
+                if shard_count > len(pattern_names) else None,
+                "batch": (index + 1, shard_count),
+            })
+        return shards
+    
+    def _generate_lead_shard(
+        self,
+        pattern_report: Dict[str, Any],
+        session_id: str,
+        shard: Dict[str, Any],
+        emit: Callable[[Dict[str, Any]], None],
+        stream: bool,
+    ) -> Dict[str, Any]:
+        """
+        Run one shard with retries, handing every lead to `emit`; returns the shard's report.
         """
         max_retries = 3  # Increased retries for JSON parsing issues
         for attempt in range(max_retries):
             try:
-                prompt = self._build_lead_generation_prompt(pattern_report)
-                messages = [
-                    {"role": "system", "content": "You are a B2B lead generation expert specializing in identifying high-quality potential customers based on success patterns and market analysis. Return ONLY valid JSON."},
-                    {"role": "user", "content": prompt}
-                ]
+                messages = self._lead_messages(pattern_report, shard)
+                lead_stream = JSONArrayItemStream("leads")
+                pattern_names = self._prompt_pattern_names(pattern_report) if stream else []
                 
-                # Use higher max_tokens for complex lead generation
-                response = self._make_request(messages, max_tokens=6000, temperature=0.1)
+                def _feed(delta: str):
+                    for lead in lead_stream.feed(delta):
+                        try:
+                            emit(expand_lead(lead, pattern_names, session_id))
+                        except Exception as e:
+                            # Runs inside the transport: a bad item or a failing callback must not
+                            # count against the provider, model or breaker. The lead is emitted
+                            # again from the parsed report below.
+                            logger.warning("Could not emit streamed lead: %s", e)
+                            metrics.incr("llm_stream_item_errors", stage="leads")
                 
-                # Parse JSON with robust extraction
-                lead_data = self._parse_json_safely(response)
+                result = self._complete(
+                    "leads", messages, max_tokens=token_budget.max_tokens("leads", shard["lead_count"]), temperature=0.1,
+                    parse=lambda response: self._lead_result(response, pattern_report, session_id, shard["lead_count"]),
+                    on_text=_feed if stream else None, session_id=session_id, attempt=attempt,
+                )
                 
-                # Ensure required fields
-                report_id = str(uuid.uuid4())
-                lead_data.update({
-                    "id": report_id,
-                    "session_id": session_id,
-                    "pattern_report_id": pattern_report.get("id", ""),
-                    "leads_generated": len(lead_data.get("leads", [])),
-                    "analysis_duration": lead_data.get("analysis_duration", 32.8),
-                    "export_formats": ["csv", "json", "xlsx"],
-                    "generated_at": datetime.utcnow().isoformat(),
-                    "model_version": "1.0"
-                })
+                report = result["lead_report"]
+                # `emit` skips companies already emitted, so leads the stream missed
+                # (malformed while streaming, recovered by the repair) still go out
+                for lead in report.get("leads", []):
+                    emit(lead)
+                if result["truncated"]:
+                    self._continue_lead_shard(pattern_report, session_id, shard, report, emit)
+                return report
                 
-                return {
-                    "success": True,
-                    "session_id": session_id,
-                    "lead_report_id": report_id,
-                    "lead_report": lead_data
-                }
+            except Exception as e:
+                if attempt == max_retries - 1 or isinstance(e, (CircuitOpenError, TokenBudgetError)):
+                    raise Exception(f"Failed to generate leads after {max_retries} attempts: {str(e)}")
+                continue
+    
+    def _continue_lead_shard(
+        self,
+        pattern_report: Dict[str, Any],
+        session_id: str,
+        shard: Dict[str, Any],
+        report: Dict[str, Any],
+        emit: Callable[[Dict[str, Any]], None],
+    ):
+        """
+        Top up a shard whose completion hit max_tokens. The complete leads are
+        kept, and short follow-up calls ask only for the missing remainder.
+        """
+        leads = list(report.get("leads", []))
+        for _ in range(settings.LLM_CONTINUATION_MAX_ROUNDS):
+            remainder = self._remainder_shard(shard, leads)
+            if remainder is None:
+                break
+            metrics.incr("llm_continuations", stage="leads")
+            try:
+                result = self._complete(
+                    "leads", self._lead_messages(pattern_report, remainder),
+                    max_tokens=token_budget.max_tokens("leads", remainder["lead_count"]), temperature=0.1,
+                    parse=lambda response: self._lead_result(response, pattern_report, session_id, remainder["lead_count"]),
+                    session_id=session_id,
+                )
+            except Exception as e:
+                # Keep what the truncated completion produced
+                logger.warning("Lead continuation failed, keeping %d leads: %s", len(leads), e)
+                break
+            new_leads = result["lead_report"].get("leads", [])
+            for lead in new_leads:
+                emit(lead)
+            leads.extend(new_leads)
+            if not result["truncated"]:
+                break
+        report["leads"] = leads
+        report["leads_generated"] = len(leads)
+    
+    def _merge_lead_reports(
+        self,
+        pattern_report: Dict[str, Any],
+        session_id: str,
+        reports: List[Dict[str, Any]],
+        leads: List[Dict[str, Any]],
+        duration: float,
+    ) -> Dict[str, Any]:
+        """
+        Combine shard reports into one lead report around the deduplicated `leads`,
+        recomputing priority counts, average quality and pattern coverage.
+        """
+        def merged_list(field: str) -> List[Any]:
+            seen = []
+            for report in reports:
+                for item in report.get(field, []) or []:
+                    if item not in seen:
+                        seen.append(item)
+            return seen
+        
+        report_id = str(uuid.uuid4())
+        lead_data = {
+            "id": report_id,
+            "session_id": session_id,
+            "pattern_report_id": pattern_report.get("id", ""),
+            "industry": pattern_report.get("industry", reports[0].get("industry")),
+            "country": pattern_report.get("country", reports[0].get("country")),
+            "analysis_duration": round(duration, 2),
+            "leads": leads,
+            **self._lead_summary(pattern_report, leads),
+            "key_insights": merged_list("key_insights"),
+            "market_opportunities": merged_list("market_opportunities"),
+            "recommended_approach": next(
+                (r["recommended_approach"] for r in reports if r.get("recommended_approach")), ""
+            ),
+            "export_formats": ["csv", "json", "xlsx"],
+            "generated_at": datetime.utcnow().isoformat(),
+            "model_version": "1.0"
+        }
+        return {
+            "success": True,
+            "session_id": session_id,
+            "lead_report_id": report_id,
+            "lead_report": lead_data
+        }
+    
+    def generate_leads(
+        self,
+        pattern_report: Dict[str, Any],
+        session_id: str,
+        on_lead: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Generate leads based on discovered patterns using LLM.
+        
+        The MAX_LEADS_TO_GENERATE target is split into shards (see
+        `_lead_shards`) that run concurrently; their leads are deduplicated by
+        company and merged into a single report, so wall-clock time follows
+        the slowest shard. With `on_lead`, each unique lead is handed to the
+        callback (one call at a time) as soon as it is complete.
+        """
+        started = time.monotonic()
+        shards = self._lead_shards(pattern_report)
+        stream = bool(on_lead) and settings.LLM_STREAM_LEADS
+        leads: List[Dict[str, Any]] = []
+        seen = set()
+        lock = threading.Lock()
+        
+        def emit(lead: Dict[str, Any]):
+            key = _company_key(lead)
+            with lock:
+                if key in seen or len(leads) >= settings.MAX_LEADS_TO_GENERATE:
+                    return
+                # Only a lead the callback accepted counts as emitted; a failed one is offered again
+                if on_lead:
+                    on_lead(lead)
+                seen.add(key)
+                leads.append(lead)
+        
+        reports: List[Dict[str, Any]] = []
+        errors: List[str] = []
+        if len(shards) == 1:
+            try:
+                reports.append(self._generate_lead_shard(pattern_report, session_id, shards[0], emit, stream))
+            except Exception as e:
+                errors.append(str(e))
+        else:
+            with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="lead-shard") as pool:
+                futures = [
+                    pool.submit(self._generate_lead_shard, pattern_report, session_id, shard, emit, stream)
+                    for shard in shards
+                ]
+                for future in as_completed(futures):
+                    try:
+                        reports.append(future.result())
+                    except Exception as e:
+                        errors.append(str(e))
+        
+        if not reports:
+            return {
+                "success": False,
+                "session_id": session_id,
+                "error": errors[0] if errors else "Lead generation produced no shards"
+            }
+        if errors:
+            logger.warning("%d of %d lead shards failed: %s", len(errors), len(shards), errors[0])
+        return self._merge_lead_reports(pattern_report, session_id, reports, leads, time.monotonic() - started)
+    
+    async def extract_intent_async(self, user_input: str, session_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Awaitable `extract_intent`; same batching, retries and parsing, per-call `timeout` in seconds.
+        """
+        if self._batching("intent"):
+            try:
+                intent_data = await asyncio.wait_for(self._intent_batcher.submit_async(user_input), timeout)
+            except asyncio.TimeoutError:
+                return {"success": False, "session_id": session_id, "error": "Request timed out. The LLM service might be overloaded."}
+            except Exception:
+                intent_data = None
+            if intent_data is not None:
+                return self._intent_payload(intent_data, user_input, session_id)
+        
+        max_retries = 2
+        for attempt in range(max_retries):
+            try:
+                messages = self._intent_messages(user_input)
+                return await self._complete_async(
+                    "intent", messages, max_tokens=token_budget.max_tokens("intent", 1), temperature=0.1,
+                    parse=lambda response: self._intent_result(response, user_input, session_id),
+                    timeout=timeout, session_id=session_id, attempt=attempt,
+                )
+                
+            except Exception as e:
+                if attempt == max_retries - 1 or isinstance(e, (CircuitOpenError, TokenBudgetError)):
+                    return {
+                        "success": False,
+                        "session_id": session_id,
+                        "error": str(e)
+                    }
+                continue
+    
+    async def discover_patterns_async(self, intent_data: Dict[str, Any], session_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Awaitable `discover_patterns`; same retries and parsing, per-call `timeout` in seconds.
+        """
+        max_retries = 2
+        for attempt in range(max_retries):
+            try:
+                messages = self._pattern_messages(intent_data)
+                return await self._complete_async(
+                    "patterns", messages, max_tokens=token_budget.max_tokens("patterns", PATTERNS_PER_REPORT), temperature=0.3,
+                    parse=lambda response: self._pattern_result(response, intent_data, session_id),
+                    timeout=timeout, session_id=session_id, attempt=attempt,
+                )
                 
             except Exception as e:
-                if attempt == max_retries - 1:
+                if attempt == max_retries - 1 or isinstance(e, (CircuitOpenError, TokenBudgetError)):
                     return {
                         "success": False,
                         "session_id": session_id,
-                        "error": f"Failed to generate leads after {max_retries} attempts: {str(e)}"
+                        "error": str(e)
                     }
-                # Retry with lower temperature for more deterministic output
                 continue
     
+    async def _generate_lead_shard_async(
+        self,
+        pattern_report: Dict[str, Any],
+        session_id: str,
+        shard: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                messages = self._lead_messages(pattern_report, shard)
+                result = await self._complete_async(
+                    "leads", messages, max_tokens=token_budget.max_tokens("leads", shard["lead_count"]), temperature=0.1,
+                    parse=lambda response: self._lead_result(response, pattern_report, session_id, shard["lead_count"]),
+                    timeout=timeout, session_id=session_id, attempt=attempt,
+                )
+                report = result["lead_report"]
+                if result["truncated"]:
+                    await self._continue_lead_shard_async(pattern_report, session_id, shard, report, timeout)
+                return report
+                
+            except Exception as e:
+                if attempt == max_retries - 1 or isinstance(e, (CircuitOpenError, TokenBudgetError)):
+                    raise Exception(f"Failed to generate leads after {max_retries} attempts: {str(e)}")
+                continue
+    
+    async def _continue_lead_shard_async(
+        self,
+        pattern_report: Dict[str, Any],
+        session_id: str,
+        shard: Dict[str, Any],
+        report: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ):
+        """
+        Async counterpart of `_continue_lead_shard`.
+        """
+        leads = list(report.get("leads", []))
+        for _ in range(settings.LLM_CONTINUATION_MAX_ROUNDS):
+            remainder = self._remainder_shard(shard, leads)
+            if remainder is None:
+                break
+            metrics.incr("llm_continuations", stage="leads")
+            try:
+                result = await self._complete_async(
+                    "leads", self._lead_messages(pattern_report, remainder),
+                    max_tokens=token_budget.max_tokens("leads", remainder["lead_count"]), temperature=0.1,
+                    parse=lambda response: self._lead_result(response, pattern_report, session_id, remainder["lead_count"]),
+                    timeout=timeout, session_id=session_id,
+                )
+            except Exception as e:
+                logger.warning("Lead continuation failed, keeping %d leads: %s", len(leads), e)
+                break
+            leads.extend(result["lead_report"].get("leads", []))
+            if not result["truncated"]:
+                break
+        report["leads"] = leads
+        report["leads_generated"] = len(leads)
+    
+    async def generate_leads_async(self, pattern_report: Dict[str, Any], session_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Awaitable `generate_leads`; shards run concurrently on the loop, per-call `timeout` in seconds.
+        """
+        started = time.monotonic()
+        shards = self._lead_shards(pattern_report)
+        outcomes = await asyncio.gather(
+            *(self._generate_lead_shard_async(pattern_report, session_id, shard, timeout) for shard in shards),
+            return_exceptions=True,
+        )
+        reports = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+        if not reports:
+            return {
+                "success": False,
+                "session_id": session_id,
+                "error": str(outcomes[0])
+            }
+        
+        leads: List[Dict[str, Any]] = []
+        seen = set()
+        for report in reports:
+            for lead in report.get("leads", []):
+                key = _company_key(lead)
+                if key not in seen and len(leads) < settings.MAX_LEADS_TO_GENERATE:
+                    seen.add(key)
+                    leads.append(lead)
+        return self._merge_lead_reports(pattern_report, session_id, reports, leads, time.monotonic() - started)
+    
     def _build_intent_prompt(self, user_input: str) -> str:
         """Build prompt for intent extraction."""
         return f"""
@@ -283,6 +1201,30 @@ Return a JSON object with these exact fields:
 }}
 
 Be precise and only extract information that's clearly mentioned in the query.
+"""
+    
+    def _build_intent_batch_prompt(self, user_inputs: List[str]) -> str:
+        """Build one prompt that extracts the intent of several user queries."""
+        queries = "\n".join(f"{index}: {json.dumps(user_input)}" for index, user_input in enumerate(user_inputs))
+        return f"""
+Extract the GTM intent from each of these independent user queries:
+{queries}
+
+Return a JSON object with one entry per query, where "i" is the query's number:
+{{
+    "intents": [
+        {{
+            "i": 0,
+            "industry": "string (the industry sector like 'SaaS', 'FinTech', 'HealthTech', etc.)",
+            "country": "string (the target country/market)",
+            "company_size": "string or null (like 'Enterprise', 'Mid-Market', 'Small', or null if not specified)",
+            "goal": "string (like 'lead_generation', 'market_analysis', 'competitive_intelligence', etc.)",
+            "confidence": "number between 0 and 1"
+        }}
+    ]
+}}
+
+Be precise and only extract information that's clearly mentioned in each query; do not mix queries.
 """
     
     def _build_pattern_discovery_prompt(self, intent_data: Dict[str, Any]) -> str:
@@ -293,104 +1235,116 @@ Be precise and only extract information that's clearly mentioned in the query.
         return f"""
 Generate success patterns for {industry} companies in {country}.
 
-Return a JSON object with these exact fields:
-{{
-    "industry": "{industry}",
-    "country": "{country}",
-    "companies_analyzed": 12,
-    "analysis_duration": 45.2,
-    "patterns": [
-        {{
-            "id": "unique uuid string",
-            "name": "pattern name",
-            "description": "detailed description",
-            "confidence": 0.85,
-            "frequency": 8,
-            "total_companies": 12,
-            "category": "business_model",
-            "subcategory": "growth_strategy",
-            "key_attributes": ["attribute1", "attribute2", "attribute3"],
-            "success_metrics": {{
-                "metric1": 0.9,
-                "metric2": 85.0
-            }},
-            "implementation_complexity": "medium",
-            "source_companies": ["Company A", "Company B"],
-            "discovered_at": "ISO datetime string",
-            "model_version": "1.0"
-        }}
-    ],
-    "total_patterns": 2,
-    "average_confidence": 0.815,
-    "high_confidence_patterns": 2,
-    "key_insights": ["insight1", "insight2", "insight3"],
-    "recommendations": ["recommendation1", "recommendation2", "recommendation3"]
-}}
+Return ONLY a JSON object in this compact format:
+{PATTERN_SCHEMA}
+
+Keys: {PATTERN_KEYS}.
+Identifiers, timestamps and totals are added afterwards; do not include them.
 
 Generate 2-3 realistic patterns for the specified industry and market.
 """
     
-    def _build_lead_generation_prompt(self, pattern_report: Dict[str, Any]) -> str:
-        """Build prompt for lead generation."""
+    def _build_lead_generation_prompt(
+        self,
+        pattern_report: Dict[str, Any],
+        lead_count: int = 5,
+        pattern: Optional[str] = None,
+        segment: Optional[str] = None,
+        batch: Optional[tuple] = None,
+        exclude: Optional[List[str]] = None,
+    ) -> str:
+        """Build prompt for lead generation (optionally one shard's pattern/segment)."""
         industry = pattern_report.get("industry", "SaaS")
         country = pattern_report.get("country", "United States")
-        patterns = pattern_report.get("patterns", [])
+        pattern_names = self._prompt_pattern_names(pattern_report)
+        focus = ""
+        if pattern:
+            focus += f"\nFocus on companies that best match the pattern: {token_budget.prompt_pattern_name(pattern)}"
+        if segment:
+            focus += f"\nOnly include {segment} companies."
+        if batch:
+            focus += f"\nThis is batch {batch[0]} of {batch[1]} run in parallel; pick distinct companies, not only the most obvious ones."
+        if exclude:
+            focus += f"\nThese companies are already covered, do not include them: {exclude}"
+        
+        patterns = "\n".join(
+            f"{index}: {token_budget.prompt_pattern_name(name)}" for index, name in enumerate(pattern_names)
+        )
         
         return f"""
-Generate 5 high-quality B2B leads for {industry} companies in {country} based on these success patterns: {[p.get('name', 'Unknown') for p in patterns]}
+Generate {lead_count} high-quality B2B leads for {industry} companies in {country} based on these success patterns (referenced by index):
+{patterns}{focus}
 
 CRITICAL: Return ONLY valid JSON. No markdown, no code fences, no explanations, no commentary. Just the JSON object.
 
-Use this exact structure:
-{{
-    "industry": "{industry}",
-    "country": "{country}",
-    "leads": [
-        {{
-            "lead_id": "uuid-string",
-            "session_id": "uuid-string", 
-            "quality_score": 0.85,
-            "priority": "high",
-            "matched_patterns": ["pattern1"],
-            "pattern_scores": {{"pattern1": 0.8}},
-            "signal_analysis": {{
-                "lead_id": "uuid-string",
-                "market_signals": {{"growth_potential": 0.8}},
-                "financial_signals": {{"revenue_stability": 0.6}},
-                "technology_signals": {{"tech_stack": 0.8}},
-                "growth_signals": {{"hiring_rate": 0.9}},
-                "overall_score": 0.8,
-                "confidence": 0.85,
-                "positive_signals": ["signal1"],
-                "negative_signals": [],
-                "missing_signals": [],
-                "signal_strength": "strong",
-                "signal_timestamp": "2024-01-01T00:00:00Z"
-            }},
-            "outreach_recommendations": ["rec1"],
-            "talking_points": ["point1"],
-            "risk_factors": ["risk1"],
-            "opportunity_factors": ["opp1"],
-            "analyzed_at": "2024-01-01T00:00:00Z",
-            "model_version": "1.0"
-        }}
-    ],
-    "high_priority_leads": 2,
-    "medium_priority_leads": 2,
-    "low_priority_leads": 1,
-    "average_quality_score": 0.69,
-    "pattern_coverage": {{"pattern1": 5}},
-    "key_insights": ["insight1"],
-    "market_opportunities": ["opp1"],
-    "recommended_approach": "detailed approach description"
-}}
+Use this exact compact structure:
+{LEAD_SCHEMA}
+
+Keys: {LEAD_KEYS}.
+Identifiers, timestamps and report totals are added afterwards; do not include them.
 
 Generate realistic lead data. Ensure all JSON is properly formatted and complete.
 """
 
 
-# Global instance (only created if API key is present)
-try:
-    llm_service = GTMLLMService()
-except ValueError:
-    llm_service = None
+# Process-wide instance, built on first use by get_llm_service()
+_llm_service: Optional[GTMLLMService] = None
+_llm_service_lock = threading.Lock()
+
+
+def get_llm_service() -> Optional[GTMLLMService]:
+    """
+    Return the process-wide GTMLLMService, constructing it on first use.
+    
+    Returns None while OPENROUTER_API_KEY is not set; the key is looked up
+    again on the next call, so settings applied after import take effect.
+    """
+    global _llm_service
+    if _llm_service is None:
+        with _llm_service_lock:
+            if _llm_service is None:
+                try:
+                    _llm_service = GTMLLMService()
+                except ValueError:
+                    return None
+    return _llm_service
+
+
+def warm_up_llm_service() -> bool:
+    """
+    Prepare this process for its first LLM call: build the service, open
+    pooled connections to the provider and connect to Redis (response cache,
+    rate limiter, circuit breaker). Failures are logged and never raised.
+    """
+    started = time.monotonic()
+    service = get_llm_service()
+    if service is None:
+        return False
+    
+    client = get_http_client()
+    origin = httpx.URL(service.url).copy_with(path="/", query=None)
+    
+    def connect(_):
+        # Any response means a TLS connection is now idle in the pool
+        client.head(origin, timeout=settings.LLM_CONNECT_TIMEOUT)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=settings.LLM_WARMUP_CONNECTIONS) as pool:
+            list(pool.map(connect, range(settings.LLM_WARMUP_CONNECTIONS)))
+    except Exception as e:
+        logger.warning("LLM connection warmup failed: %s", e)
+    
+    if settings.LLM_BREAKER_ENABLED:
+        circuit_breaker.is_open()
+    if settings.LLM_CACHE_ENABLED:
+        llm_cache.get("warmup", "intent", record=False)
+    
+    logger.info("LLM service warmed up in %.0f ms", (time.monotonic() - started) * 1000)
+    return True
+
+
+def __getattr__(name: str):
+    # Keeps `from app.services.llm_service import llm_service` working, lazily
+    if name == "llm_service":
+        return get_llm_service()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
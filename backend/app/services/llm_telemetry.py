@@ -0,0 +1,219 @@
+"""
+Per-call LLM telemetry.
+
+Every upstream call (and every cache hit) made by `GTMLLMService` produces one
+record: stage, model, provider, queue wait, time to first byte, total latency,
+prompt and completion tokens, retries, whether the JSON needed repair, and
+whether it was served from cache. Each record is emitted as metrics, logged at
+debug level, and added to its session's per-stage totals.
+
+The totals live in a Redis hash per session, so every Celery worker that ran a
+stage contributes to it. While Redis is unavailable they are kept in process.
+The pattern and lead tasks store the totals for their stage on the report row
+(`llm_usage`), so cost and latency can be queried per report.
+
+Queue wait is the time spent waiting for a rate-limiter slot, including 429
+pauses; each 429 requeue counts as a retry, as do stage-level retries and
+fallbacks to the next model in the route. For non-streamed calls the first
+byte only arrives with the complete response, so TTFB equals latency there.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, Optional, Union
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis, redis_healthy, report_redis_failure
+
+
+logger = logging.getLogger(__name__)
+
+USAGE_PREFIX = "llm:usage:"
+
+# Summed per session and stage
+_TOTALS = (
+    "calls", "cache_hits", "errors", "retries", "repairs",
+    "prompt_tokens", "completion_tokens", "latency_seconds", "ttfb_seconds", "queue_wait_seconds",
+)
+
+
+@dataclass
+class LLMCall:
+    """One LLM call, filled in as it progresses."""
+    stage: str
+    model: str
+    session_id: Optional[str] = None
+    provider: Optional[str] = None
+    queue_wait: float = 0.0
+    ttfb: Optional[float] = None
+    latency: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    repaired: bool = False
+    cache_hit: bool = False
+    success: bool = False
+    finish_reason: Optional[str] = None
+    _mark: float = field(default_factory=time.monotonic, repr=False)
+    _sent: Optional[float] = field(default=None, repr=False)
+
+    def sent(self):
+        """The request is leaving now; the time since the last mark was spent queued."""
+        now = time.monotonic()
+        if self._sent is not None:
+            self.retries += 1  # requeued after a 429
+        self.queue_wait += now - self._mark
+        self._sent = now
+        self.ttfb = None
+
+    @property
+    def attempted(self) -> bool:
+        return self._sent is not None
+
+    def first_byte(self):
+        if self.ttfb is None and self._sent is not None:
+            self.ttfb = time.monotonic() - self._sent
+
+    def received(self):
+        """The response (or error) is in; later requeues wait from here."""
+        now = time.monotonic()
+        if self._sent is not None:
+            self.latency = now - self._sent
+            if self.ttfb is None:
+                self.ttfb = self.latency
+        self._mark = now
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in asdict(self).items() if not k.startswith("_")}
+
+
+class LLMTelemetry:
+    """Emits call records as metrics and aggregates them per session and stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def start(self, stage: str, model: str, session_id: Optional[str] = None, retries: int = 0) -> LLMCall:
+        return LLMCall(stage=stage, model=model, session_id=session_id, retries=retries)
+
+    def cache_hit(self, stage: str, session_id: Optional[str] = None):
+        call = LLMCall(stage=stage, model="cache", session_id=session_id, cache_hit=True, success=True)
+        self.record(call)
+
+    def record(self, call: LLMCall):
+        """Emit a finished call and add it to its session's totals; calls that never went out are skipped."""
+        if not (call.cache_hit or call.attempted):
+            return
+        outcome = "cache_hit" if call.cache_hit else ("ok" if call.success else "error")
+        metrics.incr("llm_calls", stage=call.stage, model=call.model, outcome=outcome)
+        if not call.cache_hit:
+            metrics.observe("llm_call_latency_seconds", call.latency, stage=call.stage, model=call.model)
+            metrics.observe("llm_call_queue_wait_seconds", call.queue_wait, stage=call.stage)
+            if call.ttfb is not None:
+                metrics.observe("llm_call_ttfb_seconds", call.ttfb, stage=call.stage, model=call.model)
+            metrics.incr("llm_prompt_tokens", call.prompt_tokens, stage=call.stage, model=call.model)
+            metrics.incr("llm_completion_tokens_total", call.completion_tokens, stage=call.stage, model=call.model)
+            if call.retries:
+                metrics.incr("llm_call_retries", call.retries, stage=call.stage)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("llm_call %s", json.dumps(call.to_dict()))
+        if call.session_id:
+            self._add(call.session_id, call.stage, self._totals(call))
+
+    def _totals(self, call: LLMCall) -> Dict[str, float]:
+        if call.cache_hit:
+            return {"cache_hits": 1}
+        totals = {
+            "calls": 1,
+            "errors": 0 if call.success else 1,
+            "retries": call.retries,
+            "repairs": 1 if call.repaired else 0,
+            "prompt_tokens": call.prompt_tokens,
+            "completion_tokens": call.completion_tokens,
+            "latency_seconds": call.latency,
+            "ttfb_seconds": call.ttfb or 0.0,
+            "queue_wait_seconds": call.queue_wait,
+            f"model:{call.model}": 1,
+        }
+        if call.provider:
+            totals[f"provider:{call.provider}"] = 1
+        return totals
+
+    def _add(self, session_id: str, stage: str, totals: Dict[str, float]):
+        fields = {f"{stage}|{name}": value for name, value in totals.items() if value}
+        if redis_healthy():
+            try:
+                pipe = get_redis().pipeline(transaction=False)
+                for name, value in fields.items():
+                    pipe.hincrbyfloat(USAGE_PREFIX + session_id, name, value)
+                pipe.expire(USAGE_PREFIX + session_id, settings.LLM_USAGE_TTL)
+                pipe.execute()
+                return
+            except Exception as e:
+                report_redis_failure("usage write", e)
+        with self._lock:
+            local = self._local[session_id]
+            for name, value in fields.items():
+                local[name] += value
+
+    def _raw(self, session_id: str) -> Dict[str, float]:
+        raw: Dict[str, float] = {}
+        if redis_healthy():
+            try:
+                stored = get_redis().hgetall(USAGE_PREFIX + session_id)
+                raw = {name.decode(): float(value) for name, value in stored.items()}
+            except Exception as e:
+                report_redis_failure("usage read", e)
+        with self._lock:
+            for name, value in self._local.get(session_id, {}).items():
+                raw[name] = raw.get(name, 0.0) + value
+        return raw
+
+    def usage(self, session_id: str, stages: Union[str, Iterable[str], None] = None) -> Dict[str, Any]:
+        """
+        A session's LLM totals, for one stage, several, or all of them.
+
+        Includes average latency / TTFB / queue wait per upstream call and the
+        calls made per model and provider.
+        """
+        if isinstance(stages, str):
+            stages = [stages]
+        wanted = set(stages) if stages is not None else None
+        summary: Dict[str, Any] = {name: 0 for name in _TOTALS}
+        models: Dict[str, int] = defaultdict(int)
+        providers: Dict[str, int] = defaultdict(int)
+        for key, value in self._raw(session_id).items():
+            stage, _, name = key.partition("|")
+            if wanted is not None and stage not in wanted:
+                continue
+            if name.startswith("model:"):
+                models[name[6:]] += int(value)
+            elif name.startswith("provider:"):
+                providers[name[9:]] += int(value)
+            elif name in summary:
+                summary[name] += value
+
+        for name in ("calls", "cache_hits", "errors", "retries", "repairs", "prompt_tokens", "completion_tokens"):
+            summary[name] = int(summary[name])
+        for name in ("latency_seconds", "ttfb_seconds", "queue_wait_seconds"):
+            summary[name] = round(summary[name], 3)
+            summary[f"avg_{name}"] = round(summary[name] / summary["calls"], 3) if summary["calls"] else 0.0
+        summary["total_tokens"] = summary["prompt_tokens"] + summary["completion_tokens"]
+        summary["models"] = dict(models)
+        summary["providers"] = dict(providers)
+        return summary
+
+    def report_usage(self, session_id: str, stage: str) -> Optional[Dict[str, Any]]:
+        """`usage` for a report row, or None if the stage made no LLM calls (mock generators)."""
+        summary = self.usage(session_id, stage)
+        if not (summary["calls"] or summary["cache_hits"]):
+            return None
+        return summary
+
+
+llm_telemetry = LLMTelemetry()
@@ -0,0 +1,47 @@
+"""
+Process-wide view of the LLM pipeline metrics.
+
+`metrics_report()` puts the metrics registry snapshot next to the LLM cache,
+model router and provider pool stats. The API serves it at ``/metrics``;
+each Celery worker process, where the LLM calls actually run, logs it every
+``METRICS_LOG_INTERVAL`` seconds. Every process keeps its own registry, so
+each report covers only the process it came from.
+"""
+import json
+import logging
+import threading
+from typing import Any, Dict
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.llm_cache import llm_cache
+from app.services.model_router import model_router
+from app.services.provider_pool import provider_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+def metrics_report() -> Dict[str, Any]:
+    return {
+        "metrics": metrics.snapshot(),
+        "llm_cache": llm_cache.stats(),
+        "model_router": model_router.stats(),
+        "provider_pool": provider_pool.stats(),
+    }
+
+
+def _log_forever(stop: threading.Event):
+    while not stop.wait(settings.METRICS_LOG_INTERVAL):
+        try:
+            logger.info("Metrics: %s", json.dumps(metrics_report(), default=str))
+        except Exception as e:
+            logger.warning("Could not log metrics: %s", e)
+
+
+def start_metrics_logging() -> threading.Event:
+    """Log `metrics_report()` periodically from a daemon thread; set the returned event to stop."""
+    stop = threading.Event()
+    if settings.METRICS_LOG_INTERVAL > 0:
+        threading.Thread(target=_log_forever, args=(stop,), name="metrics-log", daemon=True).start()
+    return stop
@@ -0,0 +1,178 @@
+"""
+Cross-session micro-batching of LLM requests.
+
+Calls to one stage that arrive within ``LLM_BATCH_MAX_WAIT`` seconds of each
+other are collected into a batch of at most ``max_items`` and sent as a single
+multi-item prompt, so the shared system prompt and per-request overhead are
+paid once. The first caller of a batch leads it: it waits until the batch is
+full or the window closes, runs the batch function, and hands each waiting
+caller its own answer. No background thread is involved, so the batcher is
+safe in forked Celery workers.
+
+The batch function returns one result per item in submission order. ``None``
+means the batch answer had nothing usable for that item; the caller then
+makes its own single-item call. If the batch call raises, every caller in it
+gets the exception.
+
+Waiting only pays off when other callers are around. A leader that finds no
+other caller of the stage pending or in flight in its process sends at once
+instead of holding the window open, so a lone caller (for instance a prefork
+Celery worker running one task at a time) pays no extra latency. The window is
+spent once a second caller shows up while the first is still in flight, which
+is when there is load to batch: the async API, or threaded / gevent Celery
+pools. Batching across worker processes is not attempted.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _Batch(Generic[T]):
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.items: List[T] = []
+        self.futures: List[Future] = []
+        self.full = threading.Event()
+
+
+class _AsyncBatch(Generic[T]):
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.items: List[T] = []
+        self.futures: List[asyncio.Future] = []
+        self.full = asyncio.Event()
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects concurrent single-item calls for one stage into multi-item calls."""
+
+    def __init__(
+        self,
+        stage: str,
+        flush: Callable[[List[T]], List[Optional[R]]],
+        flush_async: Callable[[List[T]], Awaitable[List[Optional[R]]]],
+        max_items: Callable[[], int],
+    ):
+        self.stage = stage
+        self._flush = flush
+        self._flush_async = flush_async
+        self._max_items = max_items
+        self._lock = threading.Lock()
+        self._open: Optional[_Batch] = None
+        self._open_async: Dict[int, _AsyncBatch] = {}
+        # Callers inside submit / submit_async, waiting or in flight (async ones per event loop)
+        self._active = 0
+        self._active_async: Dict[int, int] = {}
+
+    def _capacity(self) -> int:
+        return max(1, min(settings.LLM_BATCH_MAX_ITEMS, self._max_items()))
+
+    def _record(self, size: int):
+        metrics.incr("llm_batches", stage=self.stage)
+        metrics.observe("llm_batch_size", size, stage=self.stage)
+
+    def submit(self, item: T) -> Optional[R]:
+        """Add `item` to the stage's open batch and block until its answer is ready."""
+        future: Future = Future()
+        with self._lock:
+            self._active += 1
+            alone = self._active == 1
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch(self._capacity())
+            batch.items.append(item)
+            batch.futures.append(future)
+            if len(batch.items) >= batch.capacity:
+                self._open = None
+                batch.full.set()
+
+        try:
+            if not leader:
+                return future.result()
+
+            if alone:
+                metrics.incr("llm_batch_unwaited", stage=self.stage)
+            else:
+                batch.full.wait(settings.LLM_BATCH_MAX_WAIT)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._record(len(batch.items))
+            try:
+                results = self._flush(list(batch.items))
+            except BaseException as e:
+                for waiter in batch.futures:
+                    waiter.set_exception(e)
+            else:
+                for waiter, result in zip(batch.futures, results):
+                    waiter.set_result(result)
+            return future.result()
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    async def submit_async(self, item: T) -> Optional[R]:
+        """Awaitable `submit`; batches are formed per event loop."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._active_async[id(loop)] = self._active_async.get(id(loop), 0) + 1
+        try:
+            return await self._submit_async(loop, future, item)
+        finally:
+            self._active_async[id(loop)] -= 1
+            if not self._active_async[id(loop)]:
+                del self._active_async[id(loop)]
+
+    async def _submit_async(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future, item: T) -> Optional[R]:
+        batch = self._open_async.get(id(loop))
+        leader = batch is None
+        if leader:
+            batch = self._open_async[id(loop)] = _AsyncBatch(self._capacity())
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= batch.capacity:
+            self._open_async.pop(id(loop), None)
+            batch.full.set()
+
+        if not leader:
+            return await future
+
+        try:
+            try:
+                # Let callers already scheduled on the loop join before deciding the leader is alone
+                await asyncio.sleep(0)
+                if self._active_async.get(id(loop), 0) <= 1:
+                    metrics.incr("llm_batch_unwaited", stage=self.stage)
+                else:
+                    await asyncio.wait_for(batch.full.wait(), settings.LLM_BATCH_MAX_WAIT)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if self._open_async.get(id(loop)) is batch:
+                    del self._open_async[id(loop)]
+            self._record(len(batch.items))
+            results = await self._flush_async(list(batch.items))
+        except asyncio.CancelledError:
+            # The leader was cancelled; release the followers to make their own calls
+            for waiter in batch.futures:
+                if not waiter.done():
+                    waiter.set_result(None)
+            raise
+        except Exception as e:
+            for waiter in batch.futures:
+                if not waiter.done():
+                    waiter.set_exception(e)
+        else:
+            for waiter, result in zip(batch.futures, results):
+                if not waiter.done():
+                    waiter.set_result(result)
+        return await future
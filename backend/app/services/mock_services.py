@@ -1,18 +1,43 @@
 """
 Mock services for development - will be replaced with real AI/agent implementations
 """
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional
+import random
 import uuid
 from datetime import datetime
 from app.models.intent import IntentExtractionResult
 from app.core.config import settings
 
-# Import real LLM service if available
-try:
-    from app.services.llm_service import llm_service
-    LLM_AVAILABLE = True
-except ImportError:
-    LLM_AVAILABLE = False
+
+def _get_llm_service():
+    """
+    The real LLM service, imported on first use so that processes which never
+    take the LLM path (the API) do not load the client; None if unavailable.
+    """
+    try:
+        from app.services.llm_service import get_llm_service
+    except ImportError:
+        return None
+    return get_llm_service()
+
+
+def _use_real_llm(session_id: Optional[str]) -> bool:
+    """Real LLM path is on, and the provider circuit is not open."""
+    if not (settings.USE_REAL_LLM and session_id):
+        return False
+    if settings.LLM_BREAKER_ENABLED:
+        from app.services.circuit_breaker import circuit_breaker
+        if circuit_breaker.is_open():
+            circuit_breaker.log_fallback()
+            return False
+    return _get_llm_service() is not None
+
+
+def _unwrap_llm_result(result: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """Return the payload of a GTMLLMService result, raising if the call failed."""
+    if not result.get("success"):
+        raise Exception(result.get("error", "LLM call failed"))
+    return result[key]
 
 
 def mock_intent_extraction(user_input: str, session_id: str = None) -> Dict[str, Any]:
@@ -20,9 +45,11 @@ def mock_intent_extraction(user_input: str, session_id: str = None) -> Dict[str,
     Intent extraction - uses real LLM if available, otherwise falls back to mock.
     """
     # Use real LLM if enabled and available
-    if settings.USE_REAL_LLM and LLM_AVAILABLE and session_id:
+    if _use_real_llm(session_id):
         try:
-            return llm_service.extract_intent(user_input, session_id)
+            intent = _unwrap_llm_result(_get_llm_service().extract_intent(user_input, session_id), "intent")
+            # Callers attach raw_input/confidence/extracted_at themselves
+            return {key: intent.get(key) for key in ("industry", "country", "company_size", "goal")}
         except Exception as e:
             # Fall back to mock on error
             print(f"LLM service failed, falling back to mock: {e}")
@@ -65,9 +92,9 @@ def mock_pattern_discovery(intent: Dict[str, Any], session_id: str = None) -> Di
     Pattern discovery - uses real LLM if available, otherwise falls back to mock.
     """
     # Use real LLM if enabled and available
-    if settings.USE_REAL_LLM and LLM_AVAILABLE and session_id:
+    if _use_real_llm(session_id):
         try:
-            return llm_service.discover_patterns(intent, session_id)
+            return _unwrap_llm_result(_get_llm_service().discover_patterns(intent, session_id), "pattern_report")
         except Exception as e:
             # Fall back to mock on error
             print(f"LLM service failed, falling back to mock: {e}")
@@ -104,15 +131,69 @@ def mock_pattern_discovery(intent: Dict[str, Any], session_id: str = None) -> Di
     }
 
 
-def mock_lead_generation(pattern_report: Dict[str, Any], session_id: str = None) -> Dict[str, Any]:
+def mock_company_discovery(intent: Dict[str, Any], limit: int) -> list:
+    """
+    Candidate companies in the intent's market, as CompanyData dicts.
+    Stands in for a Crunchbase / LinkedIn search until those APIs are wired up;
+    the same market always yields the same companies.
+    """
+    industry = intent.get("industry") or "SaaS"
+    country = intent.get("country") or "United States"
+    rng = random.Random(f"{industry}|{country}")
+    prefixes = ["Cloud", "Data", "Pay", "Health", "Smart", "Flow", "Secure", "Insight", "Scale", "Bright", "Nova", "Core"]
+    suffixes = ["Labs", "Systems", "Works", "Hub", "Logic", "Stack", "Pilot", "Grid", "Base", "Link"]
+    models = ["B2B SaaS", "Marketplace", "API platform", "Managed service"]
+    technologies = ["Kubernetes", "Stripe", "Snowflake", "React", "HubSpot", "Segment", "Salesforce", "PostgreSQL"]
+    
+    companies = []
+    for index in range(limit):
+        name = f"{rng.choice(prefixes)}{rng.choice(suffixes)}" + (f" {index // 100 + 1}" if index >= 100 else "")
+        slug = name.lower().replace(" ", "")
+        companies.append({
+            "id": f"mock-{slug}-{index}",
+            "name": name,
+            "industry": industry if rng.random() < 0.85 else rng.choice(["SaaS", "FinTech", "HealthTech", "E-commerce"]),
+            "country": country if rng.random() < 0.9 else "United States",
+            "website": f"https://{slug}.example" if rng.random() < 0.9 else None,
+            "description": f"{name} builds {industry} software for mid-market teams" if rng.random() < 0.8 else None,
+            "founded_year": rng.randint(2005, 2023) if rng.random() < 0.9 else None,
+            "employee_count": rng.choice([12, 35, 80, 150, 400, 1200]) if rng.random() < 0.85 else None,
+            "revenue": rng.choice([0.5e6, 2e6, 8e6, 25e6, 90e6]) if rng.random() < 0.6 else None,
+            "funding": rng.choice([1e6, 5e6, 18e6, 60e6, 150e6]) if rng.random() < 0.7 else None,
+            "business_model": rng.choice(models),
+            "technologies": rng.sample(technologies, rng.randint(0, 4)),
+            "source": "mock",
+        })
+    return companies
+
+
+def mock_lead_generation(
+    pattern_report: Dict[str, Any],
+    session_id: str = None,
+    on_lead: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
     """
     Lead generation - uses real LLM if available, otherwise falls back to mock.
+    `on_lead` is called with each lead as soon as it is available.
     """
     # Use real LLM if enabled and available
-    if settings.USE_REAL_LLM and LLM_AVAILABLE and session_id:
+    if _use_real_llm(session_id):
+        emitted = []
+        
+        def on_real_lead(lead: Dict[str, Any]):
+            if on_lead:
+                on_lead(lead)
+            emitted.append(lead)
+        
         try:
-            return llm_service.generate_leads(pattern_report, session_id)
+            return _unwrap_llm_result(
+                _get_llm_service().generate_leads(pattern_report, session_id, on_lead=on_real_lead if on_lead else None),
+                "lead_report"
+            )
         except Exception as e:
+            # Mock leads would not match the real ones the caller already received
+            if emitted:
+                raise
             # Fall back to mock on error
             print(f"LLM service failed, falling back to mock: {e}")
     
@@ -185,6 +266,8 @@ def mock_lead_generation(pattern_report: Dict[str, Any], session_id: str = None)
             "model_version": "1.0"
         }
         leads.append(lead_analysis)
+        if on_lead:
+            on_lead(lead_analysis)
     
     # Calculate metrics
     average_quality = total_quality / len(leads) if leads else 0.0
@@ -0,0 +1,71 @@
+"""
+Per-stage model routing for LLM calls.
+
+Each stage maps to an ordered model chain (``LLM_STAGE_ROUTES``) and a latency
+SLO (``LLM_STAGE_LATENCY_TARGETS``). The entries "fast" and "advanced" resolve
+to ``GEN_FAST_MODEL`` / ``GEN_ADVANCED_MODEL``; anything else is used as an
+OpenRouter model id. Latency is recorded per (stage, model) route so p50/p95/p99
+can be compared against the SLO when tuning the table.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_METRIC = "llm_route_latency_seconds"
+
+
+class ModelRouter:
+    """Resolves stages to model chains and records per-route latency."""
+
+    def _resolve(self, name: str) -> str:
+        if name == "fast":
+            return settings.GEN_FAST_MODEL
+        if name == "advanced":
+            return settings.GEN_ADVANCED_MODEL
+        return name
+
+    def models(self, stage: str) -> List[str]:
+        """Ordered, de-duplicated model chain for `stage` (primary first)."""
+        chain: List[str] = []
+        for name in settings.LLM_STAGE_ROUTES.get(stage, ["advanced"]):
+            model = self._resolve(name)
+            if model and model not in chain:
+                chain.append(model)
+        return chain or [settings.GEN_ADVANCED_MODEL]
+
+    def slo(self, stage: str) -> Optional[float]:
+        return settings.LLM_STAGE_LATENCY_TARGETS.get(stage)
+
+    def record(self, stage: str, model: str, latency: float, success: bool):
+        """Record one upstream attempt on a route."""
+        outcome = "success" if success else "error"
+        metrics.incr("llm_route_requests", stage=stage, model=model, outcome=outcome)
+        if not success:
+            return
+        metrics.observe(LATENCY_METRIC, latency, stage=stage, model=model)
+        slo = self.slo(stage)
+        if slo is not None and latency > slo:
+            metrics.incr("llm_route_slo_breaches", stage=stage, model=model)
+
+    def record_fallback(self, stage: str, model: str, error: Exception):
+        metrics.incr("llm_route_fallbacks", stage=stage, model=model)
+        logger.warning("LLM route %s: %s failed (%s), trying next model", stage, model, error)
+
+    def stats(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Per-stage route latency (count/p50/p95/p99) next to the stage SLO."""
+        report: Dict[str, List[Dict[str, Any]]] = {}
+        for stage in settings.LLM_STAGE_ROUTES:
+            routes = []
+            for model in self.models(stage):
+                summary = metrics.histogram(LATENCY_METRIC, stage=stage, model=model) or {"count": 0, "p50": None, "p95": None, "p99": None}
+                routes.append(dict(summary, model=model, slo=self.slo(stage)))
+            report[stage] = routes
+        return report
+
+
+model_router = ModelRouter()
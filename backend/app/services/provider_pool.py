@@ -0,0 +1,328 @@
+"""
+Weighted, latency-aware load balancing across OpenRouter providers.
+
+Every chat completion is pinned to one provider from ``LLM_PROVIDERS``
+(``"provider": {"only": [name]}``). The provider is drawn at random with a
+weight of
+
+    base weight * (fastest p95 / provider p95) * (1 - error rate) ** 2
+
+computed over each provider's last ``LLM_PROVIDER_WINDOW`` calls in this
+process; a provider with fewer than ``LLM_PROVIDER_MIN_SAMPLES`` calls gets
+its base weight (``LLM_PROVIDER_WEIGHTS``, default 1.0) until it has history.
+
+A provider whose error rate reaches ``LLM_PROVIDER_ERROR_THRESHOLD``, or that
+fails ``LLM_PROVIDER_FAILURE_STREAK`` calls in a row, is skipped for
+``LLM_PROVIDER_COOLDOWN`` seconds and then starts over with a clean window.
+A failed call is retried on the next provider, up to
+``LLM_PROVIDER_MAX_ATTEMPTS`` providers per call; a 429 is not retried here
+and does not count against the provider's health, but is handed to the rate
+limiter, which requeues it.
+
+In-flight calls per provider are capped by ``LLM_PROVIDER_MAX_CONCURRENCY``
+across all workers, using leased Redis slots like the rate limiter. Without
+Redis the cap is enforced per process. When every provider stays full for
+``LLM_RATE_LIMIT_MAX_WAIT`` the call fails with ``PoolBusyError``, which the
+rate limiter passes through without lowering its concurrency limit.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis, redis_healthy, report_redis_failure
+from app.services.hedging import HedgeCancelled
+from app.services.rate_limiter import PoolBusyError, RateLimitError
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+KEY_PREFIX = "llm:provider:"
+
+LATENCY_METRIC = "llm_provider_latency_seconds"
+
+# Returns 1 if a slot was taken, 0 if the provider is at its cap.
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[4]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[2])
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[3]))
+return 1
+"""
+
+
+class _ProviderState:
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=settings.LLM_PROVIDER_WINDOW)
+        self.outcomes: Deque[bool] = deque(maxlen=settings.LLM_PROVIDER_WINDOW)
+        self.failure_streak = 0
+        self.down_until = 0.0
+        self.inflight = 0
+
+    def reset(self):
+        self.latencies.clear()
+        self.outcomes.clear()
+        self.failure_streak = 0
+        self.down_until = 0.0
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < settings.LLM_PROVIDER_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def error_rate(self) -> Optional[float]:
+        if len(self.outcomes) < settings.LLM_PROVIDER_MIN_SAMPLES:
+            return None
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class ProviderPool:
+    """Picks a provider per call, tracks provider health and caps per-provider concurrency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[str, _ProviderState] = {}
+
+    def providers(self) -> List[str]:
+        return list(dict.fromkeys(settings.LLM_PROVIDERS))
+
+    def _state(self, provider: str) -> _ProviderState:
+        state = self._states.get(provider)
+        if state is None:
+            state = self._states[provider] = _ProviderState()
+        return state
+
+    def _cap(self, provider: str) -> int:
+        return settings.LLM_PROVIDER_MAX_CONCURRENCY.get(provider, settings.LLM_PROVIDER_DEFAULT_CONCURRENCY)
+
+    def _healthy(self, state: _ProviderState, now: float) -> bool:
+        if state.down_until > now:
+            return False
+        if state.down_until:
+            # Cooldown over: forget the bad spell and try the provider again
+            state.reset()
+        return True
+
+    def weights(self) -> Dict[str, float]:
+        """Current selection weight per provider; 0 for providers in cooldown."""
+        now = time.monotonic()
+        with self._lock:
+            states = {provider: self._state(provider) for provider in self.providers()}
+            healthy = {provider for provider, state in states.items() if self._healthy(state, now)}
+            p95s = [p95 for p95 in (states[provider].p95() for provider in healthy) if p95]
+            fastest = min(p95s) if p95s else None
+            weights: Dict[str, float] = {}
+            for provider, state in states.items():
+                if provider not in healthy:
+                    weights[provider] = 0.0
+                    continue
+                weight = settings.LLM_PROVIDER_WEIGHTS.get(provider, 1.0)
+                p95 = state.p95()
+                if fastest and p95:
+                    weight *= max(0.05, fastest / p95)
+                error_rate = state.error_rate()
+                if error_rate is not None:
+                    weight *= max(0.01, (1.0 - error_rate) ** 2)
+                weights[provider] = weight
+        return weights
+
+    def _ranked(self, exclude: Set[str]) -> List[str]:
+        """Healthy providers in weighted random order, or all of them by recovery time if none is healthy."""
+        weights = {p: w for p, w in self.weights().items() if p not in exclude}
+        pool = {p: w for p, w in weights.items() if w > 0}
+        if not pool:
+            with self._lock:
+                return sorted(weights, key=lambda p: self._state(p).down_until)
+        ranked: List[str] = []
+        while pool:
+            provider = random.choices(list(pool), weights=list(pool.values()))[0]
+            ranked.append(provider)
+            del pool[provider]
+        return ranked
+
+    def _try_acquire(self, provider: str, token: str) -> bool:
+        if redis_healthy():
+            try:
+                now = int(time.time() * 1000)
+                lease = int(settings.LLM_RATE_LIMIT_LEASE_SECONDS * 1000)
+                if not get_redis().eval(_ACQUIRE_SCRIPT, 1, f"{KEY_PREFIX}inflight:{provider}", now, token, lease, self._cap(provider)):
+                    return False
+            except Exception as e:
+                report_redis_failure("provider pool acquire", e)
+                token = ""
+        else:
+            token = ""
+        with self._lock:
+            state = self._state(provider)
+            if not token and state.inflight >= self._cap(provider):
+                return False
+            state.inflight += 1
+        return True
+
+    def _release(self, provider: str, token: str):
+        with self._lock:
+            self._state(provider).inflight -= 1
+        if not redis_healthy():
+            return
+        try:
+            get_redis().zrem(f"{KEY_PREFIX}inflight:{provider}", token)
+        except Exception as e:
+            report_redis_failure("provider pool release", e)
+
+    def _pick(self, exclude: Set[str]) -> Tuple[Optional[str], str]:
+        """Take a slot on the best-ranked provider with room; (None, token) if all are full."""
+        token = uuid.uuid4().hex
+        for provider in self._ranked(exclude):
+            if self._try_acquire(provider, token):
+                return provider, token
+        return None, token
+
+    def acquire(self, exclude: Set[str]) -> Tuple[str, str]:
+        """Block until a provider outside `exclude` has a free slot; returns (provider, slot token)."""
+        deadline = time.monotonic() + settings.LLM_RATE_LIMIT_MAX_WAIT
+        while True:
+            provider, token = self._pick(exclude)
+            if provider:
+                return provider, token
+            if time.monotonic() >= deadline:
+                metrics.incr("llm_provider_saturated")
+                raise PoolBusyError("All LLM providers are at their concurrency limit.", settings.LLM_RATE_LIMIT_POLL_INTERVAL)
+            time.sleep(settings.LLM_RATE_LIMIT_POLL_INTERVAL)
+
+    async def acquire_async(self, exclude: Set[str]) -> Tuple[str, str]:
+        """Async counterpart of `acquire`."""
+        deadline = time.monotonic() + settings.LLM_RATE_LIMIT_MAX_WAIT
+        while True:
+            provider, token = await asyncio.to_thread(self._pick, exclude)
+            if provider:
+                return provider, token
+            if time.monotonic() >= deadline:
+                metrics.incr("llm_provider_saturated")
+                raise PoolBusyError("All LLM providers are at their concurrency limit.", settings.LLM_RATE_LIMIT_POLL_INTERVAL)
+            await asyncio.sleep(settings.LLM_RATE_LIMIT_POLL_INTERVAL)
+
+    def record(self, provider: str, latency: float, success: bool):
+        """Add one call to the provider's window and take it out of rotation if it is failing."""
+        metrics.incr("llm_provider_requests", provider=provider, outcome="success" if success else "error")
+        if success:
+            metrics.observe(LATENCY_METRIC, latency, provider=provider)
+        with self._lock:
+            state = self._state(provider)
+            state.outcomes.append(success)
+            if success:
+                state.latencies.append(latency)
+                state.failure_streak = 0
+                return
+            state.failure_streak += 1
+            error_rate = state.error_rate()
+            failing = state.failure_streak >= settings.LLM_PROVIDER_FAILURE_STREAK or (
+                error_rate is not None and error_rate >= settings.LLM_PROVIDER_ERROR_THRESHOLD
+            )
+            if not failing or state.down_until > time.monotonic():
+                return
+            state.down_until = time.monotonic() + settings.LLM_PROVIDER_COOLDOWN
+        metrics.incr("llm_provider_ejections", provider=provider)
+        logger.warning("LLM provider %s is failing, skipping it for %.0fs", provider, settings.LLM_PROVIDER_COOLDOWN)
+
+    def _pin(self, payload: Dict[str, Any], provider: str) -> Dict[str, Any]:
+        return dict(payload, provider=dict(payload.get("provider") or {}, only=[provider]))
+
+    def call(
+        self,
+        payload: Dict[str, Any],
+        send: Callable[[Dict[str, Any]], T],
+        can_retry: Callable[[], bool] = lambda: True,
+    ) -> T:
+        """
+        Send `payload` pinned to one provider, failing over to the next
+        provider on error while `can_retry()` allows it (a stream that has
+        already emitted text cannot be restarted elsewhere).
+        """
+        tried: Set[str] = set()
+        while True:
+            provider, token = self.acquire(tried)
+            tried.add(provider)
+            started = time.monotonic()
+            try:
+                result = send(self._pin(payload, provider))
+            except RateLimitError:
+                # Upstream pushback, not a sick provider; the rate limiter backs off
+                metrics.incr("llm_provider_requests", provider=provider, outcome="rate_limited")
+                raise
+            except HedgeCancelled:
+                # Abandoned by the hedger, says nothing about the provider
+                raise
+            except Exception as e:
+                self.record(provider, time.monotonic() - started, False)
+                if not self._failover(provider, tried, e, can_retry):
+                    raise
+                continue
+            finally:
+                self._release(provider, token)
+            self.record(provider, time.monotonic() - started, True)
+            return result
+
+    async def call_async(self, payload: Dict[str, Any], send: Callable[[Dict[str, Any]], Awaitable[T]]) -> T:
+        """Async counterpart of `call`."""
+        tried: Set[str] = set()
+        while True:
+            provider, token = await self.acquire_async(tried)
+            tried.add(provider)
+            started = time.monotonic()
+            try:
+                result = await send(self._pin(payload, provider))
+            except RateLimitError:
+                # Upstream pushback, not a sick provider; the rate limiter backs off
+                metrics.incr("llm_provider_requests", provider=provider, outcome="rate_limited")
+                raise
+            except Exception as e:
+                self.record(provider, time.monotonic() - started, False)
+                if not self._failover(provider, tried, e, lambda: True):
+                    raise
+                continue
+            finally:
+                await asyncio.to_thread(self._release, provider, token)
+            self.record(provider, time.monotonic() - started, True)
+            return result
+
+    def _failover(self, provider: str, tried: Set[str], error: Exception, can_retry: Callable[[], bool]) -> bool:
+        if len(tried) >= min(settings.LLM_PROVIDER_MAX_ATTEMPTS, len(self.providers())) or not can_retry():
+            return False
+        metrics.incr("llm_provider_failovers", provider=provider)
+        logger.warning("LLM provider %s failed (%s), trying another provider", provider, error)
+        return True
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-provider weight, health and latency, for tuning the pool."""
+        weights = self.weights()
+        now = time.monotonic()
+        report = []
+        with self._lock:
+            for provider in self.providers():
+                state = self._state(provider)
+                report.append({
+                    "provider": provider,
+                    "weight": round(weights.get(provider, 0.0), 4),
+                    "healthy": state.down_until <= now,
+                    "p95": state.p95(),
+                    "error_rate": state.error_rate(),
+                    "samples": len(state.outcomes),
+                    "inflight": state.inflight,
+                    "max_concurrency": self._cap(provider),
+                })
+        return report
+
+
+provider_pool = ProviderPool()
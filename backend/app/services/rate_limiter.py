@@ -0,0 +1,276 @@
+"""
+Shared adaptive rate limiter for OpenRouter calls.
+
+All Celery workers and the API process coordinate through Redis:
+
+* a token bucket per stage caps request rate; each stage gets a share of
+  ``LLM_RATE_LIMIT_RPS`` so bulk lead generation cannot starve interactive
+  intent extraction;
+* a concurrency limit adapts AIMD-style: it grows additively while calls
+  succeed within the stage latency target and is cut multiplicatively on a
+  429 or a slow call. Each stage may hold its share of that limit;
+* a 429's ``Retry-After`` pauses every caller until it has passed.
+
+Callers are queued (they sleep and retry) instead of failing, up to
+``LLM_RATE_LIMIT_MAX_WAIT``. If Redis is unreachable the limiter only honours
+Retry-After pauses seen by this process.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis, redis_healthy, report_redis_failure
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+KEY_PREFIX = "llm:ratelimit:"
+
+# Returns 0 when a slot and a token were taken, >0 ms to wait, -1 if the stage is at its concurrency share.
+_ACQUIRE_SCRIPT = """
+local inflight_key, limit_key, pause_key, bucket_key = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local now = tonumber(ARGV[1])
+local token = ARGV[2]
+local lease_ms = tonumber(ARGV[3])
+local default_limit = tonumber(ARGV[4])
+local share = tonumber(ARGV[5])
+local rate = tonumber(ARGV[6])
+local capacity = tonumber(ARGV[7])
+
+local pause_until = tonumber(redis.call('GET', pause_key) or '0')
+if pause_until > now then
+    return pause_until - now
+end
+
+redis.call('ZREMRANGEBYSCORE', inflight_key, '-inf', now)
+local limit = tonumber(redis.call('GET', limit_key) or default_limit)
+local stage_slots = math.max(1, math.floor(limit * share))
+if redis.call('ZCARD', inflight_key) >= stage_slots then
+    return -1
+end
+
+local bucket = redis.call('HMGET', bucket_key, 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) / 1000 * rate)
+if tokens < 1 then
+    redis.call('HSET', bucket_key, 'tokens', tokens, 'ts', now)
+    return math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', bucket_key, 'tokens', tokens - 1, 'ts', now)
+redis.call('PEXPIRE', bucket_key, math.ceil(capacity / rate * 1000) + 60000)
+redis.call('ZADD', inflight_key, now + lease_ms, token)
+return 0
+"""
+
+_ADJUST_SCRIPT = """
+local limit = tonumber(redis.call('GET', KEYS[1]) or ARGV[5])
+if ARGV[1] == 'increase' then
+    limit = limit + tonumber(ARGV[2]) / limit
+else
+    limit = limit * tonumber(ARGV[2])
+end
+limit = math.max(tonumber(ARGV[3]), math.min(tonumber(ARGV[4]), limit))
+redis.call('SET', KEYS[1], limit)
+return tostring(limit)
+"""
+
+
+class RateLimitError(Exception):
+    """Upstream returned 429, or a caller waited too long for a slot."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PoolBusyError(RateLimitError):
+    """Our own per-provider concurrency caps are full; upstream did not push back."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Redis-coordinated token bucket plus AIMD concurrency limit."""
+
+    def __init__(self):
+        self._local_pause_until = 0.0
+
+    def _stage_share(self, stage: str) -> float:
+        shares = settings.LLM_RATE_LIMIT_STAGE_SHARES
+        return shares.get(stage, min(shares.values()) if shares else 1.0)
+
+    def _keys(self, stage: str) -> Tuple[str, str, str, str]:
+        return (
+            f"{KEY_PREFIX}inflight:{stage}",
+            f"{KEY_PREFIX}limit",
+            f"{KEY_PREFIX}pause_until",
+            f"{KEY_PREFIX}bucket:{stage}",
+        )
+
+    def _try_acquire(self, stage: str, token: str) -> float:
+        """One acquisition attempt; returns seconds to wait (0 means acquired)."""
+        now = time.time()
+        if self._local_pause_until > now:
+            return self._local_pause_until - now
+        if not redis_healthy():
+            return 0.0
+
+        share = self._stage_share(stage)
+        rate = max(settings.LLM_RATE_LIMIT_RPS * share, 0.001)
+        capacity = max(1.0, rate * settings.LLM_RATE_LIMIT_BURST_SECONDS)
+        try:
+            result = get_redis().eval(
+                _ACQUIRE_SCRIPT, 4, *self._keys(stage),
+                int(now * 1000), token, int(settings.LLM_RATE_LIMIT_LEASE_SECONDS * 1000),
+                settings.LLM_CONCURRENCY_INITIAL, share, rate, capacity,
+            )
+        except Exception as e:
+            report_redis_failure("rate limiter acquire", e)
+            return 0.0
+
+        result = int(result)
+        if result < 0:
+            return settings.LLM_RATE_LIMIT_POLL_INTERVAL
+        return result / 1000
+
+    def _release(self, stage: str, token: str):
+        if not redis_healthy():
+            return
+        try:
+            get_redis().zrem(self._keys(stage)[0], token)
+        except Exception as e:
+            report_redis_failure("rate limiter release", e)
+
+    def _adjust(self, direction: str, amount: float):
+        if not redis_healthy():
+            return
+        try:
+            limit = get_redis().eval(
+                _ADJUST_SCRIPT, 1, f"{KEY_PREFIX}limit",
+                direction, amount, settings.LLM_CONCURRENCY_MIN, settings.LLM_CONCURRENCY_MAX,
+                settings.LLM_CONCURRENCY_INITIAL,
+            )
+            logger.debug("LLM concurrency limit %s to %s", direction, limit)
+        except Exception as e:
+            report_redis_failure("rate limiter adjust", e)
+
+    def acquire(self, stage: str) -> Tuple[str, float]:
+        """Block until the stage may call upstream; returns (slot token, seconds queued)."""
+        token = uuid.uuid4().hex
+        started = time.monotonic()
+        deadline = started + settings.LLM_RATE_LIMIT_MAX_WAIT
+        while True:
+            wait = self._try_acquire(stage, token)
+            if wait <= 0:
+                queued = time.monotonic() - started
+                metrics.incr("llm_rate_limit_wait_seconds", queued, stage=stage)
+                return token, queued
+            if time.monotonic() + wait > deadline:
+                metrics.incr("llm_rate_limit_rejections", stage=stage)
+                raise RateLimitError("Rate limit exceeded. Please wait a few minutes before trying again.", wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, stage: str) -> Tuple[str, float]:
+        """Async counterpart of `acquire`."""
+        token = uuid.uuid4().hex
+        started = time.monotonic()
+        deadline = started + settings.LLM_RATE_LIMIT_MAX_WAIT
+        while True:
+            wait = await asyncio.to_thread(self._try_acquire, stage, token)
+            if wait <= 0:
+                queued = time.monotonic() - started
+                metrics.incr("llm_rate_limit_wait_seconds", queued, stage=stage)
+                return token, queued
+            if time.monotonic() + wait > deadline:
+                metrics.incr("llm_rate_limit_rejections", stage=stage)
+                raise RateLimitError("Rate limit exceeded. Please wait a few minutes before trying again.", wait)
+            await asyncio.sleep(wait)
+
+    def record_success(self, stage: str, latency: float):
+        """Additive increase while calls meet the stage latency target; back off when slow."""
+        target = settings.LLM_STAGE_LATENCY_TARGETS.get(stage)
+        if target is not None and latency > target:
+            self._adjust("decrease", settings.LLM_CONCURRENCY_SLOW_FACTOR)
+        else:
+            self._adjust("increase", settings.LLM_CONCURRENCY_INCREASE)
+
+    def record_rate_limited(self, stage: str, retry_after: Optional[float]):
+        """Multiplicative decrease and a shared pause for Retry-After."""
+        metrics.incr("llm_rate_limited", stage=stage)
+        self._adjust("decrease", settings.LLM_CONCURRENCY_DECREASE_FACTOR)
+        pause = retry_after if retry_after is not None else settings.LLM_RATE_LIMIT_DEFAULT_BACKOFF
+        self._local_pause_until = max(self._local_pause_until, time.time() + pause)
+        if not redis_healthy():
+            return
+        try:
+            get_redis().set(f"{KEY_PREFIX}pause_until", int(self._local_pause_until * 1000), px=int(pause * 1000) + 1000)
+        except Exception as e:
+            report_redis_failure("rate limiter pause", e)
+
+    def call(self, stage: str, fn: Callable[[], T]) -> T:
+        """
+        Run `fn` under the limiter. A 429 from `fn` (RateLimitError) requeues
+        the caller after the shared pause instead of failing it. PoolBusyError
+        is passed through as is: the pool already waited for a slot, and a full
+        pool says nothing about upstream capacity.
+        """
+        deadline = time.monotonic() + settings.LLM_RATE_LIMIT_MAX_WAIT
+        while True:
+            token, _ = self.acquire(stage)
+            started = time.monotonic()
+            try:
+                result = fn()
+            except PoolBusyError:
+                raise
+            except RateLimitError as e:
+                self.record_rate_limited(stage, e.retry_after)
+                if time.monotonic() >= deadline:
+                    raise
+                continue
+            finally:
+                self._release(stage, token)
+            self.record_success(stage, time.monotonic() - started)
+            return result
+
+    async def call_async(self, stage: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async counterpart of `call`."""
+        deadline = time.monotonic() + settings.LLM_RATE_LIMIT_MAX_WAIT
+        while True:
+            token, _ = await self.acquire_async(stage)
+            started = time.monotonic()
+            try:
+                result = await fn()
+            except PoolBusyError:
+                raise
+            except RateLimitError as e:
+                await asyncio.to_thread(self.record_rate_limited, stage, e.retry_after)
+                if time.monotonic() >= deadline:
+                    raise
+                continue
+            finally:
+                await asyncio.to_thread(self._release, stage, token)
+            await asyncio.to_thread(self.record_success, stage, time.monotonic() - started)
+            return result
+
+
+rate_limiter = AdaptiveRateLimiter()
@@ -0,0 +1,183 @@
+"""
+Single-flight coalescing of identical LLM requests.
+
+Only one caller per prompt hash goes upstream at a time. Across Celery worker
+processes this is enforced with a Redis lease (SET NX PX); inside a process,
+threads or tasks waiting on the same key block on an event instead of polling
+Redis. Followers read the leader's result back out of the response cache. If
+the leader dies, the lease expires, or the wait budget runs out, a follower
+falls back to making the call itself, so coalescing never turns into an outage.
+"""
+import asyncio
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis, redis_healthy, report_redis_failure
+
+T = TypeVar("T")
+
+LEASE_PREFIX = "llm:inflight:"
+
+# Delete the lease only if we still own it.
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key."""
+
+    def __init__(self):
+        self._local: Dict[str, threading.Event] = {}
+        self._local_lock = threading.Lock()
+        self._local_async: Dict[Tuple[int, str], asyncio.Event] = {}
+
+    def _acquire_lease(self, key: str) -> Optional[str]:
+        """Return a lease token if we own the key, None if someone else does."""
+        token = uuid.uuid4().hex
+        if not redis_healthy():
+            # Without Redis we cannot coordinate across processes; lead locally.
+            return token
+        try:
+            acquired = get_redis().set(
+                LEASE_PREFIX + key, token, nx=True, px=int(settings.LLM_SINGLE_FLIGHT_LEASE_SECONDS * 1000)
+            )
+        except Exception as e:
+            report_redis_failure("single-flight lease", e)
+            return token
+        return token if acquired else None
+
+    def _release_lease(self, key: str, token: str):
+        if not redis_healthy():
+            return
+        try:
+            get_redis().eval(_RELEASE_SCRIPT, 1, LEASE_PREFIX + key, token)
+        except Exception as e:
+            report_redis_failure("single-flight release", e)
+
+    def _lease_held(self, key: str) -> bool:
+        try:
+            return bool(get_redis().exists(LEASE_PREFIX + key))
+        except Exception:
+            return False
+
+    def do(self, key: str, stage: str, leader: Callable[[], T], follower: Callable[[], Optional[T]]) -> T:
+        """
+        Run `leader` if this caller wins `key`; otherwise wait for `follower`
+        to return the leader's result.
+        """
+        with self._local_lock:
+            local_event = self._local.get(key)
+            is_local_leader = local_event is None
+            if is_local_leader:
+                local_event = threading.Event()
+                self._local[key] = local_event
+
+        if not is_local_leader:
+            metrics.incr("llm_single_flight_followers", stage=stage, scope="local")
+            local_event.wait(settings.LLM_SINGLE_FLIGHT_MAX_WAIT)
+            result = follower()
+            if result is not None:
+                return result
+            metrics.incr("llm_single_flight_fallbacks", stage=stage)
+            return leader()
+
+        try:
+            token = self._acquire_lease(key)
+            if token is not None:
+                metrics.incr("llm_single_flight_leaders", stage=stage)
+                try:
+                    return leader()
+                finally:
+                    self._release_lease(key, token)
+
+            metrics.incr("llm_single_flight_followers", stage=stage, scope="remote")
+            result = self._wait_remote(key, follower)
+            if result is not None:
+                return result
+            metrics.incr("llm_single_flight_fallbacks", stage=stage)
+            return leader()
+        finally:
+            with self._local_lock:
+                self._local.pop(key, None)
+            local_event.set()
+
+    def _wait_remote(self, key: str, follower: Callable[[], Optional[T]]) -> Optional[T]:
+        deadline = time.monotonic() + settings.LLM_SINGLE_FLIGHT_MAX_WAIT
+        delay = settings.LLM_SINGLE_FLIGHT_POLL_INTERVAL
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            result = follower()
+            if result is not None:
+                return result
+            if not self._lease_held(key):
+                # Leader finished without a usable result (or died); check once more.
+                return follower()
+            delay = min(delay * 2, 1.0)
+        return None
+
+    async def do_async(
+        self,
+        key: str,
+        stage: str,
+        leader: Callable[[], Awaitable[T]],
+        follower: Callable[[], Awaitable[Optional[T]]],
+    ) -> T:
+        """
+        Async counterpart of `do`; local waiters share an asyncio.Event per loop.
+        """
+        local_key = (id(asyncio.get_running_loop()), key)
+        local_event = self._local_async.get(local_key)
+        if local_event is not None:
+            metrics.incr("llm_single_flight_followers", stage=stage, scope="local")
+            try:
+                await asyncio.wait_for(local_event.wait(), settings.LLM_SINGLE_FLIGHT_MAX_WAIT)
+            except asyncio.TimeoutError:
+                pass
+            result = await follower()
+            if result is not None:
+                return result
+            metrics.incr("llm_single_flight_fallbacks", stage=stage)
+            return await leader()
+
+        local_event = asyncio.Event()
+        self._local_async[local_key] = local_event
+        try:
+            token = await asyncio.to_thread(self._acquire_lease, key)
+            if token is not None:
+                metrics.incr("llm_single_flight_leaders", stage=stage)
+                try:
+                    return await leader()
+                finally:
+                    await asyncio.to_thread(self._release_lease, key, token)
+
+            metrics.incr("llm_single_flight_followers", stage=stage, scope="remote")
+            deadline = time.monotonic() + settings.LLM_SINGLE_FLIGHT_MAX_WAIT
+            delay = settings.LLM_SINGLE_FLIGHT_POLL_INTERVAL
+            while time.monotonic() < deadline:
+                await asyncio.sleep(delay)
+                result = await follower()
+                if result is not None:
+                    return result
+                if not await asyncio.to_thread(self._lease_held, key):
+                    result = await follower()
+                    if result is not None:
+                        return result
+                    break
+                delay = min(delay * 2, 1.0)
+
+            metrics.incr("llm_single_flight_fallbacks", stage=stage)
+            return await leader()
+        finally:
+            self._local_async.pop(local_key, None)
+            local_event.set()
+
+
+single_flight = SingleFlight()
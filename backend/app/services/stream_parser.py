@@ -0,0 +1,93 @@
+"""
+Incremental parser for streamed JSON completions.
+
+`JSONArrayItemStream` is fed completion text chunk by chunk and returns every
+object of one top-level array (e.g. ``leads``) as soon as its closing brace
+arrives, so callers can act on items long before the completion finishes.
+Text outside the outermost JSON object (markdown fences, commentary) is
+ignored. Each character is examined once.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+
+class JSONArrayItemStream:
+    """Yields complete objects from ``{"<array_key>": [ {...}, {...} ]}`` while streaming."""
+
+    def __init__(self, array_key: str = "leads"):
+        self.array_key = array_key
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.done = False
+        self.items_emitted = 0
+        self._string_buf: List[str] = []
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None  # depth inside the target array
+        self._item: List[str] = []
+        self._item_start_depth: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk and return objects completed within it."""
+        completed: List[Dict[str, Any]] = []
+        for ch in chunk:
+            if self.done:
+                break
+            capturing = self._item_start_depth is not None
+            if capturing:
+                self._item.append(ch)
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1 and not capturing:
+                        self._last_key = "".join(self._string_buf)
+                else:
+                    if self.depth == 1 and not capturing:
+                        self._string_buf.append(ch)
+                continue
+
+            if ch == '"':
+                if self.depth > 0:
+                    self.in_string = True
+                    self._string_buf = []
+            elif ch in "{[":
+                if self.depth == 0 and ch != "{":
+                    continue
+                self.depth += 1
+                if ch == "[" and self.depth == 2 and self._last_key == self.array_key:
+                    self._array_depth = self.depth
+                elif ch == "{" and self._array_depth is not None and self.depth == self._array_depth + 1 and not capturing:
+                    self._item_start_depth = self.depth
+                    self._item = ["{"]
+            elif ch in "}]":
+                if self.depth == 0:
+                    continue
+                if ch == "}" and self._item_start_depth is not None and self.depth == self._item_start_depth:
+                    item = self._decode_item("".join(self._item))
+                    if item is not None:
+                        completed.append(item)
+                        self.items_emitted += 1
+                    self._item = []
+                    self._item_start_depth = None
+                elif ch == "]" and self._array_depth is not None and self.depth == self._array_depth:
+                    self._array_depth = None
+                    self._last_key = None
+                self.depth -= 1
+                if self.depth == 0:
+                    self.done = True
+            elif ch == "," and self.depth == 1:
+                self._last_key = None
+        return completed
+
+    @staticmethod
+    def _decode_item(text: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return item if isinstance(item, dict) else None
@@ -0,0 +1,123 @@
+"""
+Token estimation and per-stage budgets for LLM calls.
+
+`max_tokens` is sized from the number of items a call asks for (1 intent,
+the patterns requested, the leads in a shard) times the stage's observed
+completion tokens per item, plus headroom, and capped by
+``LLM_STAGE_MAX_TOKENS``. The rate starts at ``LLM_STAGE_TOKENS_PER_ITEM``
+and follows the provider's reported ``completion_tokens`` (or an estimate from
+the text) for completions that finished normally. A completion cut off at
+``max_tokens`` spent all its tokens without finishing the items it was asked
+for, so it is not averaged in; instead it raises the rate to at least its
+tokens divided by the items requested. Otherwise a rate that is too low would
+keep truncating calls and never learn from them. Calls whose prompt plus
+completion would not fit ``LLM_CONTEXT_WINDOW`` are rejected before they are
+sent; lead shards are sized so that each one fits its stage cap.
+
+Token counts are estimated from character length; no tokenizer is needed.
+"""
+import math
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+# Average characters per token for English prose and JSON with BPE tokenizers
+CHARS_PER_TOKEN = 3.5
+
+# Chat-format framing per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Weight of the newest observation in the tokens-per-item average
+RATE_SMOOTHING = 0.2
+
+
+class TokenBudgetError(Exception):
+    """The request cannot fit the model's context or the stage budget."""
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(estimate_tokens(str(m.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class TokenBudget:
+    """Per-stage max_tokens sizing from observed tokens per item."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates: Dict[str, float] = {}
+
+    def tokens_per_item(self, stage: str) -> float:
+        with self._lock:
+            rate = self._rates.get(stage)
+        if rate is None:
+            rate = settings.LLM_STAGE_TOKENS_PER_ITEM.get(stage, 500)
+        return rate
+
+    def stage_cap(self, stage: str) -> int:
+        return settings.LLM_STAGE_MAX_TOKENS.get(stage, 4000)
+
+    def max_tokens(self, stage: str, items: int) -> int:
+        """max_tokens for a call that should produce `items` items."""
+        wanted = items * self.tokens_per_item(stage) * settings.LLM_TOKEN_HEADROOM + settings.LLM_TOKEN_OVERHEAD
+        return max(settings.LLM_MIN_MAX_TOKENS, min(self.stage_cap(stage), math.ceil(wanted)))
+
+    def max_items(self, stage: str) -> int:
+        """Most items one call can be asked for without exceeding the stage cap."""
+        per_item = self.tokens_per_item(stage) * settings.LLM_TOKEN_HEADROOM
+        return max(1, int((self.stage_cap(stage) - settings.LLM_TOKEN_OVERHEAD) // per_item))
+
+    def check(self, stage: str, messages: List[Dict[str, Any]], max_tokens: int):
+        """Reject a call whose prompt plus completion cannot fit the context window."""
+        prompt_tokens = estimate_message_tokens(messages)
+        if prompt_tokens + max_tokens > settings.LLM_CONTEXT_WINDOW:
+            metrics.incr("llm_token_budget_rejections", stage=stage)
+            raise TokenBudgetError(
+                f"{stage} request needs ~{prompt_tokens + max_tokens} tokens, "
+                f"over the {settings.LLM_CONTEXT_WINDOW}-token budget"
+            )
+
+    def observe(self, stage: str, items: int, completion_tokens: Optional[int], text: str):
+        """Fold one normally-finished completion into the stage's tokens-per-item rate."""
+        if items <= 0:
+            return
+        tokens = completion_tokens if completion_tokens else estimate_tokens(text)
+        rate = tokens / items
+        with self._lock:
+            previous = self._rates.get(stage)
+            self._rates[stage] = rate if previous is None else previous + RATE_SMOOTHING * (rate - previous)
+        metrics.observe("llm_completion_tokens", tokens, stage=stage)
+        metrics.observe("llm_completion_tokens_per_item", rate, stage=stage)
+
+    def observe_truncated(self, stage: str, requested: int, completion_tokens: Optional[int], text: str):
+        """Raise the stage's rate to the lower bound a completion cut off before `requested` items sets."""
+        if requested <= 0:
+            return
+        tokens = completion_tokens if completion_tokens else estimate_tokens(text)
+        floor = tokens / requested
+        with self._lock:
+            previous = self._rates.get(stage)
+            if previous is None:
+                previous = settings.LLM_STAGE_TOKENS_PER_ITEM.get(stage, 500)
+            self._rates[stage] = max(previous, floor)
+        metrics.incr("llm_token_budget_truncations", stage=stage)
+
+    def compact_patterns(self, patterns: List[Dict[str, Any]]) -> List[str]:
+        """Full names of the patterns a prompt lists by index: the most confident ones."""
+        ranked = sorted(patterns, key=lambda p: p.get("confidence") or 0, reverse=True)
+        return [str(pattern.get("name", "Unknown")) for pattern in ranked[:settings.LLM_PROMPT_MAX_PATTERNS]]
+
+    def prompt_pattern_name(self, name: str) -> str:
+        """A pattern name as written into a prompt, long names shortened; indices still expand to the full name."""
+        if len(name) > settings.LLM_PROMPT_MAX_PATTERN_CHARS:
+            return name[:settings.LLM_PROMPT_MAX_PATTERN_CHARS].rstrip() + "..."
+        return name
+
+
+token_budget = TokenBudget()
@@ -0,0 +1,115 @@
+import logging
+import time
+from typing import Any, Dict
+
+from app.core.celery import celery_app
+from app.core.metrics import metrics
+from app.core.speculation import speculator
+from app.models.base import SessionLocal
+from app.models.db.session import SessionDB
+
+
+logger = logging.getLogger(__name__)
+
+
+def _checkpoint(session_id: str, confirmed_step: str = None) -> Dict[str, Any]:
+    """Record an automatic confirmation and return what the session has completed so far."""
+    db = SessionLocal()
+    try:
+        session = db.query(SessionDB).filter(SessionDB.id == session_id).first()
+        if not session:
+            raise ValueError(f"Session {session_id} not found")
+        if confirmed_step:
+            # Reassign so SQLAlchemy picks up the JSON column change
+            session.user_confirmations = {**(session.user_confirmations or {}), confirmed_step: True}
+            db.commit()
+        return {
+            "intent_extracted": bool(session.extracted_intent),
+            "pattern_report_id": session.pattern_report_id,
+            "lead_report_id": session.lead_report_id,
+        }
+    finally:
+        db.close()
+
+
+def _fail(session_id: str, exc: Exception):
+    db = SessionLocal()
+    try:
+        session = db.query(SessionDB).filter(SessionDB.id == session_id).first()
+        if session:
+            session.status = "failed"
+            session.add_error(f"Autopilot failed: {exc}")
+            db.commit()
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=60, soft_time_limit=75 * 60, time_limit=90 * 60)
+def run_autopilot_task(self, session_id: str, user_input: str) -> Dict[str, Any]:
+    """
+    Run intent extraction, pattern discovery and lead generation back to back
+    in this worker, confirming each stage automatically.
+
+    The stages are the regular stage tasks called in-process, so every stage
+    checkpoints its result to the database and streams progress exactly as it
+    does in an interactive session, without a broker round trip or a wait for
+    a free worker in between. A retry resumes after the last completed stage.
+    """
+    # Imported here: app.core.celery loads this module while the stage task modules may still be importing it
+    from app.tasks.intent_tasks import extract_intent_task
+    from app.tasks.lead_tasks import generate_leads_task
+    from app.tasks.pattern_tasks import discover_patterns_task
+
+    logger.info("[AutopilotTask] Starting for session %s", session_id)
+
+    # Every step is confirmed automatically; nothing to run ahead of the user
+    speculator.cancel(session_id)
+
+    timings: Dict[str, float] = {}
+    try:
+        checkpoint = _checkpoint(session_id)
+
+        if not checkpoint["intent_extracted"]:
+            started = time.monotonic()
+            extract_intent_task(session_id, user_input)
+            timings["intent_extraction"] = time.monotonic() - started
+        checkpoint = _checkpoint(session_id, "intent_extraction")
+
+        if not checkpoint["pattern_report_id"]:
+            started = time.monotonic()
+            discover_patterns_task(session_id)
+            timings["pattern_discovery"] = time.monotonic() - started
+        checkpoint = _checkpoint(session_id, "pattern_discovery")
+
+        if not checkpoint["lead_report_id"]:
+            started = time.monotonic()
+            generate_leads_task(session_id, checkpoint["pattern_report_id"])
+            timings["lead_generation"] = time.monotonic() - started
+        checkpoint = _checkpoint(session_id, "lead_generation")
+
+    except Exception as exc:
+        # Stage tasks called in-process re-raise transient errors instead of retrying themselves
+        if isinstance(exc, (ConnectionError, TimeoutError)):
+            if self.request.retries < self.max_retries:
+                raise self.retry(countdown=60 * (2 ** self.request.retries), exc=exc)
+            _fail(session_id, exc)
+        logger.exception("[AutopilotTask] Error for session %s", session_id)
+        raise
+
+    for stage, seconds in timings.items():
+        metrics.observe("autopilot_stage_seconds", seconds, stage=stage)
+    logger.info(
+        "[AutopilotTask] Completed for session %s in %.2fs (%s)",
+        session_id,
+        sum(timings.values()),
+        ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()),
+    )
+    return {
+        "success": True,
+        "session_id": session_id,
+        "pattern_report_id": checkpoint["pattern_report_id"],
+        "lead_report_id": checkpoint["lead_report_id"],
+    }
+
+
+run_autopilot_task = celery_app.register_task(run_autopilot_task)
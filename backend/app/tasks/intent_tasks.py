@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from datetime import datetime
 from typing import Any, Dict
@@ -6,7 +5,9 @@ from typing import Any, Dict
 from celery import Task
 
 from app.core.celery import celery_app
-from app.core.websocket import manager
+from app.core.notifier import notifier
+from app.core.progress import progress_reporter
+from app.core.speculation import speculator
 from app.models.base import SessionLocal
 from app.models.db.session import SessionDB
 from app.models.intent import IntentExtractionResult
@@ -16,16 +17,6 @@ from app.services.mock_services import mock_intent_extraction
 logger = logging.getLogger(__name__)
 
 
-def _run_async(coro_func, *args, **kwargs):
-    """Run an async function in a fresh event loop (Celery tasks are sync)."""
-    loop = asyncio.new_event_loop()
-    try:
-        asyncio.set_event_loop(loop)
-        return loop.run_until_complete(coro_func(*args, **kwargs))
-    finally:
-        loop.close()
-
-
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
 def extract_intent_task(self, session_id: str, user_input: str) -> Dict[str, Any]:
     logger.info("[IntentTask] Starting for session %s", session_id)
@@ -41,15 +32,12 @@ def extract_intent_task(self, session_id: str, user_input: str) -> Dict[str, Any
         session.progress_percentage = 10.0
         db.commit()
 
-        _run_async(manager.send_progress_update, session_id, "intent_extraction", 10.0, "Starting intent extraction...")
+        progress_reporter.report(session_id, "intent_extraction", 10.0, "Starting intent extraction...")
 
         try:
             mock_intent = mock_intent_extraction(user_input, session_id)
 
-            session.progress_percentage = 80.0
-            db.commit()
-            _run_async(
-                manager.send_progress_update,
+            progress_reporter.report(
                 session_id,
                 "intent_extraction",
                 80.0,
@@ -71,30 +59,30 @@ def extract_intent_task(self, session_id: str, user_input: str) -> Dict[str, Any
             session.progress_percentage = 100.0
             db.commit()
 
-            _run_async(
-                manager.send_progress_update,
+            progress_reporter.report(
                 session_id,
                 "intent_extraction",
                 100.0,
                 "Intent extraction completed successfully",
             )
-            _run_async(
-                manager.send_analysis_complete,
+            notifier.analysis_complete(
                 session_id,
                 "intent_extraction",
                 {"intent": intent_result.dict()},
             )
 
+            # Get a head start on pattern discovery while the user reviews the intent
+            speculator.start(session_id, "pattern_discovery")
+
             logger.info("[IntentTask] Completed for session %s", session_id)
-            return {"success": True, "session_id": session_id, "intent": intent_result.dict()}
+            return {"success": True, "session_id": session_id}
 
         except Exception as exc:
             logger.exception("[IntentTask] Error for session %s", session_id)
             if isinstance(exc, (ConnectionError, TimeoutError)) and self.request.retries < self.max_retries:
                 session.add_error(f"Intent extraction failed (retry {self.request.retries + 1}): {exc}")
                 db.commit()
-                _run_async(
-                    manager.send_error,
+                notifier.error(
                     session_id,
                     f"Intent extraction failed, retrying... ({self.request.retries + 1}/{self.max_retries})",
                     "retry_error",
@@ -104,8 +92,7 @@ def extract_intent_task(self, session_id: str, user_input: str) -> Dict[str, Any
                 session.status = "failed"
                 session.add_error(f"Intent extraction failed: {exc}")
                 db.commit()
-                _run_async(
-                    manager.send_error,
+                notifier.error(
                     session_id,
                     f"Intent extraction failed: {exc}",
                     "processing_error",
@@ -133,8 +120,7 @@ class IntentExtractionTask(Task):
                 session.status = "failed"
                 session.add_error(f"Intent extraction task failed: {exc}")
                 db.commit()
-                _run_async(
-                    manager.send_error,
+                notifier.error(
                     session_id,
                     f"Intent extraction task failed: {exc}",
                     "task_failure",
@@ -1,175 +1,180 @@
-import asyncio
+import uuid
 from celery import Task
 from app.core.celery import celery_app
-from app.core.websocket import manager
+from app.core.config import settings
+from app.core.notifier import notifier
+from app.core.progress import progress_reporter
+from app.core.speculation import speculator
 from app.models.base import SessionLocal
 from app.models.db.session import SessionDB
 from app.models.db.lead import LeadReportDB
+from app.models.db.pattern import PatternReportDB
 from app.models.lead import LeadReport
 from app.models.pattern import PatternReport
 from app.services.mock_services import mock_lead_generation
+from app.services.llm_telemetry import llm_telemetry
 from datetime import datetime, timedelta
 from typing import Dict, Any
 
 
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
-def generate_leads_task(self, session_id: str, pattern_report_data: Dict[str, Any]) -> Dict[str, Any]:
+def generate_leads_task(self, session_id: str, pattern_report_id: str, speculative: bool = False) -> Dict[str, Any]:
     """
     Generate qualified leads based on discovered patterns using external APIs and analysis.
     Updates session state and sends WebSocket progress updates.
+    
+    A `speculative` run starts before the user has validated the patterns (see
+    app.core.speculation): it leaves the session alone, sends no progress or
+    lead events and keeps its report provisional unless the step is confirmed.
     """
+    if speculative and not speculator.claim(session_id, "lead_generation", self.request.id):
+        return {"success": False, "session_id": session_id}
+    
     db = SessionLocal()
+    report_id = None
     try:
         # Get session
         session = db.query(SessionDB).filter(SessionDB.id == session_id).first()
         if not session:
             raise ValueError(f"Session {session_id} not found")
         
-        # Update session status to processing
-        session.status = "processing"
-        session.current_step = "lead_generation"
-        session.progress_percentage = 10.0
-        db.commit()
+        # Provisional runs stay silent until the step is confirmed
+        report_progress = progress_reporter.report if not speculative else (lambda *args: None)
+        
+        if not speculative:
+            # Update session status to processing
+            session.status = "processing"
+            session.current_step = "lead_generation"
+            session.progress_percentage = 10.0
+            db.commit()
         
         # Send initial progress update
-        asyncio.run(manager.send_progress_update(
-            session_id, 
-            "lead_generation", 
-            10.0, 
+        report_progress(
+            session_id,
+            "lead_generation",
+            10.0,
             "Starting lead generation based on discovered patterns..."
-        ))
+        )
         
-        # Convert pattern data to PatternReport
-        pattern_report = PatternReport(**pattern_report_data)
+        # Load the pattern report the leads are based on
+        db_pattern_report = db.query(PatternReportDB).filter(PatternReportDB.id == pattern_report_id).first()
+        if not db_pattern_report:
+            raise ValueError(f"Pattern report {pattern_report_id} not found")
+        pattern_report = PatternReport(
+            id=db_pattern_report.id,
+            session_id=db_pattern_report.session_id,
+            industry=db_pattern_report.industry,
+            country=db_pattern_report.country,
+            companies_analyzed=db_pattern_report.companies_analyzed,
+            analysis_duration=db_pattern_report.analysis_duration,
+            patterns=db_pattern_report.patterns,
+            total_patterns=db_pattern_report.total_patterns,
+            average_confidence=db_pattern_report.average_confidence,
+            high_confidence_patterns=db_pattern_report.high_confidence_patterns,
+            key_insights=db_pattern_report.key_insights,
+            recommendations=db_pattern_report.recommendations,
+            generated_at=db_pattern_report.generated_at
+        )
         
         # Perform lead generation (mock for now)
         try:
-            # Update progress for data collection
-            session.progress_percentage = 25.0
-            db.commit()
-            
-            asyncio.run(manager.send_progress_update(
-                session_id, 
-                "lead_generation", 
-                25.0, 
-                "Collecting company data from external sources..."
-            ))
-            
-            # Simulate data collection phase
-            import time
-            time.sleep(1)  # Simulate API calls
-            
-            # Update progress for signal analysis
-            session.progress_percentage = 50.0
-            db.commit()
-            
-            asyncio.run(manager.send_progress_update(
-                session_id, 
-                "lead_generation", 
-                50.0, 
-                "Analyzing signals and matching patterns..."
-            ))
-            
-            # Simulate signal analysis
-            time.sleep(1)
-            
             # Update progress for lead scoring
-            session.progress_percentage = 75.0
-            db.commit()
-            
-            asyncio.run(manager.send_progress_update(
-                session_id, 
-                "lead_generation", 
-                75.0, 
+            report_progress(
+                session_id,
+                "lead_generation",
+                75.0,
                 "Scoring leads and prioritizing opportunities..."
-            ))
-            
-            # Generate mock lead generation
-            mock_report = mock_lead_generation(pattern_report.model_dump(mode='json'), session_id)
+            )
             
-            # Create database record for lead report
+            # Create the report row up front so leads can be persisted as they stream in
+            report_id = str(uuid.uuid4())
             db_report = LeadReportDB(
-                id=mock_report["id"],
+                id=report_id,
                 session_id=session_id,
-                pattern_report_id=mock_report["pattern_report_id"],
-                industry=mock_report["industry"],
-                country=mock_report["country"],
-                leads_generated=mock_report["leads_generated"],
-                analysis_duration=mock_report["analysis_duration"],
-                leads=mock_report["leads"],
-                high_priority_leads=mock_report["high_priority_leads"],
-                medium_priority_leads=mock_report["medium_priority_leads"],
-                low_priority_leads=mock_report["low_priority_leads"],
-                average_quality_score=mock_report["average_quality_score"],
-                pattern_coverage=mock_report["pattern_coverage"],
-                key_insights=mock_report["key_insights"],
-                market_opportunities=mock_report["market_opportunities"],
-                recommended_approach=mock_report["recommended_approach"],
-                export_formats=mock_report["export_formats"],
+                pattern_report_id=pattern_report.id,
+                industry=pattern_report.industry,
+                country=pattern_report.country,
+                leads=[],
                 generated_at=datetime.utcnow()
             )
-            
             db.add(db_report)
             db.commit()
-            db.refresh(db_report)
             
-            # Update session with lead report
-            session.lead_report_id = db_report.id
-            session.leads_generated = True
-            session.status = "completed"
-            session.current_step = "completed"
-            session.progress_percentage = 100.0
-            session.completed_at = datetime.utcnow()
-            db.commit()
+            streamed_leads = []
             
-            # Create response model
-            lead_report = LeadReport(
-                **{k: v for k, v in mock_report.items() if k != 'generated_at'},
-                generated_at=db_report.generated_at
-            )
+            def on_lead(lead: Dict[str, Any]):
+                streamed_leads.append(lead)
+                if len(streamed_leads) % settings.LEAD_FLUSH_EVERY == 0:
+                    # Reassign so SQLAlchemy picks up the JSON column change
+                    db_report.leads = list(streamed_leads)
+                    db_report.leads_generated = len(streamed_leads)
+                    db.commit()
+                if not speculative:
+                    notifier.lead_found(session_id, lead)
             
-            # Send completion update
-            asyncio.run(manager.send_progress_update(
-                session_id, 
-                "lead_generation", 
-                100.0, 
-                "Lead generation completed successfully"
-            ))
+            # Generate mock lead generation
+            mock_report = mock_lead_generation(pattern_report.model_dump(mode='json'), session_id, on_lead=on_lead)
+            mock_report["id"] = db_report.id
             
-            asyncio.run(manager.send_analysis_complete(
-                session_id, 
-                "lead_generation", 
-                {"lead_report": lead_report.dict()}
-            ))
+            # Finalize the database record with the complete report
+            db_report.leads_generated = mock_report["leads_generated"]
+            db_report.analysis_duration = mock_report["analysis_duration"]
+            db_report.leads = mock_report["leads"]
+            db_report.high_priority_leads = mock_report["high_priority_leads"]
+            db_report.medium_priority_leads = mock_report["medium_priority_leads"]
+            db_report.low_priority_leads = mock_report["low_priority_leads"]
+            db_report.average_quality_score = mock_report["average_quality_score"]
+            db_report.pattern_coverage = mock_report["pattern_coverage"]
+            db_report.key_insights = mock_report["key_insights"]
+            db_report.market_opportunities = mock_report["market_opportunities"]
+            db_report.recommended_approach = mock_report["recommended_approach"]
+            db_report.export_formats = mock_report["export_formats"]
+            db_report.generated_at = datetime.utcnow()
+            db_report.llm_usage = mock_report["llm_usage"] = llm_telemetry.report_usage(session_id, "leads")
+            db.commit()
+            db.refresh(db_report)
+            
+            if speculative:
+                outcome = speculator.finish(session_id, "lead_generation", self.request.id, db_report.id)
+                if outcome != "promoted":
+                    if outcome == "closed":
+                        # The step was settled without this run
+                        db.delete(db_report)
+                        db.commit()
+                    return {"success": outcome == "done", "session_id": session_id, "lead_report_id": db_report.id}
+                db.refresh(session)
             
-            # Send lead found events for high-priority leads
-            for lead in mock_report["leads"]:
-                if lead.get("priority") == "high":
-                    asyncio.run(manager.send_lead_found(
-                        session_id, 
-                        lead
-                    ))
+            complete_lead_generation(db, session, db_report, replay_leads=speculative)
             
             return {
                 "success": True,
                 "session_id": session_id,
                 "lead_report_id": db_report.id,
-                "lead_report": lead_report.model_dump(mode='json'),
                 "leads_generated": mock_report["leads_generated"]
             }
             
         except Exception as e:
+            # Drop the partial report; a retry (or the confirmed step) starts a new one
+            db.rollback()
+            if report_id:
+                db.query(LeadReportDB).filter(LeadReportDB.id == report_id).delete()
+                db.commit()
+            
+            if speculative and speculator.fail(session_id, "lead_generation", self.request.id) != "promoted":
+                # Nobody is waiting on this run; confirming the step dispatches it again
+                return {"success": False, "session_id": session_id}
+            
             # Handle specific errors with retry logic
-            if isinstance(e, (ConnectionError, TimeoutError)) and self.request.retries < self.max_retries:
+            if not speculative and isinstance(e, (ConnectionError, TimeoutError)) and self.request.retries < self.max_retries:
                 session.add_error(f"Lead generation failed (retry {self.request.retries + 1}): {str(e)}")
                 db.commit()
                 
                 # Send error update
-                asyncio.run(manager.send_error(
-                    session_id, 
+                notifier.error(
+                    session_id,
                     f"Lead generation failed, retrying... ({self.request.retries + 1}/{self.max_retries})",
                     "retry_error"
-                ))
+                )
                 
                 raise self.retry(countdown=60 * (2 ** self.request.retries), exc=e)
             else:
@@ -179,11 +184,7 @@ def generate_leads_task(self, session_id: str, pattern_report_data: Dict[str, An
                 db.commit()
                 
                 # Send error update
-                asyncio.run(manager.send_error(
-                    session_id, 
-                    f"Lead generation failed: {str(e)}",
-                    "processing_error"
-                ))
+                notifier.error(session_id, f"Lead generation failed: {str(e)}", "processing_error")
                 
                 raise e
                 
@@ -194,7 +195,55 @@ def generate_leads_task(self, session_id: str, pattern_report_data: Dict[str, An
         db.close()
 
 
-@celery_app.task(bind=True, max_retries=2, default_retry_delay=30)
+def complete_lead_generation(db, session: SessionDB, db_report: LeadReportDB, replay_leads: bool = False):
+    """
+    Attach a finished lead report to the session and announce it; used by the
+    task and when a provisional report is promoted on confirmation, whose
+    lead events were held back (`replay_leads`).
+    """
+    if replay_leads:
+        for lead in db_report.leads:
+            notifier.lead_found(session.id, lead)
+    
+    # Update session with lead report
+    session.lead_report_id = db_report.id
+    session.leads_generated = True
+    session.status = "completed"
+    session.current_step = "completed"
+    session.progress_percentage = 100.0
+    session.completed_at = datetime.utcnow()
+    db.commit()
+    
+    # Create response model
+    lead_report = LeadReport(
+        id=db_report.id,
+        session_id=db_report.session_id,
+        pattern_report_id=db_report.pattern_report_id,
+        industry=db_report.industry,
+        country=db_report.country,
+        leads_generated=db_report.leads_generated,
+        analysis_duration=db_report.analysis_duration,
+        leads=db_report.leads,
+        high_priority_leads=db_report.high_priority_leads,
+        medium_priority_leads=db_report.medium_priority_leads,
+        low_priority_leads=db_report.low_priority_leads,
+        average_quality_score=db_report.average_quality_score,
+        pattern_coverage=db_report.pattern_coverage,
+        key_insights=db_report.key_insights,
+        market_opportunities=db_report.market_opportunities,
+        recommended_approach=db_report.recommended_approach,
+        export_formats=db_report.export_formats,
+        generated_at=db_report.generated_at,
+        llm_usage=db_report.llm_usage
+    )
+    
+    # Send completion update
+    progress_reporter.report(session.id, "lead_generation", 100.0, "Lead generation completed successfully")
+    
+    notifier.analysis_complete(session.id, "lead_generation", {"lead_report": lead_report.dict()})
+
+
+@celery_app.task(bind=True, max_retries=2, default_retry_delay=30, ignore_result=False)
 def export_leads_task(self, session_id: str, lead_report_id: str, format: str = "json") -> Dict[str, Any]:
     """
     Export leads in specified format (json, csv, pdf).
@@ -252,11 +301,7 @@ class LeadGenerationTask(Task):
                     db.commit()
                     
                     # Send WebSocket error notification
-                    asyncio.run(manager.send_error(
-                        session_id, 
-                        f"Lead generation task failed: {str(exc)}",
-                        "task_failure"
-                    ))
+                    notifier.error(session_id, f"Lead generation task failed: {str(exc)}", "task_failure")
             except Exception:
                 pass
             finally:
@@ -1,197 +1,179 @@
 from celery import Task
 from app.core.celery import celery_app
-from app.core.websocket import manager
+from app.core.notifier import notifier
+from app.core.progress import progress_reporter
+from app.core.speculation import speculator
 from app.models.base import SessionLocal
 from app.models.db.session import SessionDB
 from app.models.db.pattern import PatternReportDB
 from app.models.pattern import PatternReport
 from app.models.intent import IntentExtractionResult
+from app.core.config import settings
+from app.services.company_analysis import company_analyzer
 from app.services.mock_services import mock_pattern_discovery
-import asyncio
+from app.services.llm_telemetry import llm_telemetry
 import json
+import uuid
 from datetime import datetime
 from typing import Dict, Any
 
 
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
-def discover_patterns_task(self, session_id: str, intent_data: Dict[str, Any]) -> Dict[str, Any]:
+def discover_patterns_task(self, session_id: str, speculative: bool = False) -> Dict[str, Any]:
     """
     Discover success patterns based on extracted intent using multi-agent system.
     Updates session state and sends WebSocket progress updates.
+    
+    A `speculative` run starts before the user has confirmed the intent (see
+    app.core.speculation): it leaves the session alone, reports no progress and
+    keeps its report provisional unless the step is confirmed.
     """
+    if speculative and not speculator.claim(session_id, "pattern_discovery", self.request.id):
+        return {"success": False, "session_id": session_id}
+    
     db = SessionLocal()
+    report_id = None
     try:
         # Get session
         session = db.query(SessionDB).filter(SessionDB.id == session_id).first()
         if not session:
             raise ValueError(f"Session {session_id} not found")
         
-        # Update session status to processing
-        session.status = "processing"
-        session.current_step = "pattern_discovery"
-        session.progress_percentage = 10.0
-        db.commit()
+        # Provisional runs stay silent until the step is confirmed
+        report_progress = progress_reporter.report if not speculative else (lambda *args: None)
         
-        # Send WebSocket notifications using new event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            loop.run_until_complete(manager.send_progress_update(
-                session_id, 
-                "pattern_discovery", 
-                10.0, 
-                "Starting pattern discovery analysis..."
-            ))
-        finally:
-            loop.close()
+        if not speculative:
+            # Update session status to processing
+            session.status = "processing"
+            session.current_step = "pattern_discovery"
+            session.progress_percentage = 10.0
+            db.commit()
         
-        # Convert intent data to IntentExtractionResult
-        intent_result = IntentExtractionResult(**intent_data)
+        # Send WebSocket notifications
+        report_progress(session_id, "pattern_discovery", 10.0, "Starting pattern discovery analysis...")
+        
+        # Load the confirmed intent from the session
+        if not session.extracted_intent:
+            raise ValueError(f"Session {session_id} has no extracted intent")
+        intent_result = IntentExtractionResult(**session.extracted_intent)
         
         # Perform pattern discovery (mock for now)
         try:
             # Update progress for company analysis
-            session.progress_percentage = 30.0
+            report_progress(session_id, "pattern_discovery", 30.0, "Analyzing companies in target market...")
+            
+            # Create the report row up front so company results can be stored as they finish
+            report_id = str(uuid.uuid4())
+            db_report = PatternReportDB(
+                id=report_id,
+                session_id=session_id,
+                industry=intent_result.industry,
+                country=intent_result.country,
+                patterns=[],
+                company_validations=[],
+                generated_at=datetime.utcnow()
+            )
+            db.add(db_report)
             db.commit()
             
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(manager.send_progress_update(
-                    session_id, 
-                    "pattern_discovery", 
-                    30.0, 
-                    "Analyzing companies in target market..."
-                ))
-            finally:
-                loop.close()
+            # Company analysis: 30% -> 60% as companies finish
+            intent_data = intent_result.model_dump(mode='json')
+            companies = company_analyzer.candidates(intent_data)
+            validations = []
             
-            # Simulate company analysis phase
-            import time
-            time.sleep(2)  # Simulate processing time
+            def on_company(company, result):
+                validations.append(result.model_dump(mode='json'))
+                progress = round(30.0 + 30.0 * len(validations) / len(companies), 1)
+                report_progress(
+                    session_id,
+                    "pattern_discovery",
+                    progress,
+                    f"Analyzed {company.name} ({len(validations)}/{len(companies)} companies)"
+                )
+                if len(validations) % settings.COMPANY_ANALYSIS_FLUSH_EVERY == 0 or len(validations) == len(companies):
+                    # Reassign so SQLAlchemy picks up the JSON column change
+                    db_report.company_validations = list(validations)
+                    db_report.companies_analyzed = len(validations)
+                    db.commit()
             
-            # Update progress for pattern extraction
-            session.progress_percentage = 60.0
-            db.commit()
+            company_analyzer.run(companies, intent_data, on_company)
             
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(manager.send_progress_update(
-                    session_id, 
-                    "pattern_discovery", 
-                    60.0, 
-                    "Extracting success patterns from company data..."
-                ))
-            finally:
-                loop.close()
+            # Update progress for pattern extraction
+            report_progress(
+                session_id,
+                "pattern_discovery",
+                60.0,
+                "Extracting success patterns from company data..."
+            )
             
             # Generate mock pattern discovery
-            intent_data = intent_result.model_dump(mode='json')
             intent_data["session_id"] = session_id  # Add session_id for mock service
             mock_report = mock_pattern_discovery(intent_data, session_id)
+            mock_report["id"] = db_report.id
+            mock_report["companies_analyzed"] = len(validations)
+            mock_report["company_validations"] = validations
+            mock_report["llm_usage"] = llm_telemetry.report_usage(session_id, "patterns")
             
             # Update progress for report generation
-            session.progress_percentage = 85.0
-            db.commit()
-            
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(manager.send_progress_update(
-                    session_id, 
-                    "pattern_discovery", 
-                    85.0, 
-                    "Generating pattern analysis report..."
-                ))
-            finally:
-                loop.close()
+            report_progress(session_id, "pattern_discovery", 85.0, "Generating pattern analysis report...")
             
-            # Create database record for pattern report
-            db_report = PatternReportDB(
-                id=mock_report["id"],
-                session_id=session_id,
-                industry=mock_report["industry"],
-                country=mock_report["country"],
-                companies_analyzed=mock_report["companies_analyzed"],
-                analysis_duration=mock_report["analysis_duration"],
-                patterns=mock_report["patterns"],
-                total_patterns=mock_report["total_patterns"],
-                average_confidence=mock_report["average_confidence"],
-                high_confidence_patterns=mock_report["high_confidence_patterns"],
-                key_insights=mock_report["key_insights"],
-                recommendations=mock_report["recommendations"],
-                generated_at=datetime.utcnow()
-            )
-            
-            db.add(db_report)
+            # Finalize the database record with the complete report
+            db_report.industry = mock_report["industry"]
+            db_report.country = mock_report["country"]
+            db_report.companies_analyzed = mock_report["companies_analyzed"]
+            db_report.analysis_duration = mock_report["analysis_duration"]
+            db_report.patterns = mock_report["patterns"]
+            db_report.total_patterns = mock_report["total_patterns"]
+            db_report.average_confidence = mock_report["average_confidence"]
+            db_report.high_confidence_patterns = mock_report["high_confidence_patterns"]
+            db_report.key_insights = mock_report["key_insights"]
+            db_report.recommendations = mock_report["recommendations"]
+            db_report.company_validations = mock_report["company_validations"]
+            db_report.generated_at = datetime.utcnow()
+            db_report.llm_usage = mock_report["llm_usage"]
             db.commit()
             db.refresh(db_report)
             
-            # Update session with pattern report
-            session.pattern_report_id = db_report.id
-            session.status = "patterns_discovered"
-            session.current_step = "awaiting_validation"
-            session.progress_percentage = 100.0
-            db.commit()
+            if speculative:
+                outcome = speculator.finish(session_id, "pattern_discovery", self.request.id, db_report.id)
+                if outcome != "promoted":
+                    if outcome == "closed":
+                        # The step was settled without this run
+                        db.delete(db_report)
+                        db.commit()
+                    return {"success": outcome == "done", "session_id": session_id, "pattern_report_id": db_report.id}
+                db.refresh(session)
             
-            # Create response model
-            pattern_report = PatternReport(
-                **{k: v for k, v in mock_report.items() if k != 'generated_at'},
-                generated_at=db_report.generated_at
-            )
-            
-            # Send completion updates
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(manager.send_progress_update(
-                    session_id, 
-                    "pattern_discovery", 
-                    100.0, 
-                    "Pattern discovery completed successfully"
-                ))
-                
-                loop.run_until_complete(manager.send_analysis_complete(
-                    session_id, 
-                    "pattern_discovery", 
-                    {"pattern_report": pattern_report.dict()}
-                ))
-                
-                # Send pattern discovered events for each high-confidence pattern
-                for pattern in mock_report["patterns"]:
-                    if pattern.get("confidence", 0) >= 0.7:
-                        loop.run_until_complete(manager.send_pattern_discovered(
-                            session_id, 
-                            pattern
-                        ))
-            finally:
-                loop.close()
+            complete_pattern_discovery(db, session, db_report)
             
             return {
                 "success": True,
                 "session_id": session_id,
-                "pattern_report_id": db_report.id,
-                "pattern_report": pattern_report.model_dump(mode='json')
+                "pattern_report_id": db_report.id
             }
             
         except Exception as e:
+            # Drop the partial report; a retry (or the confirmed step) starts a new one
+            db.rollback()
+            if report_id:
+                db.query(PatternReportDB).filter(PatternReportDB.id == report_id).delete()
+                db.commit()
+            
+            if speculative and speculator.fail(session_id, "pattern_discovery", self.request.id) != "promoted":
+                # Nobody is waiting on this run; confirming the step dispatches it again
+                return {"success": False, "session_id": session_id}
+            
             # Handle specific errors with retry logic
-            if isinstance(e, (ConnectionError, TimeoutError)) and self.request.retries < self.max_retries:
+            if not speculative and isinstance(e, (ConnectionError, TimeoutError)) and self.request.retries < self.max_retries:
                 session.add_error(f"Pattern discovery failed (retry {self.request.retries + 1}): {str(e)}")
                 db.commit()
                 
                 # Send error update
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(manager.send_error(
-                        session_id, 
-                        f"Pattern discovery failed, retrying... ({self.request.retries + 1}/{self.max_retries})",
-                        "retry_error"
-                    ))
-                finally:
-                    loop.close()
+                notifier.error(
+                    session_id,
+                    f"Pattern discovery failed, retrying... ({self.request.retries + 1}/{self.max_retries})",
+                    "retry_error"
+                )
                 
                 raise self.retry(countdown=60 * (2 ** self.request.retries), exc=e)
             else:
@@ -201,16 +183,7 @@ def discover_patterns_task(self, session_id: str, intent_data: Dict[str, Any]) -
                 db.commit()
                 
                 # Send error update
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(manager.send_error(
-                        session_id, 
-                        f"Pattern discovery failed: {str(e)}",
-                        "processing_error"
-                    ))
-                finally:
-                    loop.close()
+                notifier.error(session_id, f"Pattern discovery failed: {str(e)}", "processing_error")
                 
                 raise e
                 
@@ -221,6 +194,51 @@ def discover_patterns_task(self, session_id: str, intent_data: Dict[str, Any]) -
         db.close()
 
 
+def complete_pattern_discovery(db, session: SessionDB, db_report: PatternReportDB):
+    """
+    Attach a finished pattern report to the session and announce it; used by
+    the task and when a provisional report is promoted on confirmation.
+    """
+    # Update session with pattern report
+    session.pattern_report_id = db_report.id
+    session.status = "patterns_discovered"
+    session.current_step = "awaiting_validation"
+    session.progress_percentage = 100.0
+    db.commit()
+    
+    # Create response model
+    pattern_report = PatternReport(
+        id=db_report.id,
+        session_id=db_report.session_id,
+        industry=db_report.industry,
+        country=db_report.country,
+        companies_analyzed=db_report.companies_analyzed,
+        analysis_duration=db_report.analysis_duration,
+        patterns=db_report.patterns,
+        total_patterns=db_report.total_patterns,
+        average_confidence=db_report.average_confidence,
+        high_confidence_patterns=db_report.high_confidence_patterns,
+        key_insights=db_report.key_insights,
+        recommendations=db_report.recommendations,
+        company_validations=db_report.company_validations or [],
+        generated_at=db_report.generated_at,
+        llm_usage=db_report.llm_usage
+    )
+    
+    # Send completion updates
+    progress_reporter.report(session.id, "pattern_discovery", 100.0, "Pattern discovery completed successfully")
+    
+    notifier.analysis_complete(session.id, "pattern_discovery", {"pattern_report": pattern_report.dict()})
+    
+    # Send pattern discovered events for each high-confidence pattern
+    for pattern in db_report.patterns:
+        if pattern.get("confidence", 0) >= 0.7:
+            notifier.pattern_discovered(session.id, pattern)
+    
+    # Get a head start on lead generation while the user reviews the patterns
+    speculator.start(session.id, "lead_generation", db_report.id)
+
+
 class PatternDiscoveryTask(Task):
     """Custom task class for pattern discovery with proper error handling"""
     
@@ -237,18 +255,7 @@ class PatternDiscoveryTask(Task):
                     db.commit()
                     
                     # Send WebSocket error notification
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        loop.run_until_complete(manager.send_error(
-                            session_id, 
-                            f"Pattern discovery task failed: {str(exc)}",
-                            "task_failure"
-                        ))
-                    except Exception:
-                        pass
-                    finally:
-                        loop.close()
+                    notifier.error(session_id, f"Pattern discovery task failed: {str(exc)}", "task_failure")
             except Exception:
                 pass
             finally:
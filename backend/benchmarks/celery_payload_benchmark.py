@@ -0,0 +1,115 @@
+"""
+Benchmark: broker and result-backend bytes per session, report payloads vs. IDs.
+
+Before, `confirm_step` sent the whole pattern report as `generate_leads_task`'s
+argument, and every stage task returned its full report (intent, pattern
+report, lead report) to the result backend, where nothing read it and it was
+kept for Celery's default day. Now tasks take a session or report ID, return a
+small status envelope, and results are ignored unless a task opts in.
+
+Both variants are encoded the way Celery itself encodes them: the task
+message (headers + serialized body) through `celery_app.amqp` and the stored
+result through `celery_app.backend`. Reports are shaped like real LLM output:
+the pattern report carries its per-company validations and the lead report
+holds `--leads` fully analyzed leads (see `json_repair_benchmark`).
+
+Usage (from backend/):
+    python -m benchmarks.celery_payload_benchmark --leads 50 --sessions-per-day 1000
+"""
+import argparse
+import json
+import uuid
+from datetime import datetime
+
+from kombu.serialization import dumps
+
+from app.core.celery import celery_app
+from app.core.config import settings
+from app.services.company_analysis import company_analyzer
+from app.services.mock_services import mock_intent_extraction, mock_pattern_discovery
+from benchmarks.json_repair_benchmark import build_report
+
+
+DEFAULT_RESULT_EXPIRES = 24 * 60 * 60  # Celery's default result_expires
+
+
+def message_bytes(task_name: str, args: tuple) -> int:
+    """Size of a task message as it sits in the broker (headers + body)."""
+    message = celery_app.amqp.as_task_v2(str(uuid.uuid4()), task_name, args=args, kwargs={})
+    _, _, body = dumps(message.body, serializer=celery_app.conf.task_serializer)
+    return len(body) + len(json.dumps(message.headers, default=str))
+
+
+def result_bytes(result) -> int:
+    """Size of a task result as stored by the result backend."""
+    backend = celery_app.backend
+    meta = backend._get_result_meta(result=result, state="SUCCESS", traceback=None, request=None)
+    return len(backend.encode(meta))
+
+
+def build_reports(leads: int):
+    session_id = str(uuid.uuid4())
+    intent = mock_intent_extraction("Find SaaS companies in Germany like Personio", session_id)
+    intent.update(raw_input="Find SaaS companies in Germany like Personio", confidence=0.85,
+                  extracted_at=datetime.utcnow().isoformat())
+    companies = company_analyzer.candidates(intent)
+    validations = [company_analyzer.validate(company, intent).model_dump(mode="json") for company in companies]
+    pattern_report = mock_pattern_discovery(dict(intent, session_id=session_id), session_id)
+    pattern_report.update(id=str(uuid.uuid4()), companies_analyzed=len(validations), company_validations=validations)
+    lead_report = dict(build_report(leads), id=str(uuid.uuid4()), session_id=session_id,
+                       pattern_report_id=pattern_report["id"], leads_generated=leads)
+    return session_id, intent, pattern_report, lead_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=50)
+    parser.add_argument("--sessions-per-day", type=int, default=1000)
+    args = parser.parse_args()
+
+    session_id, intent, pattern_report, lead_report = build_reports(args.leads)
+    # The fields confirm_step used to copy into generate_leads_task's argument
+    pattern_data = {k: v for k, v in pattern_report.items() if k not in ("company_validations", "llm_usage")}
+
+    before = {
+        "broker": (
+            message_bytes("app.tasks.intent_tasks.extract_intent_task", (session_id, intent["raw_input"]))
+            + message_bytes("app.tasks.pattern_tasks.discover_patterns_task", (session_id, intent))
+            + message_bytes("app.tasks.lead_tasks.generate_leads_task", (session_id, pattern_data))
+        ),
+        "backend": (
+            result_bytes({"success": True, "session_id": session_id, "intent": intent})
+            + result_bytes({"success": True, "session_id": session_id,
+                            "pattern_report_id": pattern_report["id"], "pattern_report": pattern_report})
+            + result_bytes({"success": True, "session_id": session_id, "lead_report_id": lead_report["id"],
+                            "lead_report": lead_report, "leads_generated": args.leads})
+        ),
+        "expires": DEFAULT_RESULT_EXPIRES,
+    }
+    envelopes = [
+        {"success": True, "session_id": session_id},
+        {"success": True, "session_id": session_id, "pattern_report_id": pattern_report["id"]},
+        {"success": True, "session_id": session_id, "lead_report_id": lead_report["id"], "leads_generated": args.leads},
+    ]
+    after = {
+        "broker": (
+            message_bytes("app.tasks.intent_tasks.extract_intent_task", (session_id, intent["raw_input"]))
+            + message_bytes("app.tasks.pattern_tasks.discover_patterns_task", (session_id,))
+            + message_bytes("app.tasks.lead_tasks.generate_leads_task", (session_id, pattern_report["id"]))
+        ),
+        # Ignored results are never written; the envelope size is what opting back in would cost
+        "backend": 0 if settings.CELERY_IGNORE_RESULTS else sum(result_bytes(envelope) for envelope in envelopes),
+        "expires": settings.CELERY_RESULT_EXPIRES,
+    }
+
+    print(f"{args.leads} leads, {len(pattern_report['company_validations'])} company validations per session")
+    print(f"{'':<8}{'broker B/session':>18}{'backend B/session':>19}{'backend retained':>18}")
+    for name, row in (("before", before), ("after", after)):
+        retained = row["backend"] * args.sessions_per_day * row["expires"] / DEFAULT_RESULT_EXPIRES
+        print(f"{name:<8}{row['broker']:>18,}{row['backend']:>19,}{retained / 1e6:>16.1f}MB")
+    print(f"envelope size if results are stored: {sum(result_bytes(e) for e in envelopes):,} B/session")
+    print(f"(retained = steady-state result-backend memory at {args.sessions_per_day} sessions/day)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: output tokens of the verbose lead/pattern schema vs. the compact one.
+
+Encodes the same leads (the ones `json_repair_benchmark` builds) both ways,
+estimates completion tokens with `token_budget.estimate_tokens`, and times the
+local expansion of the compact form back into full `LeadAnalysisResult` dicts.
+Completion tokens dominate lead-generation latency, so the token ratio is
+roughly the decode-time ratio.
+
+Usage (from backend/):
+    python -m benchmarks.compact_schema_benchmark --leads 50
+"""
+import argparse
+import json
+import time
+
+from app.services.compact_schema import expand_lead_report
+from app.services.token_budget import estimate_tokens
+from benchmarks.json_repair_benchmark import build_report
+
+
+PATTERN_NAMES = ["Product-led growth", "Vertical SaaS expansion"]
+
+
+def compact_lead(lead: dict) -> dict:
+    signals = lead["signal_analysis"]
+    return {
+        "n": lead["company_name"],
+        "q": lead["quality_score"],
+        "p": lead["priority"][0],
+        "mp": [PATTERN_NAMES.index(name) for name in lead["matched_patterns"]],
+        "ps": [lead["pattern_scores"][name] for name in lead["matched_patterns"]],
+        "sa": {
+            "m": signals["market_signals"],
+            "f": signals["financial_signals"],
+            "t": signals["technology_signals"],
+            "g": signals["growth_signals"],
+            "o": signals["overall_score"],
+            "c": signals["confidence"],
+            "pos": signals["positive_signals"],
+            "neg": signals["negative_signals"],
+            "mis": signals["missing_signals"],
+            "s": signals["signal_strength"][0],
+        },
+        "or": lead["outreach_recommendations"],
+        "tp": lead["talking_points"],
+        "rf": lead["risk_factors"],
+        "of": lead["opportunity_factors"],
+    }
+
+
+def compact_report(report: dict) -> dict:
+    return {
+        "leads": [compact_lead(lead) for lead in report["leads"]],
+        "ki": report["key_insights"],
+        "mo": report["market_opportunities"],
+        "ra": report["recommended_approach"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=50, help="leads per completion")
+    parser.add_argument("--repeat", type=int, default=200, help="timed expansions")
+    args = parser.parse_args()
+
+    report = build_report(args.leads)
+    compact = compact_report(report)
+    for indent in (2, None):
+        verbose_tokens = estimate_tokens(json.dumps(report, indent=indent))
+        compact_tokens = estimate_tokens(json.dumps(compact, indent=indent))
+        label = "indented" if indent else "minified"
+        print(
+            f"{label:>9}: verbose {verbose_tokens:>6} tok ({verbose_tokens / args.leads:5.0f}/lead)  "
+            f"compact {compact_tokens:>6} tok ({compact_tokens / args.leads:5.0f}/lead)  "
+            f"saved {1 - compact_tokens / verbose_tokens:.0%}"
+        )
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        expand_lead_report(compact, PATTERN_NAMES, "session")
+    elapsed = (time.perf_counter() - started) / args.repeat
+    print(f"local expansion: {elapsed * 1000:.2f} ms per {args.leads}-lead report")
+
+
+if __name__ == "__main__":
+    main()
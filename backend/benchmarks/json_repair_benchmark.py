@@ -0,0 +1,143 @@
+"""
+Benchmark: single-pass JSON extraction/repair vs. the previous regex parser.
+
+Builds lead-generation completions shaped like the real ones (the structure
+requested by `_build_lead_generation_prompt`, 50 leads, ~60 KB) and feeds
+them to both parsers in the failure modes seen in production: markdown
+fences with commentary, trailing commas, unescaped quotes inside strings and
+a completion cut off at max_tokens. For each case it reports whether the
+parser recovered the report, how many leads survived, and the time per parse.
+A failed parse costs a full lead-generation round trip in the caller.
+
+Usage (from backend/):
+    python -m benchmarks.json_repair_benchmark --leads 50 --repeat 200
+"""
+import argparse
+import json
+import re
+import time
+import uuid
+
+from app.services.json_repair import orjson, parse_llm_json
+
+
+def legacy_parse(response: str) -> dict:
+    """The parser GTMLLMService used before json_repair (including its missing `re` import)."""
+    cleaned = response
+    if "```json" in response:
+        start = response.find("```json") + 7
+        end = response.find("```", start)
+        if end != -1:
+            cleaned = response[start:end].strip()
+    elif "```" in response:
+        start = response.find("```") + 3
+        end = response.find("```", start)
+        if end != -1:
+            cleaned = response[start:end].strip()
+    else:
+        match = re.search(r"\{.*\}", response, re.DOTALL)
+        cleaned = match.group().strip() if match else response.strip()
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError as e:
+        # The original repair branch used `re` without importing it
+        raise NameError("name 're' is not defined") from e
+
+
+def build_lead(index: int) -> dict:
+    lead_id = str(uuid.uuid4())
+    return {
+        "lead_id": lead_id,
+        "company_name": f"Northwind Analytics {index}",
+        "session_id": str(uuid.uuid4()),
+        "quality_score": 0.6 + (index % 4) / 10,
+        "priority": ["high", "medium", "low"][index % 3],
+        "matched_patterns": ["Product-led growth", "Vertical SaaS expansion"],
+        "pattern_scores": {"Product-led growth": 0.82, "Vertical SaaS expansion": 0.71},
+        "signal_analysis": {
+            "lead_id": lead_id,
+            "market_signals": {"growth_potential": 0.8, "market_share": 0.4},
+            "financial_signals": {"revenue_stability": 0.6, "funding_recency": 0.7},
+            "technology_signals": {"tech_stack": 0.8, "api_maturity": 0.65},
+            "growth_signals": {"hiring_rate": 0.9, "web_traffic_growth": 0.55},
+            "overall_score": 0.78,
+            "confidence": 0.85,
+            "positive_signals": ["Raised a Series B in the last 12 months", "Hiring 14 sales roles"],
+            "negative_signals": ["Churn complaints on review sites"],
+            "missing_signals": ["Detailed revenue figures"],
+            "signal_strength": "strong",
+            "signal_timestamp": "2024-01-01T00:00:00Z",
+        },
+        "outreach_recommendations": [
+            "Lead with the self-serve onboarding case study",
+            "Target the VP of Revenue Operations",
+        ],
+        "talking_points": ["Time-to-value under two weeks", "SOC 2 Type II certified"],
+        "risk_factors": ["Long procurement cycles for deals above $100k"],
+        "opportunity_factors": ["Expanding into the DACH region", "New usage-based pricing tier"],
+        "analyzed_at": "2024-01-01T00:00:00Z",
+        "model_version": "1.0",
+    }
+
+
+def build_report(leads: int) -> dict:
+    return {
+        "industry": "SaaS",
+        "country": "Germany",
+        "leads": [build_lead(i) for i in range(leads)],
+        "high_priority_leads": leads // 3,
+        "medium_priority_leads": leads // 3,
+        "low_priority_leads": leads - 2 * (leads // 3),
+        "average_quality_score": 0.72,
+        "pattern_coverage": {"Product-led growth": leads},
+        "key_insights": ["Mid-market buyers respond to usage-based pricing"],
+        "market_opportunities": ["Regulated industries are underserved"],
+        "recommended_approach": "Start with product-qualified accounts, then expand to sales-led deals.",
+    }
+
+
+def build_cases(leads: int) -> dict:
+    clean = json.dumps(build_report(leads), indent=2)
+    trailing = re.sub(r"(\"model_version\": \"1.0\")\n", r"\1,\n", clean)
+    quoted = clean.replace("Hiring 14 sales roles", 'Hiring 14 "founding" sales roles')
+    return {
+        "clean": clean,
+        "fenced": f"Here are the leads you asked for:\n```json\n{clean}\n```\nLet me know if you need more.",
+        "trailing_commas": trailing,
+        "unescaped_quotes": quoted,
+        "truncated": clean[: int(len(clean) * 0.8)],
+    }
+
+
+def measure(parser, text: str, repeat: int):
+    try:
+        result = parser(text)
+    except Exception:
+        return False, 0, None
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parser(text)
+    elapsed = (time.perf_counter() - started) / repeat
+    return True, len(result.get("leads", [])), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=50, help="leads per completion")
+    parser.add_argument("--repeat", type=int, default=200, help="timed parses per case")
+    args = parser.parse_args()
+
+    print(f"decoder: {'orjson' if orjson is not None else 'json'}")
+    for name, text in build_cases(args.leads).items():
+        row = [f"{name:>16} ({len(text) / 1024:.0f} KB)"]
+        for label, fn in (("legacy", legacy_parse), ("repair", parse_llm_json)):
+            ok, leads, elapsed = measure(fn, text, args.repeat)
+            if ok:
+                row.append(f"{label}: {leads:>3} leads {elapsed * 1000:7.2f} ms")
+            else:
+                row.append(f"{label}: FAILED (retry)       ")
+        print("  ".join(row))
+
+
+if __name__ == "__main__":
+    main()
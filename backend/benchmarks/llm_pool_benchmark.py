@@ -0,0 +1,115 @@
+"""
+Benchmark: pooled keep-alive client vs. a new connection per LLM call.
+
+Starts the OpenRouter stand-in (benchmarks.openrouter_standin) and drives N
+concurrent sessions through GTMLLMService (intent -> patterns -> sharded
+leads). The stand-in sleeps once per *accepted connection* to stand in for the
+TCP+TLS handshake to OpenRouter, so the difference between the two modes is
+the handshake cost that connection reuse removes; connections per call shows
+how much reuse the pool achieves (1.00 means none). The response cache is
+disabled so that every call goes upstream; the call count is what the
+stand-in actually served.
+
+Usage (from backend/):
+    python -m benchmarks.llm_pool_benchmark --sessions 64 --handshake-ms 40
+"""
+import argparse
+import math
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark-key")
+
+import httpx
+
+from app.core.config import settings
+from app.services import llm_service as llm_module
+from app.services.http_client import close_http_client
+from benchmarks.openrouter_standin import StandinConfig, StandinServer, start_standin
+
+
+class OneShotClient:
+    """Stands in for `requests.post`: a fresh connection for every call."""
+
+    def post(self, url, **kwargs):
+        with httpx.Client(timeout=60) as client:
+            return client.post(url, **kwargs)
+
+    @contextmanager
+    def stream(self, method, url, **kwargs):
+        with httpx.Client(timeout=60) as client:
+            with client.stream(method, url, **kwargs) as response:
+                yield response
+
+
+def run_session(service, index: int) -> float:
+    session_id = f"bench-{index}"
+    started = time.perf_counter()
+    intent = service.extract_intent("SaaS companies in Germany", session_id)
+    patterns = service.discover_patterns(intent.get("intent", {}), session_id)
+    leads = service.generate_leads(patterns.get("pattern_report", {}), session_id)
+    if not (intent["success"] and patterns["success"] and leads["success"]):
+        raise RuntimeError(f"session {session_id} failed: {intent.get('error') or patterns.get('error') or leads.get('error')}")
+    return time.perf_counter() - started
+
+
+def run_mode(mode: str, server: StandinServer, sessions: int) -> dict:
+    close_http_client()
+    original = llm_module.get_http_client
+    if mode == "fresh":
+        one_shot = OneShotClient()
+        llm_module.get_http_client = lambda: one_shot
+
+    service = llm_module.GTMLLMService()
+    server.stats.clear()
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            latencies = list(pool.map(lambda i: run_session(service, i), range(sessions)))
+        wall = time.perf_counter() - started
+    finally:
+        llm_module.get_http_client = original
+        close_http_client()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "wall_s": wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "connections": server.stats["connections"],
+        "calls": server.stats["requests"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=64, help="concurrent sessions")
+    parser.add_argument("--handshake-ms", type=float, default=40.0, help="simulated per-connection handshake cost")
+    parser.add_argument("--ttfb-ms", type=float, default=0.0, help="stand-in time to first byte per call")
+    args = parser.parse_args()
+
+    server = start_standin(StandinConfig(
+        handshake_ms=args.handshake_ms, ttfb_ms=args.ttfb_ms, tokens_per_second=math.inf, seed=0,
+    ))
+    settings.OPENROUTER_BASE_URL = server.base_url
+    settings.LLM_CACHE_ENABLED = False
+
+    try:
+        for mode in ("fresh", "pooled"):
+            result = run_mode(mode, server, args.sessions)
+            print(
+                f"{result['mode']:>6}: wall={result['wall_s']:.2f}s "
+                f"session p50={result['p50_ms']:.0f}ms p95={result['p95_ms']:.0f}ms "
+                f"connections={result['connections']} for {result['calls']} calls "
+                f"({result['connections'] / max(result['calls'], 1):.2f} per call)"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
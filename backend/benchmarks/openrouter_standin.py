@@ -0,0 +1,428 @@
+"""
+Local stand-in for OpenRouter's chat-completions API, for offline load tests.
+
+Serves ``POST /api/v1/chat/completions`` in both the plain and the streaming
+(``stream: true``, server-sent events) forms, including ``usage``,
+``finish_reason`` and ``provider``. Point the service at it with
+``OPENROUTER_BASE_URL=http://127.0.0.1:<port>/api/v1``.
+
+Completions are answered in this order:
+
+* replay: a response recorded for the same prompt. Prompts are keyed by the
+  SHA-256 of their messages, so fallback models replay the same answer;
+* record (``--record`` with ``--upstream``): the request is forwarded to the
+  real API, and the answer is stored in the replay file and returned;
+* synthesize: a schema-valid answer for the stage the prompt belongs to.
+  This covers single and batched intents, compact patterns, and compact
+  leads with the requested count.
+
+Faults and timing are configurable. Time to first byte is log-normal
+(``--ttfb-ms``, ``--ttfb-sigma``), and the completion then streams at
+``--tokens-per-second``. ``--rate-429`` / ``--rate-5xx`` fail that fraction of
+requests, and ``--rate-truncate`` cuts that fraction of completions short with
+``finish_reason: length``. ``--handshake-ms`` delays every new connection to
+stand in for TCP+TLS setup. ``--provider NAME=TTFB_MS[,RATE_5XX]`` gives the
+provider a request is pinned to (``provider.only``) its own median TTFB and
+502 rate, to exercise the provider pool. ``GET /stats`` returns the request
+counters.
+
+Usage (from backend/):
+    python -m benchmarks.openrouter_standin --port 8089 --ttfb-ms 300 --rate-429 0.02
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.services.token_budget import CHARS_PER_TOKEN, estimate_message_tokens, estimate_tokens
+
+
+COMPLETIONS_PATH = "/api/v1/chat/completions"
+
+PROVIDER = "Stand-in"
+
+# Characters per streamed chunk
+CHUNK_CHARS = 48
+
+
+@dataclass
+class StandinConfig:
+    ttfb_ms: float = 200.0
+    ttfb_sigma: float = 0.3
+    tokens_per_second: float = 2000.0
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    rate_truncate: float = 0.0
+    retry_after: float = 1.0
+    handshake_ms: float = 0.0
+    replay_file: Optional[str] = None
+    record: bool = False
+    upstream: Optional[str] = None
+    seed: Optional[int] = None
+    providers: Dict[str, Tuple[float, float]] = field(default_factory=dict)  # name -> (ttfb_ms, rate_5xx)
+
+
+def prompt_key(messages: List[Dict[str, Any]]) -> str:
+    canonical = json.dumps([[m.get("role"), m.get("content")] for m in messages], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class Recordings:
+    """Replay file: one JSON object per line, {"key", "content"}."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        if path:
+            try:
+                with open(path) as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries[entry["key"]] = entry["content"]
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def add(self, key: str, content: str):
+        with self._lock:
+            self._entries[key] = content
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps({"key": key, "content": content}) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _signals(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "m": {"growth_potential": round(rng.uniform(0.4, 0.95), 2)},
+        "f": {"revenue_stability": round(rng.uniform(0.4, 0.95), 2)},
+        "t": {"tech_stack": round(rng.uniform(0.4, 0.95), 2)},
+        "g": {"hiring_rate": round(rng.uniform(0.4, 0.95), 2)},
+        "o": round(rng.uniform(0.5, 0.9), 2),
+        "c": round(rng.uniform(0.6, 0.95), 2),
+        "pos": ["Raised a funding round in the last 12 months", "Hiring across go-to-market roles"],
+        "neg": ["Crowded category"],
+        "mis": ["Detailed revenue figures"],
+        "s": rng.choice("smw"),
+    }
+
+
+def _patterns(rng: random.Random) -> str:
+    names = ["Product-led growth", "Vertical specialization", "Partner-led distribution"]
+    return json.dumps({
+        "ca": 12,
+        "patterns": [
+            {
+                "n": name, "d": f"Companies that grow through {name.lower()}.",
+                "c": round(rng.uniform(0.7, 0.95), 2), "f": rng.randint(4, 10),
+                "cat": "business_model", "sub": "growth_strategy",
+                "ka": ["Self-serve onboarding", "Usage-based pricing"],
+                "sm": {"net_revenue_retention": 1.2}, "ic": rng.choice("lmh"),
+                "sc": ["Northwind", "Contoso"],
+            }
+            for name in names
+        ],
+        "ki": ["Mid-market buyers favour self-serve trials"],
+        "rec": ["Lead with a free tier"],
+    })
+
+
+def synthesize(messages: List[Dict[str, Any]], rng: random.Random) -> str:
+    """A schema-valid completion for whichever stage `messages` belongs to."""
+    system = str(messages[0].get("content", "")) if messages else ""
+    prompt = str(messages[-1].get("content", "")) if messages else ""
+
+    if "Extract structured intent" in system:
+        intent = {"industry": "SaaS", "country": "United States", "company_size": None,
+                  "goal": "lead_generation", "confidence": 0.9}
+        queries = re.findall(r"^(\d+): ", prompt, re.MULTILINE)
+        if '"intents"' in prompt and queries:
+            return json.dumps({"intents": [dict(intent, i=int(index)) for index in queries]})
+        return json.dumps(intent)
+
+    match = re.search(r"Generate (\d+) high-quality B2B leads", prompt)
+    if match is None:  # pattern discovery
+        return _patterns(rng)
+    count = int(match.group(1))
+    patterns = len(re.findall(r"^\d+: ", prompt, re.MULTILINE)) or 1
+    batch = uuid.uuid4().hex[:6]
+    return json.dumps({
+        "leads": [
+            {
+                "n": f"Standin {batch}-{index} GmbH", "q": round(rng.uniform(0.5, 0.95), 2),
+                "p": rng.choice("hml"), "mp": [index % patterns], "ps": [round(rng.uniform(0.6, 0.9), 2)],
+                "sa": _signals(rng),
+                "or": ["Target the VP of Revenue Operations"], "tp": ["Time-to-value under two weeks"],
+                "rf": ["Long procurement cycles"], "of": ["Expanding into new regions"],
+            }
+            for index in range(count)
+        ],
+        "ki": ["Demand is strongest in the mid-market"],
+        "mo": ["Regulated industries are underserved"],
+        "ra": "Start with product-qualified accounts.",
+    })
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address: Tuple[str, int], config: StandinConfig):
+        super().__init__(address, StandinHandler)
+        self.config = config
+        self.recordings = Recordings(config.replay_file)
+        self.rng = random.Random(config.seed)
+        self.rng_lock = threading.Lock()
+        self.stats: Counter = Counter()
+        self.stats_lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1):
+        with self.stats_lock:
+            self.stats[name] += value
+
+    def draw(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+    def ttfb(self, provider: str) -> float:
+        ttfb_ms = self.config.providers.get(provider, (self.config.ttfb_ms, 0.0))[0]
+        with self.rng_lock:
+            return ttfb_ms / 1000 * math.exp(self.rng.gauss(0, self.config.ttfb_sigma))
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """OpenRouter-compatible chat-completions endpoint."""
+
+    protocol_version = "HTTP/1.1"
+    server: StandinServer
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+        if self.server.config.handshake_ms:
+            time.sleep(self.server.config.handshake_ms / 1000)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.stats_lock:
+                stats = dict(self.server.stats)
+            self._send_json(200, dict(stats, recordings=len(self.server.recordings)))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_HEAD(self):
+        # Workers pre-open pooled connections with HEAD requests at startup
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path != COMPLETIONS_PATH:
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        self.server.count("requests")
+        config = self.server.config
+        provider = ((body.get("provider") or {}).get("only") or [PROVIDER])[0]
+        self.server.count(f"provider:{provider}")
+        rate_5xx = config.providers.get(provider, (0.0, config.rate_5xx))[1]
+
+        draw = self.server.draw()
+        if draw < config.rate_429:
+            self.server.count("injected_429")
+            self._send_json(429, {"error": {"code": 429, "message": "Rate limit exceeded"}},
+                            {"Retry-After": str(config.retry_after)})
+            return
+        if draw < config.rate_429 + rate_5xx:
+            self.server.count("injected_5xx")
+            self._send_json(502, {"error": {"code": 502, "message": "Upstream provider error"}})
+            return
+
+        messages = body.get("messages", [])
+        try:
+            content, source = self._content(body, messages)
+        except Exception as e:
+            self.server.count("upstream_errors")
+            self._send_json(502, {"error": {"code": 502, "message": f"Recording failed: {e}"}})
+            return
+        self.server.count(source)
+
+        finish_reason = "stop"
+        max_tokens = body.get("max_tokens")
+        if self.server.draw() < config.rate_truncate:
+            content = content[: int(len(content) * (0.5 + 0.4 * self.server.draw()))]
+            finish_reason = "length"
+            self.server.count("injected_truncations")
+        elif max_tokens and estimate_tokens(content) > max_tokens:
+            content = content[: int(max_tokens * CHARS_PER_TOKEN)]
+            finish_reason = "length"
+            self.server.count("max_tokens_truncations")
+
+        usage = {
+            "prompt_tokens": estimate_message_tokens(messages),
+            "completion_tokens": estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        generation = usage["completion_tokens"] / config.tokens_per_second
+        time.sleep(self.server.ttfb(provider))
+
+        if body.get("stream"):
+            self._stream(body, provider, content, finish_reason, usage, generation)
+        else:
+            time.sleep(generation)
+            self._send_json(200, {
+                "id": f"gen-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "provider": provider,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": usage,
+            })
+
+    def _content(self, body: Dict[str, Any], messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """The completion text and where it came from (replayed / recorded / synthesized)."""
+        key = prompt_key(messages)
+        recorded = self.server.recordings.get(key)
+        if recorded is not None:
+            return recorded, "replayed"
+        config = self.server.config
+        if config.record and config.upstream:
+            upstream = dict(body, stream=False)
+            response = httpx.post(
+                f"{config.upstream.rstrip('/')}/chat/completions", json=upstream, timeout=120,
+                headers={"Authorization": self.headers.get("Authorization", "")},
+            )
+            response.raise_for_status()
+            content = response.json()["choices"][0]["message"]["content"]
+            self.server.recordings.add(key, content)
+            return content, "recorded"
+        with self.server.rng_lock:
+            return synthesize(messages, self.server.rng), "synthesized"
+
+    def _stream(self, body: Dict[str, Any], provider: str, content: str, finish_reason: str, usage: Dict[str, int], generation: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        completion_id = f"gen-{uuid.uuid4().hex}"
+
+        def write(text: str):
+            frame = text.encode()
+            self.wfile.write(f"{len(frame):x}\r\n".encode() + frame + b"\r\n")
+            self.wfile.flush()
+
+        def event(data: str):
+            write(f"data: {data}\n\n")
+
+        def chunk(delta: Dict[str, Any], reason: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> str:
+            data = {
+                "id": completion_id, "object": "chat.completion.chunk", "model": body.get("model"),
+                "provider": provider, "choices": [{"index": 0, "delta": delta, "finish_reason": reason}],
+            }
+            data.update(extra or {})
+            return json.dumps(data)
+
+        pieces = [content[i:i + CHUNK_CHARS] for i in range(0, len(content), CHUNK_CHARS)] or [""]
+        pause = generation / len(pieces)
+        write(": OPENROUTER PROCESSING\n\n")  # keep-alive comment, as OpenRouter sends
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(pause)
+            event(chunk({"role": "assistant", "content": piece}))
+        event(chunk({}, finish_reason, {"usage": usage}))
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_standin(config: Optional[StandinConfig] = None, host: str = "127.0.0.1", port: int = 0) -> StandinServer:
+    """Start the stand-in on a background thread; `server.base_url` is the OPENROUTER_BASE_URL to use."""
+    server = StandinServer((host, port), config or StandinConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--ttfb-ms", type=float, default=200.0, help="median time to first byte")
+    parser.add_argument("--ttfb-sigma", type=float, default=0.3, help="log-normal spread of the TTFB")
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0, help="completion generation speed")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="fraction of requests answered with 502")
+    parser.add_argument("--rate-truncate", type=float, default=0.0, help="fraction of completions cut short")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--handshake-ms", type=float, default=0.0, help="delay per new connection")
+    parser.add_argument("--replay-file", help="JSONL of recorded responses to replay (and append to with --record)")
+    parser.add_argument("--record", action="store_true", help="forward replay misses to --upstream and record them")
+    parser.add_argument("--upstream", default="https://openrouter.ai/api/v1", help="API to record from")
+    parser.add_argument("--seed", type=int, help="seed for latency and fault draws")
+    parser.add_argument("--provider", action="append", default=[], metavar="NAME=TTFB_MS[,RATE_5XX]",
+                        help="latency and 502 rate for requests pinned to this provider (repeatable)")
+    args = parser.parse_args()
+
+    providers = {}
+    for spec in args.provider:
+        name, _, profile = spec.partition("=")
+        ttfb_ms, _, rate_5xx = profile.partition(",")
+        providers[name] = (float(ttfb_ms or args.ttfb_ms), float(rate_5xx or 0.0))
+
+    config = StandinConfig(
+        ttfb_ms=args.ttfb_ms, ttfb_sigma=args.ttfb_sigma, tokens_per_second=args.tokens_per_second,
+        rate_429=args.rate_429, rate_5xx=args.rate_5xx, rate_truncate=args.rate_truncate,
+        retry_after=args.retry_after, handshake_ms=args.handshake_ms, replay_file=args.replay_file,
+        record=args.record, upstream=args.upstream, seed=args.seed, providers=providers,
+    )
+    server = StandinServer((args.host, args.port), config)
+    print(f"OpenRouter stand-in on {server.base_url} ({len(server.recordings)} recorded responses)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
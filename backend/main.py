@@ -1,19 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 
 from app.core.config import settings
 from app.api.v1.api import api_router
 from app.core.websocket import websocket_router
+from app.core.notifier import relay_events
+from app.services.http_client import close_async_http_client
+from app.services.metrics_report import metrics_report
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 GTM Pattern Engine starting up...")
+    # Forward WebSocket events published by Celery workers
+    relay = asyncio.create_task(relay_events())
     yield
     # Shutdown
+    relay.cancel()
+    await close_async_http_client()
     print("🛑 GTM Pattern Engine shutting down...")
 
 
@@ -53,6 +61,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    # This process only; Celery workers log their own report every METRICS_LOG_INTERVAL seconds
+    return metrics_report()
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -0,0 +1,45 @@
+import fakeredis
+import pytest
+
+from app.core import redis_client
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """In-memory Redis (with Lua scripting) in place of the shared client."""
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "_client", client)
+    monkeypatch.setattr(redis_client, "_down_until", 0.0)
+    return client
+
+
+@pytest.fixture
+def llm(redis, monkeypatch):
+    """
+    A GTMLLMService whose upstream calls go to a FakeOpenRouter; the cache,
+    rate limiter, hedging and batching are off unless a test turns them on.
+    """
+    from app.core.config import settings
+    from app.core.metrics import metrics
+    from app.services import llm_service
+    from app.services.provider_pool import ProviderPool
+    from app.services.token_budget import token_budget
+    from tests.fakes import FakeOpenRouter
+
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    for name, value in {
+        "LLM_CACHE_ENABLED": False,
+        "LLM_RATE_LIMIT_ENABLED": False,
+        "LLM_HEDGE_ENABLED": False,
+        "LLM_BATCH_ENABLED": False,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    metrics.reset()
+    monkeypatch.setattr(llm_service, "provider_pool", ProviderPool())
+    monkeypatch.setattr(token_budget, "_rates", {})
+
+    fake = FakeOpenRouter()
+    service = llm_service.GTMLLMService()
+    service._post = fake.post
+    service._post_stream = fake.post_stream
+    return service, fake
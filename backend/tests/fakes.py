@@ -0,0 +1,75 @@
+"""Scripted stand-in for OpenRouter, wired in below the provider pool."""
+import ast
+import json
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.hedging import HedgeCancelled
+from app.services.llm_service import Completion
+
+Respond = Callable[[Dict[str, Any]], Tuple[str, Optional[str]]]
+
+
+class FakeOpenRouter:
+    """Answers each upstream call with `respond(payload) -> (text, finish_reason)`."""
+
+    def __init__(self, respond: Optional[Respond] = None, chunk_chars: int = 7):
+        self.respond = respond
+        self.chunk_chars = chunk_chars
+        self.payloads: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def post(self, payload: Dict[str, Any]) -> Completion:
+        with self._lock:
+            self.payloads.append(payload)
+        text, finish_reason = self.respond(payload)
+        return Completion.of(text, finish_reason, None, payload["provider"]["only"][0])
+
+    def post_stream(
+        self, payload: Dict[str, Any], on_text: Callable[[str], None], abort: Optional[threading.Event] = None
+    ) -> Completion:
+        completion = self.post(payload)
+        for start in range(0, len(completion), self.chunk_chars):
+            if abort is not None and abort.is_set():
+                raise HedgeCancelled("abandoned")
+            on_text(completion[start:start + self.chunk_chars])
+        return completion
+
+
+def prompt(payload: Dict[str, Any]) -> str:
+    return payload["messages"][-1]["content"]
+
+
+def requested_leads(payload: Dict[str, Any]) -> int:
+    return int(re.search(r"Generate (\d+) high-quality", prompt(payload)).group(1))
+
+
+def excluded_companies(payload: Dict[str, Any]) -> List[str]:
+    match = re.search(r"do not include them: (\[.*\])", prompt(payload))
+    return ast.literal_eval(match.group(1)) if match else []
+
+
+def compact_lead(name: str, quality: float = 0.8, priority: str = "h") -> Dict[str, Any]:
+    return {"n": name, "q": quality, "p": priority, "mp": [0], "ps": [0.8], "sa": {"o": quality, "c": 0.8, "s": "s"}}
+
+
+def lead_completion(names: List[str], **fields) -> str:
+    return json.dumps(dict({"leads": [compact_lead(name) for name in names], "ki": ["insight"], "ra": "approach"}, **fields))
+
+
+def truncated(text: str, keep_leads: int) -> str:
+    """Cut a lead completion off in the middle of lead number `keep_leads + 1`."""
+    starts = [match.start() for match in re.finditer(r'\{"n"', text)]
+    return text[:starts[keep_leads] + 12]
+
+
+PATTERN_REPORT = {
+    "id": "pattern-report",
+    "industry": "SaaS",
+    "country": "Germany",
+    "patterns": [
+        {"name": "Product-led growth", "confidence": 0.9},
+        {"name": "Vertical focus", "confidence": 0.8},
+    ],
+}
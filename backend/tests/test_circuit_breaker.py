@@ -0,0 +1,132 @@
+import pytest
+
+from app.core import redis_client
+from app.core.config import settings
+from app.services import circuit_breaker as circuit_breaker_module
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.services.rate_limiter import RateLimitError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker_module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(redis, clock, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "LLM_BREAKER_COOLDOWN", 30.0)
+    return CircuitBreaker("test")
+
+
+def fail():
+    raise ConnectionError("upstream down")
+
+
+def trip(breaker):
+    for _ in range(settings.LLM_BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(ConnectionError):
+            breaker.call("leads", fail)
+
+
+def test_opens_after_threshold_failures_and_short_circuits(breaker):
+    trip(breaker)
+    assert breaker.state() == OPEN
+    assert breaker.is_open()
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call("leads", lambda: calls.append(1))
+    assert calls == []
+
+
+def test_success_resets_the_failure_count(breaker):
+    for _ in range(settings.LLM_BREAKER_FAILURE_THRESHOLD - 1):
+        with pytest.raises(ConnectionError):
+            breaker.call("leads", fail)
+    breaker.call("leads", lambda: "ok")
+    with pytest.raises(ConnectionError):
+        breaker.call("leads", fail)
+    assert breaker.state() == CLOSED
+
+
+def test_rate_limits_do_not_count_as_failures(breaker):
+    for _ in range(settings.LLM_BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises(RateLimitError):
+            breaker.call("leads", lambda: (_ for _ in ()).throw(RateLimitError("429")))
+    assert breaker.state() == CLOSED
+
+
+def test_single_probe_after_cooldown_closes_on_success(breaker, clock):
+    trip(breaker)
+    clock.now += settings.LLM_BREAKER_COOLDOWN
+    assert not breaker.is_open()
+
+    assert breaker.allow_request()
+    assert breaker.state() == HALF_OPEN
+    # Another worker sharing the breaker must wait for the probe
+    assert not CircuitBreaker("test").allow_request()
+
+    breaker.record_success()
+    assert breaker.state() == CLOSED
+    assert CircuitBreaker("test").allow_request()
+
+
+def test_failed_probe_reopens(breaker, clock):
+    trip(breaker)
+    clock.now += settings.LLM_BREAKER_COOLDOWN
+    with pytest.raises(ConnectionError):
+        breaker.call("leads", fail)
+    assert breaker.state() == OPEN
+    assert breaker.is_open()
+    clock.now += settings.LLM_BREAKER_COOLDOWN
+    assert breaker.allow_request()
+
+
+def test_state_is_shared_across_workers(breaker):
+    trip(breaker)
+    assert CircuitBreaker("test").is_open()
+
+
+def test_works_per_process_without_redis(breaker, monkeypatch):
+    monkeypatch.setattr(redis_client, "_down_until", float("inf"))
+    trip(breaker)
+    assert breaker.is_open()
+
+
+def test_open_circuit_falls_back_to_mock(breaker, monkeypatch):
+    from app.services import mock_services
+
+    monkeypatch.setattr(settings, "USE_REAL_LLM", True)
+    monkeypatch.setattr(settings, "LLM_BREAKER_ENABLED", True)
+    monkeypatch.setattr(circuit_breaker_module, "circuit_breaker", breaker)
+    monkeypatch.setattr(mock_services, "_get_llm_service", lambda: pytest.fail("the LLM must not be called"))
+    trip(breaker)
+
+    intent = mock_services.mock_intent_extraction("Find SaaS companies in Germany", "s1")
+    assert intent["industry"]
+
+
+def test_fallback_is_logged_once_per_opening(breaker, clock, caplog):
+    trip(breaker)
+    with caplog.at_level("WARNING", logger="app.services.circuit_breaker"):
+        for _ in range(3):
+            breaker.log_fallback()
+        assert sum("mock fallback" in record.message for record in caplog.records) == 1
+
+        clock.now += settings.LLM_BREAKER_COOLDOWN
+        with pytest.raises(ConnectionError):
+            breaker.call("leads", fail)
+        breaker.log_fallback()
+        breaker.log_fallback()
+        assert sum("mock fallback" in record.message for record in caplog.records) == 2
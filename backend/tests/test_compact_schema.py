@@ -0,0 +1,81 @@
+from app.models.lead import LeadAnalysisResult
+from app.models.pattern import SuccessPattern
+from app.services.compact_schema import expand_lead, expand_lead_report, expand_pattern_report
+from tests.fakes import compact_lead
+
+PATTERN_NAMES = ["Product-led growth", "Vertical focus"]
+
+
+def test_compact_lead_expands_to_a_valid_result():
+    item = dict(compact_lead("Acme", quality=0.7, priority="m"), **{"or": ["Email the CTO"], "tp": ["Scale"]})
+    lead = expand_lead(item, PATTERN_NAMES, "s1")
+
+    LeadAnalysisResult(**lead)
+    assert lead["company_name"] == "Acme"
+    assert lead["session_id"] == "s1"
+    assert lead["priority"] == "medium"
+    assert lead["signal_analysis"]["signal_strength"] == "strong"
+    assert lead["signal_analysis"]["lead_id"] == lead["lead_id"]
+    assert lead["outreach_recommendations"] == ["Email the CTO"]
+
+
+def test_matched_patterns_resolve_indexes_and_keep_names():
+    item = dict(compact_lead("Acme"), mp=[1, "0", "Bottom-up sales", 7], ps=[0.9, 0.6, 0.5])
+    lead = expand_lead(item, PATTERN_NAMES, "s1")
+    assert lead["matched_patterns"] == ["Vertical focus", "Product-led growth", "Bottom-up sales"]
+    assert lead["pattern_scores"] == {"Vertical focus": 0.9, "Product-led growth": 0.6, "Bottom-up sales": 0.5}
+
+
+def test_long_keys_are_accepted():
+    item = {
+        "company_name": "Acme",
+        "quality_score": 0.9,
+        "priority": "high",
+        "matched_patterns": ["Vertical focus"],
+        "pattern_scores": {"Vertical focus": 0.7},
+        "signal_analysis": {"overall_score": 0.9, "confidence": 0.6, "signal_strength": "weak"},
+    }
+    lead = expand_lead(item, PATTERN_NAMES, "s1")
+    LeadAnalysisResult(**lead)
+    assert lead["priority"] == "high"
+    assert lead["pattern_scores"] == {"Vertical focus": 0.7}
+    assert lead["signal_analysis"]["signal_strength"] == "weak"
+
+
+def test_expanded_lead_passes_through_unchanged():
+    lead = expand_lead(compact_lead("Acme"), PATTERN_NAMES, "s1")
+    assert expand_lead(lead, PATTERN_NAMES, "s2") is lead
+
+
+def test_lead_report_skips_non_objects():
+    report = expand_lead_report({"leads": [compact_lead("Acme"), "junk"], "ki": "one insight", "ra": "go"}, PATTERN_NAMES, "s1")
+    assert [lead["company_name"] for lead in report["leads"]] == ["Acme"]
+    assert report["key_insights"] == ["one insight"]
+    assert report["market_opportunities"] == []
+    assert report["recommended_approach"] == "go"
+
+
+def test_pattern_report_derives_counts_and_averages():
+    data = {
+        "ca": 20,
+        "patterns": [
+            {"n": "Product-led growth", "d": "Self-serve", "c": 0.9, "f": 12, "cat": "gtm", "ic": "l", "ka": ["freemium"]},
+            {"name": "Vertical focus", "confidence": 0.6, "frequency": 5},
+        ],
+        "ki": ["insight"],
+        "rec": ["recommendation"],
+    }
+    report = expand_pattern_report(data, "SaaS", "Germany")
+
+    for pattern in report["patterns"]:
+        SuccessPattern(**pattern)
+    first, second = report["patterns"]
+    assert first["implementation_complexity"] == "low"
+    assert first["total_companies"] == 20
+    assert second["name"] == "Vertical focus"
+    assert second["implementation_complexity"] is None
+    assert report["industry"] == "SaaS" and report["country"] == "Germany"
+    assert report["total_patterns"] == 2
+    assert report["average_confidence"] == 0.75
+    assert report["high_confidence_patterns"] == 1
+    assert report["recommendations"] == ["recommendation"]
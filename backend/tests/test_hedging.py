@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.hedging import HedgeCancelled, RequestHedger
+from app.services.model_router import LATENCY_METRIC
+
+
+@pytest.fixture
+def hedger(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.05)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_RATIO", 1.0)
+    for _ in range(5):
+        metrics.observe(LATENCY_METRIC, 0.05, stage="intent", model="m")
+    return RequestHedger()
+
+
+def slow_then_fast():
+    """The first copy hangs until it is aborted; the second answers at once."""
+    calls = []
+    aborted = threading.Event()
+
+    def fn(abort):
+        calls.append(abort)
+        if len(calls) == 1:
+            if not abort.wait(5):
+                return "primary"
+            aborted.set()
+            raise HedgeCancelled("abandoned")
+        return "hedge"
+
+    return fn, calls, aborted
+
+
+def test_no_history_means_no_hedge(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    received = []
+    assert RequestHedger().call("intent", "m", lambda abort: received.append(abort) or "ok") == "ok"
+    assert received == [None]
+
+
+def test_fast_call_is_not_hedged(hedger):
+    calls = []
+    assert hedger.call("intent", "m", lambda abort: calls.append(abort) or "ok") == "ok"
+    assert len(calls) == 1
+
+
+def test_slow_call_is_hedged_and_the_loser_aborted(hedger):
+    fn, calls, aborted = slow_then_fast()
+    started = time.monotonic()
+    assert hedger.call("intent", "m", fn) == "hedge"
+    assert time.monotonic() - started < 1
+    assert len(calls) == 2
+    assert aborted.wait(1)
+    assert metrics.counter("llm_hedge_wins", stage="intent", winner="hedge") == 1
+    assert metrics.counter("llm_hedges_aborted", stage="intent") == 1
+
+
+def test_hedges_are_limited_by_the_budget(hedger, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_RATIO", 0.0)
+    calls = []
+
+    def fn(abort):
+        calls.append(abort)
+        time.sleep(0.1)
+        return "primary"
+
+    assert hedger.call("intent", "m", fn) == "primary"
+    assert len(calls) == 1
+    assert metrics.counter("llm_hedges_skipped", stage="intent") == 1
+
+
+@pytest.mark.asyncio
+async def test_async_loser_is_cancelled(hedger):
+    import asyncio
+    cancelled = asyncio.Event()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        return "hedge"
+
+    assert await hedger.call_async("intent", "m", fn) == "hedge"
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+
+def test_abort_closes_a_real_streamed_response(redis, monkeypatch):
+    from benchmarks.openrouter_standin import StandinConfig, start_standin
+    from app.services import llm_service
+    from app.services.http_client import close_http_client
+
+    server = start_standin(StandinConfig(ttfb_ms=0, tokens_per_second=200, seed=0))
+    monkeypatch.setattr(settings, "OPENROUTER_BASE_URL", server.base_url)
+    monkeypatch.setenv("OPENROUTER_API_KEY", os.environ.get("OPENROUTER_API_KEY", "test-key"))
+    try:
+        service = llm_service.GTMLLMService()
+        abort = threading.Event()
+        payload = service._build_payload(service._lead_messages({"patterns": []}, {"lead_count": 10}), 4000, 0.1)
+        started = time.monotonic()
+        with pytest.raises(HedgeCancelled):
+            service._send_stream(payload, lambda delta: abort.set(), abort)
+        assert time.monotonic() - started < 2
+    finally:
+        close_http_client()
+        server.shutdown()
@@ -0,0 +1,42 @@
+import pytest
+
+from app.services.json_repair import last_parse_outcome, parse_llm_json
+
+
+def test_clean_object_in_fences():
+    assert parse_llm_json('```json\n{"a": 1, "b": [1, 2]}\n```') == {"a": 1, "b": [1, 2]}
+    assert last_parse_outcome() == "clean"
+
+
+def test_trailing_commas_are_dropped():
+    assert parse_llm_json('{"a": [1, 2,], "b": 3,}') == {"a": [1, 2], "b": 3}
+    assert last_parse_outcome() == "repaired"
+
+
+def test_fenced_object_with_prose_and_trailing_commas():
+    response = 'Here you go:\n```json\n{"a": [1, 2,],}\n```\nThanks!'
+    assert parse_llm_json(response) == {"a": [1, 2]}
+    assert last_parse_outcome() == "repaired"
+
+
+def test_truncated_tail_keeps_complete_items_only():
+    response = '{"summary": "ok", "leads": [{"company": "Alpha"}, {"company": "Beta", "reas'
+    assert parse_llm_json(response) == {"summary": "ok", "leads": [{"company": "Alpha"}]}
+    assert last_parse_outcome() == "truncated"
+
+
+def test_raw_newline_inside_string_is_escaped():
+    assert parse_llm_json('{"note": "line one\nline two"}') == {"note": "line one\nline two"}
+
+
+def test_no_object_raises():
+    with pytest.raises(Exception, match="no JSON object found"):
+        parse_llm_json("I could not find any companies.")
+    assert last_parse_outcome() == "no_object"
+
+
+def test_orjson_decoder_is_used(monkeypatch):
+    from app.services import json_repair
+    assert json_repair.orjson is not None
+    monkeypatch.setattr(json_repair.json, "loads", None)
+    assert parse_llm_json('{"a": 1}') == {"a": 1}
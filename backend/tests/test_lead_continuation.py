@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from app.core.config import settings
+from tests.fakes import PATTERN_REPORT, excluded_companies, lead_completion, requested_leads, truncated
+
+
+@pytest.fixture(autouse=True)
+def one_shard(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 5)
+    monkeypatch.setattr(settings, "LLM_CONTINUATION_MAX_ROUNDS", 2)
+
+
+def scripted(*answers):
+    answers = list(answers)
+    lock = threading.Lock()
+
+    def respond(payload):
+        with lock:
+            return answers.pop(0)
+
+    return respond
+
+
+def test_truncated_shard_is_topped_up_with_only_the_missing_leads(llm):
+    service, fake = llm
+    first = lead_completion(["Alpha", "Beta", "Gamma", "Delta", "Epsilon"])
+    fake.respond = scripted((truncated(first, 2), "length"), (lead_completion(["Delta", "Epsilon", "Zeta"]), "stop"))
+
+    report = service.generate_leads(PATTERN_REPORT, "s1")["lead_report"]
+    assert [lead["company_name"] for lead in report["leads"]] == ["Alpha", "Beta", "Delta", "Epsilon", "Zeta"]
+    assert len(fake.payloads) == 2
+    assert requested_leads(fake.payloads[1]) == 3
+    assert excluded_companies(fake.payloads[1]) == ["Alpha", "Beta"]
+
+
+def test_top_ups_stop_after_the_round_limit(llm):
+    service, fake = llm
+    text = lead_completion(["A1", "A2", "A3", "A4", "A5"])
+    fake.respond = scripted(
+        (truncated(text, 1), "length"),
+        (truncated(lead_completion(["B1", "B2", "B3", "B4"]), 1), "length"),
+        (truncated(lead_completion(["C1", "C2", "C3"]), 1), "length"),
+    )
+    report = service.generate_leads(PATTERN_REPORT, "s1")["lead_report"]
+    assert [lead["company_name"] for lead in report["leads"]] == ["A1", "B1", "C1"]
+    assert len(fake.payloads) == 1 + settings.LLM_CONTINUATION_MAX_ROUNDS
+
+
+def test_failed_top_up_keeps_the_complete_leads(llm):
+    service, fake = llm
+    calls = []
+
+    def respond(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            return truncated(lead_completion(["Alpha", "Beta", "Gamma", "Delta"]), 2), "length"
+        raise ValueError("bad gateway")
+
+    fake.respond = respond
+    result = service.generate_leads(PATTERN_REPORT, "s1")
+    assert result["success"]
+    assert [lead["company_name"] for lead in result["lead_report"]["leads"]] == ["Alpha", "Beta"]
+
+
+def test_finished_completion_is_not_topped_up(llm):
+    service, fake = llm
+    fake.respond = scripted((lead_completion(["Alpha", "Beta"]), "stop"))
+    report = service.generate_leads(PATTERN_REPORT, "s1")["lead_report"]
+    assert report["leads_generated"] == 2
+    assert len(fake.payloads) == 1
+
+
+def test_remainder_shard_excludes_produced_companies(llm):
+    service, _ = llm
+    shard = {"lead_count": 5, "pattern": "Vertical focus", "segment": None, "batch": (1, 2)}
+    leads = [{"company_name": "Alpha"}, {"company_name": "Beta"}]
+    assert service._remainder_shard(shard, leads) == dict(shard, lead_count=3, exclude=["Alpha", "Beta"])
+    assert service._remainder_shard(shard, leads * 3) is None
@@ -0,0 +1,118 @@
+import itertools
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.services.llm_service import _company_key
+from tests.fakes import PATTERN_REPORT, lead_completion, requested_leads
+
+
+@pytest.fixture(autouse=True)
+def shard_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_LEAD_SHARD_SIZE", 5)
+    monkeypatch.setattr(settings, "LLM_LEAD_MAX_SHARDS", 10)
+
+
+def unique_companies():
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def respond(payload):
+        with lock:
+            names = [f"Company {next(counter)}" for _ in range(requested_leads(payload))]
+        return lead_completion(names), "stop"
+
+    return respond
+
+
+def test_shards_split_the_target_and_cycle_patterns_then_segments(llm, monkeypatch):
+    service, _ = llm
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 12)
+    shards = service._lead_shards(PATTERN_REPORT)
+
+    assert [shard["lead_count"] for shard in shards] == [4, 4, 4]
+    assert [shard["pattern"] for shard in shards] == ["Product-led growth", "Vertical focus", "Product-led growth"]
+    assert [shard["segment"] for shard in shards] == ["Enterprise", "Enterprise", "Mid-Market"]
+    assert [shard["batch"] for shard in shards] == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_small_target_is_one_unfocused_call(llm, monkeypatch):
+    service, _ = llm
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 4)
+    assert service._lead_shards(PATTERN_REPORT) == [{"lead_count": 4, "pattern": None, "segment": None, "batch": None}]
+
+
+def test_shard_count_is_capped(llm, monkeypatch):
+    service, _ = llm
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 50)
+    monkeypatch.setattr(settings, "LLM_LEAD_MAX_SHARDS", 4)
+    shards = service._lead_shards(PATTERN_REPORT)
+    assert len(shards) == 4
+    assert all(shard["lead_count"] <= settings.LLM_LEAD_SHARD_SIZE for shard in shards)
+
+
+def test_shards_run_concurrently_and_reach_the_target(llm, monkeypatch):
+    service, fake = llm
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 20)
+    barrier = threading.Barrier(4, timeout=5)
+    respond = unique_companies()
+
+    def concurrent(payload):
+        # Every shard must be in flight at once to get past the barrier
+        barrier.wait()
+        return respond(payload)
+
+    fake.respond = concurrent
+    report = service.generate_leads(PATTERN_REPORT, "s1")["lead_report"]
+    assert len(fake.payloads) == 4
+    assert report["leads_generated"] == 20
+    assert len({lead["company_name"] for lead in report["leads"]}) == 20
+
+
+def test_leads_are_deduplicated_by_company_across_shards(llm, monkeypatch):
+    service, fake = llm
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 10)
+    answers = iter([["Acme Inc.", "Beta GmbH", "Gamma"], ["acme", "Beta", "Delta Corp"]])
+    lock = threading.Lock()
+
+    def respond(payload):
+        with lock:
+            return lead_completion(next(answers)), "stop"
+
+    fake.respond = respond
+    report = service.generate_leads(PATTERN_REPORT, "s1")["lead_report"]
+    assert sorted(_company_key(lead) for lead in report["leads"]) == ["acme", "beta", "delta", "gamma"]
+    assert report["leads_generated"] == 4
+    assert report["pattern_coverage"] == {"Product-led growth": 4, "Vertical focus": 0}
+
+
+def test_failed_shard_keeps_the_others(llm, monkeypatch):
+    service, fake = llm
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 10)
+    respond = unique_companies()
+
+    def flaky(payload):
+        if "batch 2 of 2" in payload["messages"][-1]["content"]:
+            raise ValueError("bad gateway")
+        return respond(payload)
+
+    fake.respond = flaky
+    result = service.generate_leads(PATTERN_REPORT, "s1")
+    assert result["success"]
+    assert result["lead_report"]["leads_generated"] == 5
+
+
+def test_no_shard_succeeds(llm, monkeypatch):
+    service, fake = llm
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 10)
+    fake.respond = lambda payload: (_ for _ in ()).throw(ValueError("bad gateway"))
+    result = service.generate_leads(PATTERN_REPORT, "s1")
+    assert not result["success"]
+    assert result["error"].startswith("Failed to generate leads")
+
+
+def test_company_key_normalises_names():
+    assert _company_key({"company_name": "  Acme   Corp. "}) == "acme"
+    assert _company_key({"company_name": "Acme, Inc."}) == "acme"
+    assert _company_key({"company_name": "", "lead_id": "L1"}) == "L1"
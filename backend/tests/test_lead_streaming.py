@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.services.circuit_breaker import circuit_breaker
+from tests.fakes import PATTERN_REPORT, compact_lead, lead_completion
+
+
+@pytest.fixture(autouse=True)
+def one_shard(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 3)
+    monkeypatch.setattr(settings, "LLM_STREAM_LEADS", True)
+
+
+def test_leads_are_emitted_while_the_completion_streams(llm):
+    service, fake = llm
+    text = lead_completion(["Alpha", "Beta", "Gamma"])
+    emitted = []
+
+    def respond(payload):
+        return text, "stop"
+
+    def post_stream(payload, on_text, abort=None):
+        completion = fake.post(payload)
+        cut = text.index('{"n": "Beta"')
+        on_text(text[:cut])
+        # Alpha is out before the rest of the completion arrives
+        assert [lead["company_name"] for lead in emitted] == ["Alpha"]
+        on_text(text[cut:])
+        return completion
+
+    fake.respond = respond
+    service._post_stream = post_stream
+    result = service.generate_leads(PATTERN_REPORT, "s1", on_lead=emitted.append)
+
+    assert [lead["company_name"] for lead in emitted] == ["Alpha", "Beta", "Gamma"]
+    assert [lead["company_name"] for lead in result["lead_report"]["leads"]] == ["Alpha", "Beta", "Gamma"]
+    assert emitted[0]["matched_patterns"] == ["Product-led growth"]
+
+
+def test_lead_malformed_in_the_stream_is_emitted_from_the_repaired_report(llm):
+    service, fake = llm
+    # A trailing comma breaks Beta as a streamed item; the full-response repair recovers it
+    items = [json.dumps(compact_lead(name)) for name in ("Alpha", "Beta", "Gamma")]
+    items[1] = items[1][:-1] + ",}"
+    fake.respond = lambda payload: ('{"leads": [' + ", ".join(items) + "]}", "stop")
+    emitted = []
+
+    service.generate_leads(PATTERN_REPORT, "s1", on_lead=emitted.append)
+    assert sorted(lead["company_name"] for lead in emitted) == ["Alpha", "Beta", "Gamma"]
+
+
+def test_failing_callback_is_offered_the_lead_again(llm):
+    service, fake = llm
+    fake.respond = lambda payload: (lead_completion(["Alpha", "Beta"]), "stop")
+    failures = ["Alpha"]
+    emitted = []
+
+    def on_lead(lead):
+        if lead["company_name"] in failures:
+            failures.remove(lead["company_name"])
+            raise RuntimeError("database busy")
+        emitted.append(lead["company_name"])
+
+    result = service.generate_leads(PATTERN_REPORT, "s1", on_lead=on_lead)
+    assert sorted(emitted) == ["Alpha", "Beta"]
+    assert result["lead_report"]["leads_generated"] == 2
+    # The callback error stayed out of the transport
+    assert len(fake.payloads) == 1
+    assert not circuit_breaker.is_open()
+
+
+def test_without_a_callback_the_call_is_not_streamed(llm):
+    service, fake = llm
+    fake.respond = lambda payload: (lead_completion(["Alpha"]), "stop")
+    service._post_stream = None
+    result = service.generate_leads(PATTERN_REPORT, "s1")
+    assert result["success"]
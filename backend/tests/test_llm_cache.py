@@ -0,0 +1,103 @@
+import pytest
+
+from app.core import redis_client
+from app.core.config import settings
+from app.services import llm_cache as llm_cache_module
+from app.services.llm_cache import KEY_PREFIX, LLMResponseCache, LRUCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache_module.time, "monotonic", clock)
+    return clock
+
+
+def payload(**overrides):
+    return dict(
+        {
+            "model": "fast",
+            "messages": [{"role": "user", "content": "Find SaaS companies"}],
+            "temperature": 0.1,
+            "max_tokens": 500,
+        },
+        **overrides,
+    )
+
+
+def test_key_ignores_max_tokens_but_not_the_prompt():
+    key = LLMResponseCache.make_key(payload())
+    assert LLMResponseCache.make_key(payload(max_tokens=4000)) == key
+    assert LLMResponseCache.make_key(payload(temperature=0.2)) != key
+    assert LLMResponseCache.make_key(payload(messages=[{"role": "user", "content": "Other"}])) != key
+    assert LLMResponseCache.make_key(payload(provider={"only": ["A"]})) != key
+
+
+def test_hot_samples_are_not_cacheable():
+    assert LLMResponseCache.is_cacheable(payload(temperature=settings.LLM_CACHE_MAX_TEMPERATURE))
+    assert not LLMResponseCache.is_cacheable(payload(temperature=0.9))
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2, max_bytes=1000)
+    lru.set("a", "1", 60)
+    lru.set("b", "2", 60)
+    lru.get("a")
+    lru.set("c", "3", 60)
+    assert lru.get("a") == "1"
+    assert lru.get("b") is None
+    assert len(lru) == 2
+
+
+def test_lru_is_bounded_by_bytes():
+    lru = LRUCache(max_entries=10, max_bytes=10)
+    lru.set("big", "x" * 11, 60)
+    assert lru.get("big") is None
+    lru.set("a", "x" * 6, 60)
+    lru.set("b", "x" * 6, 60)
+    assert lru.get("a") is None
+    assert lru.get("b") == "x" * 6
+
+
+def test_lru_entries_expire(clock):
+    lru = LRUCache(max_entries=10, max_bytes=1000)
+    lru.set("a", "1", 60)
+    clock.now += 59
+    assert lru.get("a") == "1"
+    clock.now += 1
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_l2_hit_is_promoted_to_l1(redis):
+    writer, reader = LLMResponseCache(), LLMResponseCache()
+    writer.set("k", '{"a": 1}', "patterns")
+    assert redis.ttl(KEY_PREFIX + "k") == settings.LLM_CACHE_TTL_PATTERNS
+
+    assert reader.get("k", "patterns") == '{"a": 1}'
+    redis.flushall()
+    assert reader.get("k", "patterns") == '{"a": 1}'
+
+
+def test_delete_removes_both_tiers(redis):
+    cache = LLMResponseCache()
+    cache.set("k", "v", "intent")
+    cache.delete("k")
+    assert cache.get("k", "intent") is None
+    assert redis.get(KEY_PREFIX + "k") is None
+
+
+def test_redis_outage_only_costs_the_l2_tier(redis, monkeypatch):
+    monkeypatch.setattr(redis_client, "_down_until", float("inf"))
+    cache = LLMResponseCache()
+    cache.set("k", "v", "intent")
+    assert cache.get("k", "intent") == "v"
+    assert redis.get(KEY_PREFIX + "k") is None
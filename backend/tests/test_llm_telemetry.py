@@ -0,0 +1,91 @@
+import json
+import time
+
+import pytest
+
+from app.core import redis_client
+from app.core.metrics import metrics
+from app.services.llm_telemetry import USAGE_PREFIX, LLMCall, LLMTelemetry, llm_telemetry
+
+
+@pytest.fixture
+def telemetry(redis):
+    metrics.reset()
+    return LLMTelemetry()
+
+
+def finished(stage, model="fast", session_id="s1", provider="p1", success=True, **fields):
+    call = LLMCall(stage=stage, model=model, session_id=session_id, provider=provider, success=success)
+    call.sent()
+    call.received()
+    for name, value in fields.items():
+        setattr(call, name, value)
+    return call
+
+
+def test_calls_are_summed_per_session_and_stage(telemetry):
+    telemetry.record(finished("patterns", prompt_tokens=100, completion_tokens=40, latency=2.0, repaired=True))
+    telemetry.record(finished("patterns", model="strong", provider="p2", success=False, prompt_tokens=50, latency=1.0))
+    telemetry.record(finished("leads", prompt_tokens=10, completion_tokens=5, retries=2))
+    telemetry.cache_hit("patterns", "s1")
+    telemetry.record(finished("leads", session_id="s2", prompt_tokens=999))
+
+    patterns = telemetry.usage("s1", "patterns")
+    assert patterns["calls"] == 2
+    assert patterns["errors"] == 1
+    assert patterns["repairs"] == 1
+    assert patterns["cache_hits"] == 1
+    assert patterns["total_tokens"] == 190
+    assert patterns["avg_latency_seconds"] == 1.5
+    assert patterns["models"] == {"fast": 1, "strong": 1}
+    assert patterns["providers"] == {"p1": 1, "p2": 1}
+
+    both = telemetry.usage("s1")
+    assert both["calls"] == 3
+    assert both["retries"] == 2
+    assert both["prompt_tokens"] == 160
+    assert telemetry.usage("s1", ["leads"])["completion_tokens"] == 5
+
+
+def test_totals_are_shared_through_redis(telemetry, redis):
+    telemetry.record(finished("leads", prompt_tokens=10))
+    LLMTelemetry().record(finished("leads", prompt_tokens=20))  # another worker process
+    assert LLMTelemetry().usage("s1", "leads")["prompt_tokens"] == 30
+    assert redis.ttl(USAGE_PREFIX + "s1") > 0
+
+
+def test_totals_stay_in_process_while_redis_is_down(telemetry, monkeypatch):
+    telemetry.record(finished("leads", prompt_tokens=10))
+    monkeypatch.setattr(redis_client, "_down_until", time.monotonic() + 60)
+    telemetry.record(finished("leads", prompt_tokens=5))
+    assert telemetry.usage("s1", "leads")["prompt_tokens"] == 5
+    monkeypatch.setattr(redis_client, "_down_until", 0.0)
+    assert telemetry.usage("s1", "leads")["prompt_tokens"] == 15
+
+
+def test_calls_that_never_went_out_are_skipped(telemetry):
+    telemetry.record(LLMCall(stage="leads", model="fast", session_id="s1"))
+    assert telemetry.report_usage("s1", "leads") is None
+    assert metrics.counter("llm_calls", stage="leads", model="fast", outcome="error") == 0
+
+
+def test_requeue_after_429_counts_as_a_retry():
+    call = LLMCall(stage="intent", model="fast")
+    call.sent()
+    call.received()
+    call.sent()
+    call.received()
+    assert call.retries == 1
+    assert call.ttfb == call.latency
+
+
+def test_service_call_is_recorded_for_its_session(llm):
+    service, fake = llm
+    fake.respond = lambda payload: (json.dumps({"industry": "SaaS", "country": "Germany"}), "stop")
+    service.extract_intent("SaaS companies in Germany", "s1")
+
+    usage = llm_telemetry.usage("s1", "intent")
+    assert usage["calls"] == 1
+    assert usage["errors"] == 0
+    assert usage["prompt_tokens"] > 0
+    assert sum(usage["providers"].values()) == 1
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.micro_batcher import MicroBatcher
+
+
+@pytest.fixture(autouse=True)
+def batch_window(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BATCH_MAX_WAIT", 1.0)
+    monkeypatch.setattr(settings, "LLM_BATCH_MAX_ITEMS", 8)
+
+
+class Upstream:
+    """Batch function that records each batch; a batch of just "hold" stays in flight until released."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.holding = threading.Event()
+        self.release = threading.Event()
+
+    def flush(self, items):
+        self.batches.append(list(items))
+        if items == ["hold"]:
+            self.holding.set()
+            self.release.wait(5)
+            return ["HOLD"]
+        if self.fail:
+            raise ValueError("batch failed")
+        return [None if item == "skip" else item.upper() for item in items]
+
+    async def flush_async(self, items):
+        return self.flush(items)
+
+
+def make_batcher(max_items=3, fail=False):
+    upstream = Upstream(fail)
+    return MicroBatcher("intent", upstream.flush, upstream.flush_async, lambda: max_items), upstream
+
+
+def submit_concurrently(batcher, items):
+    results = {}
+
+    def run(item):
+        try:
+            results[item] = batcher.submit(item)
+        except Exception as e:
+            results[item] = e
+
+    threads = [threading.Thread(target=run, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def submit_behind_a_call_in_flight(batcher, upstream, items):
+    """Submit `items` while another caller's request is in flight, so they wait and batch."""
+    held = threading.Thread(target=batcher.submit, args=("hold",))
+    held.start()
+    assert upstream.holding.wait(5)
+    try:
+        return submit_concurrently(batcher, items)
+    finally:
+        upstream.release.set()
+        held.join(5)
+
+
+def test_full_batch_is_one_call_with_per_item_answers():
+    batcher, upstream = make_batcher(max_items=3)
+    results = submit_behind_a_call_in_flight(batcher, upstream, ["a", "b", "skip"])
+    assert upstream.batches[0] == ["hold"]
+    assert len(upstream.batches) == 2 and sorted(upstream.batches[1]) == ["a", "b", "skip"]
+    assert results == {"a": "A", "b": "B", "skip": None}
+
+
+def test_batches_are_capped_by_the_stage_budget():
+    batcher, upstream = make_batcher(max_items=2)
+    results = submit_behind_a_call_in_flight(batcher, upstream, ["a", "b", "c", "d"])
+    assert sorted(len(batch) for batch in upstream.batches[1:]) == [2, 2]
+    assert results == {"a": "A", "b": "B", "c": "C", "d": "D"}
+
+
+def test_lone_caller_sends_without_waiting(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BATCH_MAX_WAIT", 5.0)
+    batcher, upstream = make_batcher(max_items=3)
+    started = time.monotonic()
+    assert batcher.submit("a") == "A"
+    assert time.monotonic() - started < 1
+    assert upstream.batches == [["a"]]
+
+
+def test_waiting_caller_flushes_when_the_window_closes(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BATCH_MAX_WAIT", 0.05)
+    batcher, upstream = make_batcher(max_items=3)
+    assert submit_behind_a_call_in_flight(batcher, upstream, ["a"]) == {"a": "A"}
+    assert upstream.batches == [["hold"], ["a"]]
+
+
+def test_batch_error_reaches_every_caller():
+    batcher, upstream = make_batcher(max_items=2, fail=True)
+    results = submit_behind_a_call_in_flight(batcher, upstream, ["a", "b"])
+    assert all(isinstance(result, ValueError) for result in results.values())
+
+
+@pytest.mark.asyncio
+async def test_async_batch():
+    batcher, upstream = make_batcher(max_items=3)
+    results = await asyncio.gather(*(batcher.submit_async(item) for item in ["a", "skip", "c"]))
+    assert results == ["A", None, "C"]
+    assert upstream.batches == [["a", "skip", "c"]]
+
+
+@pytest.mark.asyncio
+async def test_lone_async_caller_sends_without_waiting(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BATCH_MAX_WAIT", 5.0)
+    batcher, upstream = make_batcher(max_items=3)
+    assert await asyncio.wait_for(batcher.submit_async("a"), 1) == "A"
+    assert upstream.batches == [["a"]]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_async_leader_releases_followers():
+    started = asyncio.Event()
+
+    async def flush_async(items):
+        started.set()
+        await asyncio.sleep(10)
+
+    batcher = MicroBatcher("intent", lambda items: [], flush_async, lambda: 2)
+    leader = asyncio.ensure_future(batcher.submit_async("a"))
+    follower = asyncio.ensure_future(batcher.submit_async("b"))
+    await started.wait()
+    leader.cancel()
+    assert await follower is None
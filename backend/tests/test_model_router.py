@@ -0,0 +1,72 @@
+import json
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.model_router import LATENCY_METRIC, ModelRouter
+from app.services.rate_limiter import RateLimitError
+
+FAST = settings.GEN_FAST_MODEL
+ADVANCED = settings.GEN_ADVANCED_MODEL
+INTENT = json.dumps({"industry": "SaaS", "country": "Germany", "company_size": None, "goal": "lead_generation"})
+
+
+def test_stage_chains_resolve_aliases_and_drop_duplicates(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_STAGE_ROUTES", {"intent": ["fast", "advanced", "fast"], "leads": ["custom/model"]})
+    router = ModelRouter()
+    assert router.models("intent") == [FAST, ADVANCED]
+    assert router.models("leads") == ["custom/model"]
+    assert router.models("unknown") == [ADVANCED]
+
+
+def test_latency_is_recorded_per_route_against_the_slo(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(settings, "LLM_STAGE_LATENCY_TARGETS", {"intent": 1.0})
+    router = ModelRouter()
+    router.record("intent", FAST, 0.5, True)
+    router.record("intent", FAST, 2.0, True)
+    router.record("intent", FAST, 9.0, False)
+
+    assert metrics.histogram(LATENCY_METRIC, stage="intent", model=FAST)["count"] == 2
+    assert metrics.counter("llm_route_slo_breaches", stage="intent", model=FAST) == 1
+    assert metrics.counter("llm_route_requests", stage="intent", model=FAST, outcome="error") == 1
+
+
+def test_each_stage_calls_its_primary_model(llm):
+    service, fake = llm
+    fake.respond = lambda payload: (INTENT, "stop")
+    assert service.extract_intent("SaaS in Germany", "s1")["success"]
+    assert [payload["model"] for payload in fake.payloads] == [FAST]
+
+
+def test_failed_primary_falls_back_to_the_next_model(llm):
+    service, fake = llm
+
+    def respond(payload):
+        if payload["model"] == FAST:
+            raise ValueError("model overloaded")
+        return INTENT, "stop"
+
+    fake.respond = respond
+    result = service.extract_intent("SaaS in Germany", "s1")
+    assert result["success"] and result["intent"]["industry"] == "SaaS"
+    assert [payload["model"] for payload in fake.payloads] == [FAST, ADVANCED]
+    assert metrics.counter("llm_route_fallbacks", stage="intent", model=FAST) == 1
+
+
+def test_unparseable_answer_falls_back_too(llm):
+    service, fake = llm
+    fake.respond = lambda payload: ("no json here", "stop") if payload["model"] == FAST else (INTENT, "stop")
+    assert service.extract_intent("SaaS in Germany", "s1")["success"]
+    assert [payload["model"] for payload in fake.payloads] == [FAST, ADVANCED]
+
+
+def test_rate_limit_is_not_a_reason_to_switch_models(llm):
+    service, fake = llm
+
+    def respond(payload):
+        raise RateLimitError("429", 0.0)
+
+    fake.respond = respond
+    result = service.extract_intent("SaaS in Germany", "s1")
+    assert not result["success"]
+    assert {payload["model"] for payload in fake.payloads} == {FAST}
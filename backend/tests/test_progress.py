@@ -0,0 +1,74 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import progress as progress_module
+from app.core.config import settings
+from app.core.progress import KEY_PREFIX, ProgressReporter
+
+
+@pytest.fixture
+def published(redis, monkeypatch):
+    """Progress events handed to the notifier, as (session, step, progress)."""
+    events = []
+    monkeypatch.setattr(
+        progress_module.notifier, "progress_update",
+        lambda session_id, step, progress, message="": events.append((session_id, step, progress)),
+    )
+    monkeypatch.setattr(settings, "PROGRESS_MIN_INTERVAL", 60.0)
+    return events
+
+
+def stored(redis, session_id="s1"):
+    return json.loads(redis.get(KEY_PREFIX + session_id))
+
+
+def test_updates_within_the_interval_are_coalesced(published, redis):
+    reporter = ProgressReporter()
+    reporter.report("s1", "leads", 10.0)
+    reporter.report("s1", "leads", 20.0)
+    reporter.report("s1", "leads", 30.0, "almost")
+    assert published == [("s1", "leads", 10.0)]
+
+    reporter.flush("s1")
+    assert published == [("s1", "leads", 10.0), ("s1", "leads", 30.0)]
+    assert stored(redis)["message"] == "almost"
+
+
+def test_completion_publishes_at_once(published):
+    reporter = ProgressReporter()
+    reporter.report("s1", "leads", 10.0)
+    reporter.report("s1", "leads", 100.0)
+    assert published[-1] == ("s1", "leads", 100.0)
+
+
+def test_lower_progress_is_dropped_in_process(published):
+    reporter = ProgressReporter()
+    reporter.report("s1", "leads", 50.0)
+    reporter.report("s1", "leads", 40.0)
+    reporter.flush("s1")
+    assert published == [("s1", "leads", 50.0)]
+
+
+def test_lua_guard_keeps_progress_monotonic_across_workers(published, redis):
+    ProgressReporter().report("s1", "leads", 60.0)
+    # A retried task in another worker starts the step again from 10%
+    ProgressReporter().report("s1", "leads", 10.0)
+    assert stored(redis)["progress"] == 60.0
+    assert published == [("s1", "leads", 60.0)]
+
+    ProgressReporter().report("s1", "patterns", 10.0)
+    assert stored(redis)["step"] == "patterns"
+    assert stored(redis)["progress"] == 10.0
+
+
+def test_current_overlays_only_the_stored_step_when_ahead(published):
+    ProgressReporter().report("s1", "leads", 60.0)
+    ProgressReporter().report("s2", "leads", 60.0)
+    sessions = [
+        SimpleNamespace(id="s1", current_step="leads", progress_percentage=10.0),
+        SimpleNamespace(id="s2", current_step="patterns", progress_percentage=10.0),
+        SimpleNamespace(id="s3", current_step="leads", progress_percentage=10.0),
+    ]
+    assert ProgressReporter().current(sessions) == {"s1": 60.0}
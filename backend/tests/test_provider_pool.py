@@ -0,0 +1,109 @@
+import random
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services import rate_limiter as rate_limiter_module
+from app.services.provider_pool import ProviderPool
+from app.services.rate_limiter import AdaptiveRateLimiter, PoolBusyError, RateLimitError
+
+
+@pytest.fixture
+def pool(redis, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDERS", ["A", "B"])
+    monkeypatch.setattr(settings, "LLM_PROVIDER_WEIGHTS", {})
+    monkeypatch.setattr(settings, "LLM_PROVIDER_MIN_SAMPLES", 3)
+    monkeypatch.setattr(settings, "LLM_PROVIDER_FAILURE_STREAK", 3)
+    monkeypatch.setattr(settings, "LLM_PROVIDER_ERROR_THRESHOLD", 0.9)
+    monkeypatch.setattr(settings, "LLM_PROVIDER_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_MAX_WAIT", 0.05)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_POLL_INTERVAL", 0.01)
+    metrics.reset()
+    return ProviderPool()
+
+
+def provider_of(payload):
+    return payload["provider"]["only"][0]
+
+
+def test_providers_start_at_their_base_weight(pool, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER_WEIGHTS", {"A": 3.0})
+    assert pool.weights() == {"A": 3.0, "B": 1.0}
+
+
+def test_slower_provider_loses_weight_by_p95(pool):
+    for _ in range(3):
+        pool.record("A", 1.0, True)
+        pool.record("B", 2.0, True)
+    weights = pool.weights()
+    assert weights["A"] == 1.0
+    assert weights["B"] == pytest.approx(0.5)
+
+
+def test_selection_follows_the_weights(pool, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER_WEIGHTS", {"A": 3.0, "B": 1.0})
+    random.seed(7)
+    firsts = [pool._ranked(set())[0] for _ in range(2000)]
+    assert 0.7 < firsts.count("A") / len(firsts) < 0.8
+
+
+def test_failure_streak_puts_the_provider_in_cooldown(pool, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER_COOLDOWN", 0.05)
+    for _ in range(3):
+        pool.record("A", 1.0, False)
+    assert pool.weights()["A"] == 0.0
+    assert pool._ranked(set()) == ["B"]
+    assert metrics.counter("llm_provider_ejections", provider="A") == 1
+
+    time.sleep(0.06)
+    assert pool.weights()["A"] == 1.0
+    assert pool.stats()[0]["samples"] == 0
+
+
+def test_failed_call_fails_over_to_the_other_provider(pool):
+    sent = []
+
+    def send(payload):
+        sent.append(provider_of(payload))
+        if len(sent) == 1:
+            raise ValueError("bad gateway")
+        return "ok"
+
+    assert pool.call({"model": "m"}, send) == "ok"
+    assert len(set(sent)) == 2
+    assert pool._state(sent[0]).failure_streak == 1
+
+
+def test_rate_limited_call_does_not_count_against_the_provider(pool):
+    sent = []
+
+    def send(payload):
+        sent.append(provider_of(payload))
+        raise RateLimitError("429", 1.0)
+
+    with pytest.raises(RateLimitError):
+        pool.call({"model": "m"}, send)
+    assert len(sent) == 1
+    assert not pool._state(sent[0]).outcomes
+
+
+def test_saturated_pool_raises_pool_busy(pool, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER_MAX_CONCURRENCY", {"A": 1, "B": 1})
+    pool.acquire(set())
+    pool.acquire(set())
+    with pytest.raises(PoolBusyError):
+        pool.acquire(set())
+    assert metrics.counter("llm_provider_saturated") == 1
+
+
+def test_rate_limiter_passes_pool_busy_through_without_decrease(pool, redis, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER_MAX_CONCURRENCY", {"A": 0, "B": 0})
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_RPS", 10.0)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_STAGE_SHARES", {"leads": 1.0})
+    redis.set(f"{rate_limiter_module.KEY_PREFIX}limit", 16)
+
+    with pytest.raises(PoolBusyError):
+        AdaptiveRateLimiter().call("leads", lambda: pool.call({"model": "m"}, lambda payload: "ok"))
+    assert float(redis.get(f"{rate_limiter_module.KEY_PREFIX}limit")) == 16
@@ -0,0 +1,123 @@
+import pytest
+
+from app.core.config import settings
+from app.services import rate_limiter as rate_limiter_module
+from app.services.rate_limiter import KEY_PREFIX, AdaptiveRateLimiter, RateLimitError, parse_retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter_module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def limiter(redis, clock, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_RPS", 10.0)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_BURST_SECONDS", 2.0)
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_STAGE_SHARES", {"intent": 0.5, "leads": 0.5})
+    monkeypatch.setattr(settings, "LLM_CONCURRENCY_INITIAL", 100.0)
+    monkeypatch.setattr(settings, "LLM_CONCURRENCY_MIN", 2.0)
+    monkeypatch.setattr(settings, "LLM_CONCURRENCY_MAX", 128.0)
+    return AdaptiveRateLimiter()
+
+
+def limit(redis) -> float:
+    return float(redis.get(f"{KEY_PREFIX}limit"))
+
+
+def test_token_bucket_allows_a_burst_then_refills(limiter, clock):
+    # 0.5 share of 10 rps = 5 tokens/s, burst capacity 5 * 2s = 10
+    for i in range(10):
+        assert limiter._try_acquire("leads", f"t{i}") == 0
+    assert limiter._try_acquire("leads", "t10") == pytest.approx(0.2)
+
+    clock.now += 0.2
+    assert limiter._try_acquire("leads", "t10") == 0
+    assert limiter._try_acquire("leads", "t11") > 0
+
+
+def test_stages_have_separate_buckets(limiter):
+    for i in range(10):
+        limiter._try_acquire("leads", f"t{i}")
+    assert limiter._try_acquire("leads", "t10") > 0
+    assert limiter._try_acquire("intent", "t11") == 0
+
+
+def test_stage_holds_its_share_of_the_concurrency_limit(limiter, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CONCURRENCY_INITIAL", 8.0)
+    for i in range(4):
+        assert limiter._try_acquire("leads", f"t{i}") == 0
+    assert limiter._try_acquire("leads", "t4") == settings.LLM_RATE_LIMIT_POLL_INTERVAL
+
+    limiter._release("leads", "t0")
+    assert limiter._try_acquire("leads", "t4") == 0
+
+
+def test_additive_increase_and_multiplicative_decrease(limiter, redis):
+    limiter._adjust("increase", 1.0)
+    assert limit(redis) == pytest.approx(100 + 1 / 100)
+
+    redis.set(f"{KEY_PREFIX}limit", 16)
+    limiter._adjust("decrease", 0.5)
+    assert limit(redis) == 8
+
+    for _ in range(10):
+        limiter._adjust("decrease", 0.5)
+    assert limit(redis) == settings.LLM_CONCURRENCY_MIN
+
+    redis.set(f"{KEY_PREFIX}limit", settings.LLM_CONCURRENCY_MAX)
+    limiter._adjust("increase", 1.0)
+    assert limit(redis) == settings.LLM_CONCURRENCY_MAX
+
+
+def test_slow_success_backs_off(limiter, redis, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_STAGE_LATENCY_TARGETS", {"leads": 10.0})
+    redis.set(f"{KEY_PREFIX}limit", 20)
+    limiter.record_success("leads", 1.0)
+    assert limit(redis) == pytest.approx(20.05)
+    limiter.record_success("leads", 30.0)
+    assert limit(redis) == pytest.approx(20.05 * settings.LLM_CONCURRENCY_SLOW_FACTOR)
+
+
+def test_rate_limited_halves_the_limit_and_pauses_every_stage(limiter, redis, clock):
+    redis.set(f"{KEY_PREFIX}limit", 16)
+    limiter.record_rate_limited("leads", 3.0)
+    assert limit(redis) == 16 * settings.LLM_CONCURRENCY_DECREASE_FACTOR
+    assert limiter._try_acquire("intent", "t0") == pytest.approx(3.0)
+
+    # Another process sees the shared pause through Redis
+    assert AdaptiveRateLimiter()._try_acquire("intent", "t0") == pytest.approx(3.0, abs=0.01)
+
+    clock.now += 3.0
+    assert limiter._try_acquire("intent", "t0") == 0
+
+
+def test_call_requeues_after_429(limiter, monkeypatch):
+    monkeypatch.setattr(rate_limiter_module.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(limiter, "_try_acquire", lambda stage, token: 0.0)
+    outcomes = [RateLimitError("429", 0.0), "ok"]
+
+    def fn():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert limiter.call("leads", fn) == "ok"
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
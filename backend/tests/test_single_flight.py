@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.single_flight import LEASE_PREFIX, SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SINGLE_FLIGHT_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "LLM_SINGLE_FLIGHT_MAX_WAIT", 2.0)
+
+
+def test_concurrent_callers_in_one_process_share_one_call(redis):
+    flight = SingleFlight()
+    store = {}
+    calls = []
+    started = threading.Event()
+
+    def leader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        store["k"] = "result"
+        return "result"
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(flight.do("k", "intent", leader, lambda: store.get("k"))))
+    first.start()
+    started.wait(1)
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("k", "intent", leader, lambda: store.get("k"))))
+        for _ in range(3)
+    ]
+    for thread in followers:
+        thread.start()
+    for thread in [first, *followers]:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["result"] * 4
+
+
+def test_follower_of_another_process_reads_the_leaders_result(redis):
+    redis.set(LEASE_PREFIX + "k", "other-process")
+    store = {}
+
+    def finish_elsewhere():
+        time.sleep(0.05)
+        store["k"] = "theirs"
+        redis.delete(LEASE_PREFIX + "k")
+
+    threading.Thread(target=finish_elsewhere).start()
+    assert SingleFlight().do("k", "intent", lambda: "mine", lambda: store.get("k")) == "theirs"
+
+
+def test_follower_calls_itself_when_the_leader_leaves_no_result(redis):
+    redis.set(LEASE_PREFIX + "k", "other-process", px=50)
+    assert SingleFlight().do("k", "intent", lambda: "mine", lambda: None) == "mine"
+
+
+def test_lease_is_released_after_the_leader_fails(redis):
+    flight = SingleFlight()
+
+    def leader():
+        raise ValueError("upstream failed")
+
+    with pytest.raises(ValueError):
+        flight.do("k", "intent", leader, lambda: None)
+    assert not redis.exists(LEASE_PREFIX + "k")
+    assert flight.do("k", "intent", lambda: "retry", lambda: None) == "retry"
+
+
+def test_lease_of_another_owner_is_not_released(redis):
+    flight = SingleFlight()
+    flight._release_lease("k", "not-mine")
+    redis.set(LEASE_PREFIX + "k", "theirs")
+    flight._release_lease("k", "not-mine")
+    assert redis.get(LEASE_PREFIX + "k") == b"theirs"
+
+
+@pytest.mark.asyncio
+async def test_async_callers_share_one_call(redis):
+    flight = SingleFlight()
+    store = {}
+    calls = []
+
+    async def leader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        store["k"] = "result"
+        return "result"
+
+    async def follower():
+        return store.get("k")
+
+    results = await asyncio.gather(*(flight.do_async("k", "intent", leader, follower) for _ in range(4)))
+    assert calls == [1]
+    assert results == ["result"] * 4
@@ -0,0 +1,111 @@
+import pytest
+
+from app.core import redis_client
+from app.core.config import settings
+from app.core.speculation import Speculator
+
+STAGE = "pattern_discovery"
+
+
+class FakeCelery:
+    def __init__(self):
+        self.sent = []
+
+    def send_task(self, name, args, kwargs, task_id, queue):
+        self.sent.append(task_id)
+
+
+@pytest.fixture
+def celery(monkeypatch):
+    from app.core import celery as celery_module
+    fake = FakeCelery()
+    monkeypatch.setattr(celery_module, "celery_app", fake)
+    return fake
+
+
+@pytest.fixture
+def speculator(redis, celery, monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_PATTERNS", True)
+    monkeypatch.setattr(settings, "SPECULATIVE_LEADS", False)
+    return Speculator()
+
+
+def start(speculator, celery) -> str:
+    assert speculator.start("s1", STAGE)
+    return celery.sent[-1]
+
+
+def test_only_one_run_per_step(speculator, celery):
+    start(speculator, celery)
+    assert not speculator.start("s1", STAGE)
+    assert len(celery.sent) == 1
+
+
+def test_finished_run_is_attached_on_confirmation(speculator, celery):
+    task_id = start(speculator, celery)
+    assert speculator.claim("s1", STAGE, task_id)
+    assert not speculator.claim("s1", STAGE, task_id)
+    assert speculator.finish("s1", STAGE, task_id, "report-1") == "done"
+    assert speculator.promote("s1", STAGE) == ("done", "report-1")
+    # Settled: no new run for the step
+    assert not speculator.start("s1", STAGE)
+
+
+def test_confirmed_while_queued_drops_the_run(speculator, celery):
+    task_id = start(speculator, celery)
+    assert speculator.promote("s1", STAGE) == ("queued", None)
+    assert not speculator.claim("s1", STAGE, task_id)
+
+
+def test_confirmed_while_running_promotes_the_run(speculator, celery):
+    task_id = start(speculator, celery)
+    speculator.claim("s1", STAGE, task_id)
+    assert speculator.promote("s1", STAGE) == ("running", None)
+    assert speculator.finish("s1", STAGE, task_id, "report-1") == "promoted"
+
+
+def test_rejected_while_running_discards_the_result(speculator, celery):
+    task_id = start(speculator, celery)
+    speculator.claim("s1", STAGE, task_id)
+    assert speculator.cancel("s1") == []
+    assert speculator.finish("s1", STAGE, task_id, "report-1") == "closed"
+
+
+def test_rejected_after_finishing_returns_the_report_to_delete(speculator, celery):
+    task_id = start(speculator, celery)
+    speculator.claim("s1", STAGE, task_id)
+    speculator.finish("s1", STAGE, task_id, "report-1")
+    assert speculator.cancel("s1") == [(STAGE, "report-1")]
+
+
+def test_failed_run(speculator, celery):
+    task_id = start(speculator, celery)
+    speculator.claim("s1", STAGE, task_id)
+    assert speculator.fail("s1", STAGE, task_id) == "failed"
+    assert speculator.promote("s1", STAGE) == ("failed", None)
+
+
+def test_failed_run_the_user_is_waiting_on(speculator, celery):
+    task_id = start(speculator, celery)
+    speculator.claim("s1", STAGE, task_id)
+    speculator.promote("s1", STAGE)
+    assert speculator.fail("s1", STAGE, task_id) == "promoted"
+
+
+def test_stale_task_id_is_closed(speculator, celery):
+    task_id = start(speculator, celery)
+    assert not speculator.claim("s1", STAGE, "other")
+    speculator.claim("s1", STAGE, task_id)
+    assert speculator.finish("s1", STAGE, "other", "report-1") == "closed"
+
+
+def test_nothing_starts_without_redis(speculator, celery, monkeypatch):
+    monkeypatch.setattr(redis_client, "_down_until", float("inf"))
+    assert not speculator.start("s1", STAGE)
+    assert celery.sent == []
+    assert speculator.promote("s1", STAGE) == ("none", None)
+
+
+def test_disabled_stage(speculator, celery):
+    assert not speculator.start("s1", "lead_generation")
+    assert speculator.promote("s1", "lead_generation") == ("none", None)
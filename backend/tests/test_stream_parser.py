@@ -0,0 +1,43 @@
+from app.services.stream_parser import JSONArrayItemStream
+
+
+def feed_all(stream, chunks):
+    items = []
+    for chunk in chunks:
+        items.extend(stream.feed(chunk))
+    return items
+
+
+def test_items_split_across_chunks():
+    text = '```json\n{"summary": "x", "leads": [{"company": "Alpha", "tags": ["a", "b"]}, {"company": "B}eta"}]}\n```'
+    for size in (1, 3, 7, len(text)):
+        stream = JSONArrayItemStream("leads")
+        items = feed_all(stream, [text[i:i + size] for i in range(0, len(text), size)])
+        assert items == [{"company": "Alpha", "tags": ["a", "b"]}, {"company": "B}eta"}]
+        assert stream.items_emitted == 2
+        assert stream.done
+
+
+def test_item_is_returned_by_the_chunk_that_closes_it():
+    stream = JSONArrayItemStream("leads")
+    assert stream.feed('{"leads": [{"company": "Al') == []
+    assert stream.feed('pha"}, {"company"') == [{"company": "Alpha"}]
+    assert stream.feed(': "Beta"}]}') == [{"company": "Beta"}]
+
+
+def test_malformed_item_is_skipped():
+    stream = JSONArrayItemStream("leads")
+    items = stream.feed('{"leads": [{"company": "Alpha"}, {"company": "Beta", "score": high}, {"company": "Gamma"}]}')
+    assert items == [{"company": "Alpha"}, {"company": "Gamma"}]
+    assert stream.items_emitted == 2
+
+
+def test_other_arrays_and_nested_objects_are_ignored():
+    stream = JSONArrayItemStream("leads")
+    items = stream.feed('{"patterns": [{"name": "p"}], "leads": [{"company": "Alpha", "contact": {"name": "Ann"}}]}')
+    assert items == [{"company": "Alpha", "contact": {"name": "Ann"}}]
+
+
+def test_text_after_the_object_is_ignored():
+    stream = JSONArrayItemStream("leads")
+    assert stream.feed('{"leads": [{"company": "Alpha"}]} {"leads": [{"company": "Beta"}]}') == [{"company": "Alpha"}]
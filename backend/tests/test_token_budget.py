@@ -0,0 +1,88 @@
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.token_budget import TokenBudget, TokenBudgetError, estimate_tokens
+from tests.fakes import PATTERN_REPORT, lead_completion, truncated
+
+
+@pytest.fixture
+def budget():
+    metrics.reset()
+    return TokenBudget()
+
+
+def test_max_tokens_follows_items_times_rate_with_headroom(budget):
+    rate = settings.LLM_STAGE_TOKENS_PER_ITEM["leads"]
+    expected = 3 * rate * settings.LLM_TOKEN_HEADROOM + settings.LLM_TOKEN_OVERHEAD
+    assert budget.max_tokens("leads", 3) == pytest.approx(expected, abs=1)
+
+
+def test_max_tokens_is_clamped_to_the_stage_cap_and_the_floor(budget):
+    assert budget.max_tokens("leads", 1000) == settings.LLM_STAGE_MAX_TOKENS["leads"]
+    budget._rates["intent"] = 0.0
+    assert budget.max_tokens("intent", 1) == max(settings.LLM_MIN_MAX_TOKENS, settings.LLM_TOKEN_OVERHEAD)
+
+
+def test_max_items_fits_the_stage_cap(budget):
+    items = budget.max_items("leads")
+    assert budget.max_tokens("leads", items) < settings.LLM_STAGE_MAX_TOKENS["leads"]
+    assert budget.max_tokens("leads", items + 1) == settings.LLM_STAGE_MAX_TOKENS["leads"]
+
+
+def test_check_rejects_a_call_over_the_context_window(budget):
+    messages = [{"role": "user", "content": "x" * int(settings.LLM_CONTEXT_WINDOW * 4)}]
+    with pytest.raises(TokenBudgetError):
+        budget.check("leads", messages, 1000)
+    assert metrics.counter("llm_token_budget_rejections", stage="leads") == 1
+    budget.check("leads", [{"role": "user", "content": "short"}], 1000)
+
+
+def test_observe_smooths_towards_the_new_rate(budget):
+    budget.observe("leads", 4, 800, "")
+    assert budget.tokens_per_item("leads") == 200
+    budget.observe("leads", 2, 800, "")
+    assert budget.tokens_per_item("leads") == pytest.approx(240)
+
+
+def test_observe_estimates_tokens_from_text_without_usage(budget):
+    text = "x" * 700
+    budget.observe("intent", 1, None, text)
+    assert budget.tokens_per_item("intent") == estimate_tokens(text)
+
+
+def test_truncated_completion_raises_the_rate_but_never_lowers_it(budget):
+    budget._rates["leads"] = 100.0
+    budget.observe_truncated("leads", 5, 2000, "")
+    assert budget.tokens_per_item("leads") == 400
+    budget.observe_truncated("leads", 5, 1000, "")
+    assert budget.tokens_per_item("leads") == 400
+    assert metrics.counter("llm_token_budget_truncations", stage="leads") == 2
+
+
+def test_truncated_lead_completion_grows_the_next_budget(llm, monkeypatch):
+    from app.services.token_budget import token_budget
+
+    service, fake = llm
+    monkeypatch.setattr(settings, "MAX_LEADS_TO_GENERATE", 5)
+    monkeypatch.setattr(settings, "LLM_CONTINUATION_MAX_ROUNDS", 0)
+    token_budget._rates["leads"] = 10.0
+    text = truncated(lead_completion(["Alpha", "Beta", "Gamma", "Delta", "Epsilon"]), 2)
+    fake.respond = lambda payload: (text, "length")
+
+    before = token_budget.max_tokens("leads", 5)
+    service.generate_leads(PATTERN_REPORT, "s1")
+    assert token_budget.tokens_per_item("leads") == pytest.approx(estimate_tokens(text) / 5)
+    assert token_budget.max_tokens("leads", 5) > before
+
+
+def test_compact_patterns_keeps_the_most_confident(budget, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROMPT_MAX_PATTERNS", 2)
+    patterns = [{"name": "Low", "confidence": 0.1}, {"name": "High", "confidence": 0.9}, {"name": "Mid", "confidence": 0.5}]
+    assert budget.compact_patterns(patterns) == ["High", "Mid"]
+
+
+def test_prompt_pattern_name_shortens_long_names(budget, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROMPT_MAX_PATTERN_CHARS", 10)
+    assert budget.prompt_pattern_name("Short") == "Short"
+    assert budget.prompt_pattern_name("A very long pattern name") == "A very lon..."